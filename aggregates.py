@@ -0,0 +1,126 @@
+"""
+Materialized aggregates behind the dashboard views.
+
+The downloader rebuilds these tables inside the same transaction that writes
+lending_standards and loan_demand, so dashboard renders read a few hundred
+pre-grouped rows instead of grouping the full tables on every Streamlit rerun.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database import get_engine, session_scope
+from data_access import filter_sql
+
+# Dataset name -> (source table, metric column)
+DATASETS = {
+    'lending_standards': ('lending_standards', 'net_tightening'),
+    'loan_demand': ('loan_demand', 'net_demand'),
+}
+
+AGGREGATE_TABLES = ('quarterly_rollups', 'latest_snapshot', 'category_stats')
+
+
+def refresh_aggregates(session):
+    """Rebuild rollups, latest snapshot and per-category stats from the base tables (caller commits)"""
+    for table in AGGREGATE_TABLES:
+        session.execute(text(f"DELETE FROM {table}"))
+
+    for dataset, (table, value_column) in DATASETS.items():
+        params = {'dataset': dataset}
+        session.execute(text(f"""
+            INSERT INTO quarterly_rollups
+                (dataset, survey_date, loan_category, bank_type, mean_value, observations)
+            SELECT :dataset, survey_date, loan_category, bank_type, AVG({value_column}), COUNT({value_column})
+            FROM {table}
+            GROUP BY survey_date, loan_category, bank_type
+        """), params)
+        session.execute(text(f"""
+            INSERT INTO latest_snapshot
+                (dataset, survey_date, loan_category, mean_value, observations)
+            SELECT :dataset, survey_date, loan_category, AVG({value_column}), COUNT({value_column})
+            FROM {table}
+            WHERE survey_date = (SELECT MAX(survey_date) FROM {table})
+            GROUP BY survey_date, loan_category
+        """), params)
+        session.execute(text(f"""
+            INSERT INTO category_stats
+                (dataset, loan_category, min_value, max_value, mean_value, first_date, last_date, observations)
+            SELECT :dataset, loan_category, MIN({value_column}), MAX({value_column}), AVG({value_column}),
+                   MIN(survey_date), MAX(survey_date), COUNT({value_column})
+            FROM {table}
+            GROUP BY loan_category
+        """), params)
+
+
+def ensure_aggregates(db_path='sloos_data.db'):
+    """Build the aggregates for databases loaded before they existed"""
+    with session_scope(db_path) as session:
+        has_rollups = session.execute(text("SELECT 1 FROM quarterly_rollups LIMIT 1")).first()
+        has_data = any(
+            session.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first()
+            for table, _ in DATASETS.values()
+        )
+        if has_data and not has_rollups:
+            refresh_aggregates(session)
+
+
+def _read(sql, params, db_path):
+    with get_engine(db_path).connect() as conn:
+        result = conn.execute(text(sql), params)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def read_category_trends(dataset, db_path='sloos_data.db'):
+    """Mean metric per survey date and loan category, named after the dataset's metric column"""
+    value_column = DATASETS[dataset][1]
+    df = _read(f"""
+        SELECT survey_date, loan_category,
+               SUM(mean_value * observations) / SUM(observations) AS {value_column}
+        FROM quarterly_rollups
+        WHERE dataset = :dataset
+        GROUP BY survey_date, loan_category
+        ORDER BY survey_date, loan_category
+    """, {'dataset': dataset}, db_path)
+    df['survey_date'] = pd.to_datetime(df['survey_date'], format='%Y-%m-%d')
+    df[value_column] = df[value_column].astype(np.float32)
+    return df
+
+
+def read_latest_snapshot(dataset, db_path='sloos_data.db'):
+    """Per-category means for the dataset's latest survey date"""
+    df = _read("""
+        SELECT survey_date, loan_category, mean_value, observations
+        FROM latest_snapshot
+        WHERE dataset = :dataset
+    """, {'dataset': dataset}, db_path)
+    df['survey_date'] = pd.to_datetime(df['survey_date'], format='%Y-%m-%d')
+    return df
+
+
+def read_category_stats(dataset, db_path='sloos_data.db'):
+    """Min/max/mean and date coverage per loan category"""
+    df = _read("""
+        SELECT loan_category, min_value, max_value, mean_value, first_date, last_date, observations
+        FROM category_stats
+        WHERE dataset = :dataset
+        ORDER BY loan_category
+    """, {'dataset': dataset}, db_path)
+    for column in ('first_date', 'last_date'):
+        df[column] = pd.to_datetime(df[column], format='%Y-%m-%d')
+    return df
+
+
+def estimate_row_count(dataset, categories=None, bank_type=None, start=None, end=None, db_path='sloos_data.db'):
+    """Rows of a dataset matching the explorer filters, summed from the rollups instead of counting the table.
+
+    Rows with a missing metric are not in the rollup counts, so this can run
+    slightly under the true row count.
+    """
+    conditions, params = filter_sql(categories, bank_type, start, end)
+    params['dataset'] = dataset
+    where = ' AND '.join(['dataset = :dataset'] + conditions)
+    with get_engine(db_path).connect() as conn:
+        count = conn.execute(text(f"SELECT SUM(observations) FROM quarterly_rollups WHERE {where}"), params).scalar()
+    return int(count or 0)
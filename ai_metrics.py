@@ -0,0 +1,163 @@
+"""
+Per-call instrumentation for Bedrock analyses.
+
+BedrockAnalyzer records one entry per call (wall time, time to first byte,
+token usage, retries, fallbacks, response-cache hits and estimated cost). AnalysisMetrics
+keeps a rolling window of those records for latency percentiles plus running
+totals (including the latency sums and counts exported with the percentiles,
+so they only ever grow), and exports both as JSON or Prometheus text.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+# USD per million tokens (input, output) by model family. Cache reads bill at
+# 10% of the input price and cache writes at 125%.
+MODEL_PRICING = {
+    'claude-3-5-haiku': (0.80, 4.00),
+    'claude-haiku-4': (1.00, 5.00),
+    'claude-3-5-sonnet': (3.00, 15.00),
+    'claude-3-7-sonnet': (3.00, 15.00),
+    'claude-sonnet-4': (3.00, 15.00),
+    'claude-opus-4': (15.00, 75.00),
+}
+CACHE_READ_PRICE_FACTOR = 0.10
+CACHE_WRITE_PRICE_FACTOR = 1.25
+
+PERCENTILES = (50, 95, 99)
+
+# Latency fields summarized as percentiles
+LATENCY_FIELDS = ('wall_time', 'time_to_first_byte', 'time_to_first_token')
+
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_write_input_tokens')
+
+
+def model_pricing(model_id: str) -> Optional[tuple]:
+    """(input, output) USD per million tokens for a Bedrock model id, or None if unknown"""
+    for family, pricing in MODEL_PRICING.items():
+        if family in model_id:
+            return pricing
+    return None
+
+
+def estimate_cost(model_id: str, input_tokens: Optional[int] = 0, output_tokens: Optional[int] = 0,
+                  cache_read_input_tokens: Optional[int] = 0, cache_write_input_tokens: Optional[int] = 0) -> float:
+    """Estimated USD cost of one call; 0.0 for models without known pricing"""
+    pricing = model_pricing(model_id)
+    if pricing is None:
+        return 0.0
+    input_price, output_price = pricing
+    return ((input_tokens or 0) * input_price
+            + (cache_read_input_tokens or 0) * input_price * CACHE_READ_PRICE_FACTOR
+            + (cache_write_input_tokens or 0) * input_price * CACHE_WRITE_PRICE_FACTOR
+            + (output_tokens or 0) * output_price) / 1_000_000
+
+
+class AnalysisMetrics:
+    """Thread-safe recorder of per-call Bedrock metrics with rolling latency percentiles"""
+
+    def __init__(self, window: int = 1000):
+        self.records = deque(maxlen=window)
+        self.totals = {'calls': 0, 'errors': 0, 'cached': 0, 'retries': 0, 'fallbacks': 0, 'cost_usd': 0.0,
+                       **{field: 0 for field in TOKEN_FIELDS},
+                       **{f'{field}_{part}': 0 for field in LATENCY_FIELDS for part in ('sum', 'count')}}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, operation: str = 'analyze_data', success: bool = True, cached: bool = False,
+               wall_time: Optional[float] = None, time_to_first_byte: Optional[float] = None,
+               time_to_first_token: Optional[float] = None, error_code: Optional[str] = None,
+               retries: int = 0, **tokens) -> Dict[str, Any]:
+        """Record one call; tokens are any of input/output/cache_read_input/cache_write_input _tokens"""
+        usage = {field: tokens.get(field) or 0 for field in TOKEN_FIELDS}
+        entry = {
+            'timestamp': time.time(),
+            'operation': operation,
+            'model': model,
+            'success': success,
+            'cached': cached,
+            'wall_time': wall_time,
+            'time_to_first_byte': time_to_first_byte,
+            'time_to_first_token': time_to_first_token,
+            'error_code': error_code,
+            'retries': retries,
+            **usage,
+            'cost_usd': 0.0 if cached else estimate_cost(model, **usage)
+        }
+        with self._lock:
+            self.records.append(entry)
+            self.totals['calls'] += 1
+            self.totals['errors'] += 0 if success else 1
+            self.totals['cached'] += 1 if cached else 0
+            self.totals['retries'] += retries
+            self.totals['cost_usd'] += entry['cost_usd']
+            for field in TOKEN_FIELDS:
+                self.totals[field] += usage[field]
+            # Cache hits return in microseconds and would drag the latency figures down
+            for field in LATENCY_FIELDS:
+                if not cached and entry[field] is not None:
+                    self.totals[f'{field}_sum'] += entry[field]
+                    self.totals[f'{field}_count'] += 1
+        return entry
+
+    def record_fallback(self):
+        """Count a request answered by the fallback model"""
+        with self._lock:
+            self.totals['fallbacks'] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Running totals plus p50/p95/p99 of each latency field over the recent window"""
+        with self._lock:
+            records = list(self.records)
+            summary = dict(self.totals)
+
+        live = [record for record in records if not record['cached']]
+        summary['window'] = len(records)
+        for field in LATENCY_FIELDS:
+            values = np.array([record[field] for record in live if record[field] is not None], dtype=float)
+            for p in PERCENTILES:
+                summary[f'{field}_p{p}'] = float(np.percentile(values, p)) if values.size else None
+        return summary
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The most recent call records, newest last"""
+        with self._lock:
+            return list(self.records)[-limit:]
+
+    def to_json(self) -> str:
+        """Summary and recent calls as a JSON document"""
+        return json.dumps({'summary': self.summary(), 'recent': self.recent()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Summary in the Prometheus text exposition format"""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric('sloos_ai_calls_total', 'counter', 'Bedrock analysis calls', [({}, summary['calls'])])
+        metric('sloos_ai_errors_total', 'counter', 'Failed Bedrock analysis calls', [({}, summary['errors'])])
+        metric('sloos_ai_cache_hits_total', 'counter', 'Calls served from the analysis cache', [({}, summary['cached'])])
+        metric('sloos_ai_retries_total', 'counter', 'Retried Bedrock requests', [({}, summary['retries'])])
+        metric('sloos_ai_fallbacks_total', 'counter', 'Requests answered by the fallback model',
+               [({}, summary['fallbacks'])])
+        metric('sloos_ai_tokens_total', 'counter', 'Tokens by kind',
+               [({'kind': field.replace('_tokens', '')}, summary[field]) for field in TOKEN_FIELDS])
+        metric('sloos_ai_cost_usd_total', 'counter', 'Estimated Bedrock cost in USD', [({}, f"{summary['cost_usd']:.6f}")])
+        for field in LATENCY_FIELDS:
+            samples = [({'quantile': f'{p / 100:g}'}, summary[f'{field}_p{p}'])
+                       for p in PERCENTILES if summary[f'{field}_p{p}'] is not None]
+            metric(f'sloos_ai_{field}_seconds', 'summary', f'{field.replace("_", " ").capitalize()} of uncached calls',
+                   samples)
+            lines.append(f"sloos_ai_{field}_seconds_sum {summary[f'{field}_sum']}")
+            lines.append(f"sloos_ai_{field}_seconds_count {summary[f'{field}_count']}")
+        return '\n'.join(lines) + '\n'
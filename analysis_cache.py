@@ -0,0 +1,149 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable
+
+from database import AnalysisCache, get_session, read_data_version
+
+
+class AnalysisResponseCache:
+    """Persistent, content-addressed cache of Bedrock responses stored in the analysis_cache table"""
+
+    def __init__(self, db_path: str = 'sloos_data.db', ttl_seconds: int = 7 * 24 * 3600,
+                 max_entries: int = 500, data_version_provider: Optional[Callable[[], str]] = None):
+        self.db_path = db_path
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.data_version_provider = data_version_provider
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def current_data_version(self) -> str:
+        """Version of the underlying SLOOS data, part of every cache key"""
+        if self.data_version_provider is not None:
+            return self.data_version_provider()
+        return read_data_version(self.db_path)
+
+    def make_key(self, model_id: str, prompt: str, context: Optional[str], params: Dict[str, Any],
+                 data_version: Optional[str] = None) -> str:
+        """Hash everything that influences the model response into a stable key"""
+        if data_version is None:
+            data_version = self.current_data_version()
+        payload = json.dumps({
+            'model_id': model_id,
+            'prompt': prompt,
+            'context': context,
+            'params': params,
+            'data_version': data_version,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached analysis for key, or None on a miss or expired entry"""
+        session = get_session(self.db_path)
+        try:
+            entry = session.query(AnalysisCache).filter(AnalysisCache.query_hash == key).first()
+            if entry is None or self._is_expired(entry):
+                self.misses += 1
+                return None
+
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_accessed = datetime.utcnow()
+            session.commit()
+            self.hits += 1
+            return entry.analysis_result
+        except Exception as e:
+            print(f"Analysis cache read failed: {e}")
+            session.rollback()
+            self.errors += 1
+            self.misses += 1
+            return None
+        finally:
+            session.close()
+
+    def set(self, key: str, query_text: str, analysis_result: str, model_id: str,
+            data_version: Optional[str] = None):
+        """Store an analysis result and evict expired, stale or excess entries"""
+        if data_version is None:
+            data_version = self.current_data_version()
+        session = get_session(self.db_path)
+        try:
+            now = datetime.utcnow()
+            entry = session.query(AnalysisCache).filter(AnalysisCache.query_hash == key).first()
+            if entry is None:
+                entry = AnalysisCache(query_hash=key, hit_count=0)
+                session.add(entry)
+            entry.query_text = query_text
+            entry.analysis_result = analysis_result
+            entry.model_id = model_id
+            entry.data_version = data_version
+            entry.created_at = now
+            entry.last_accessed = now
+
+            self._evict(session, data_version)
+            session.commit()
+        except Exception as e:
+            print(f"Analysis cache write failed: {e}")
+            session.rollback()
+            self.errors += 1
+        finally:
+            session.close()
+
+    def invalidate(self, data_version: Optional[str] = None) -> int:
+        """Delete entries that do not belong to data_version (all entries if None)"""
+        session = get_session(self.db_path)
+        try:
+            query = session.query(AnalysisCache)
+            if data_version is not None:
+                query = query.filter((AnalysisCache.data_version != data_version) |
+                                     (AnalysisCache.data_version.is_(None)))
+            deleted = query.delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        except Exception as e:
+            print(f"Analysis cache invalidation failed: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the persisted entry count"""
+        session = get_session(self.db_path)
+        try:
+            entries = session.query(AnalysisCache).count()
+        except Exception:
+            entries = None
+        finally:
+            session.close()
+
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+    def _is_expired(self, entry: AnalysisCache) -> bool:
+        return entry.created_at is not None and datetime.utcnow() - entry.created_at > self.ttl
+
+    def _evict(self, session, data_version: str):
+        # Answers computed against an older data version can never be hit again
+        session.query(AnalysisCache).filter(
+            (AnalysisCache.data_version != data_version) | (AnalysisCache.data_version.is_(None))
+        ).delete(synchronize_session=False)
+        session.query(AnalysisCache).filter(
+            AnalysisCache.created_at < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+        session.flush()
+
+        overflow = session.query(AnalysisCache).count() - self.max_entries
+        if overflow > 0:
+            oldest = session.query(AnalysisCache.id).order_by(
+                AnalysisCache.last_accessed.asc()).limit(overflow).all()
+            session.query(AnalysisCache).filter(
+                AnalysisCache.id.in_([row[0] for row in oldest])
+            ).delete(synchronize_session=False)
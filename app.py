@@ -1,11 +1,26 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import time
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from database import init_database, get_session, LendingStandard, LoanDemand
+from database import init_database, session_scope, read_data_version, bump_data_version, clear_observations
 from data_ingestion import SLOOSDataIngestion
+from snapshot_store import ensure_snapshot
+from data_access import read_page, PAGE_SIZE
+from data_snapshot import SharedSnapshot, enable_copy_on_write
+from page_data import PageData
+from aggregates import (ensure_aggregates, refresh_aggregates, read_category_trends, estimate_row_count,
+                        read_latest_snapshot, read_category_stats)
 from bedrock_client import BedrockAnalyzer
+from analysis_cache import AnalysisResponseCache
+from query_context import build_query_context, DEFAULT_TOKEN_BUDGET
+from query_similarity import SimilarQueryIndex
+from indicators import indicator_table
+from charts import line_figure, MAX_POINTS_PER_TRACE
+from standard_analyses import (build_executive_summary, build_sentiment_summary, build_period_summary,
+                               year_over_year_periods, load_standard_analyses,
+                               EXECUTIVE_SUMMARY, CATEGORY_SENTIMENT, YEAR_OVER_YEAR)
+from refresh_service import RefreshService
 from sqlalchemy import func
 
 st.set_page_config(
@@ -50,47 +65,120 @@ st.markdown("""
 def initialize_app():
     """Initialize database and connections"""
     init_database()
-    return BedrockAnalyzer(region_name='us-east-1')
+    ensure_aggregates()
+    ensure_snapshot()
+    return BedrockAnalyzer(region_name='us-east-1', cache=AnalysisResponseCache(),
+                           fallback_model_id='us.anthropic.claude-3-5-haiku-20241022-v1:0')
 
-@st.cache_data(ttl=3600)
-def load_lending_standards_data():
-    """Load lending standards data from database"""
-    session = get_session()
-    query = session.query(LendingStandard).all()
-    data = [{
-        'survey_date': record.survey_date,
-        'loan_category': record.loan_category,
-        'tightened_pct': record.tightened_pct,
-        'eased_pct': record.eased_pct,
-        'unchanged_pct': record.unchanged_pct,
-        'net_tightening': record.net_tightening,
-        'bank_type': record.bank_type
-    } for record in query]
-    session.close()
-    return pd.DataFrame(data)
+@st.cache_resource
+def get_shared_snapshot():
+    """Process-wide data snapshot shared by reference across all user sessions"""
+    enable_copy_on_write()
+    return SharedSnapshot()
+
+# Data caches are keyed on the data version stamp, so they stay valid until the
+# downloader (or the clear-data action) actually changes the database
+def load_data_snapshot(data_version):
+    """Read-only frames and row indexes for data_version, rebuilt once when the version changes"""
+    return get_shared_snapshot().get(data_version)
+
+def load_lending_standards_data(data_version):
+    """Lending standards as a copy-on-write view of the shared snapshot"""
+    return load_data_snapshot(data_version).lending_standards
+
+def load_loan_demand_data(data_version):
+    """Loan demand as a copy-on-write view of the shared snapshot"""
+    return load_data_snapshot(data_version).loan_demand
+
+@st.cache_data(max_entries=2)
+def load_indicator_table(data_version):
+    """Latest rolling, z-score, lead/lag and turning-point indicators per loan category"""
+    return indicator_table(load_lending_standards_data(data_version), load_loan_demand_data(data_version))
+
+@st.cache_data(max_entries=2)
+def load_dashboard_aggregates(data_version):
+    """Load the precomputed dashboard rollups, latest-quarter snapshots and category stats"""
+    return {
+        'lending_trend': read_category_trends('lending_standards'),
+        'demand_trend': read_category_trends('loan_demand'),
+        'lending_latest': read_latest_snapshot('lending_standards'),
+        'demand_latest': read_latest_snapshot('loan_demand'),
+        'lending_stats': read_category_stats('lending_standards')
+    }
+
+@st.cache_resource
+def get_similar_query_index():
+    """Process-wide index of answered custom queries shared by all user sessions"""
+    return SimilarQueryIndex()
 
-@st.cache_data(ttl=3600)
-def load_loan_demand_data():
-    """Load loan demand data from database"""
-    session = get_session()
-    query = session.query(LoanDemand).all()
-    data = [{
-        'survey_date': record.survey_date,
-        'loan_category': record.loan_category,
-        'stronger_pct': record.stronger_pct,
-        'weaker_pct': record.weaker_pct,
-        'unchanged_pct': record.unchanged_pct,
-        'net_demand': record.net_demand,
-        'bank_type': record.bank_type
-    } for record in query]
-    session.close()
-    return pd.DataFrame(data)
+# Figures are cached per data version and filter state, so reruns (widget
+# clicks, page switches, other sessions) reuse them instead of rebuilding
+@st.cache_data(max_entries=4)
+def trend_figure(data_version, dataset):
+    """Dashboard trend chart of one dataset's per-category means"""
+    value_column = {'lending_standards': 'net_tightening', 'loan_demand': 'net_demand'}[dataset]
+    aggregates = load_dashboard_aggregates(data_version)
+    trend = aggregates['lending_trend' if dataset == 'lending_standards' else 'demand_trend']
+    fig = line_figure(trend, x='survey_date', y=value_column, color='loan_category',
+                      title='Lending Standards Over Time' if dataset == 'lending_standards' else 'Loan Demand Over Time',
+                      labels={'net_tightening': 'Net Tightening (%)', 'net_demand': 'Net Demand (%)',
+                              'survey_date': 'Survey Date'})
+    fig.update_layout(height=400, hovermode='x unified')
+    return fig
+
+@st.cache_data(max_entries=32)
+def explorer_figure(data_version, dataset, categories, bank_type=None, start=None, end=None, downsampled=True):
+    """Data Explorer chart for one filter state"""
+    value_column = {'lending_standards': 'net_tightening', 'loan_demand': 'net_demand'}[dataset]
+    rows = load_data_snapshot(data_version).rows(dataset, categories=list(categories), bank_type=bank_type,
+                                                 start=start, end=end)
+    return line_figure(rows, x='survey_date', y=value_column, color='loan_category',
+                       title='Net Tightening Over Time' if dataset == 'lending_standards' else 'Net Loan Demand Over Time',
+                       labels={'net_tightening': 'Net Tightening (%)', 'net_demand': 'Net Demand (%)',
+                               'survey_date': 'Date'},
+                       max_points=MAX_POINTS_PER_TRACE if downsampled else None)
+
+def load_data_summary(data_version):
+    """Row counts and date range for the Database Status tab, from a single query"""
+    ingestion = SLOOSDataIngestion()
+    try:
+        return ingestion.get_data_summary()
+    finally:
+        ingestion.close()
+
+# Everything a page can read through PageData, by name
+DATA_LOADERS = {
+    'snapshot': load_data_snapshot,
+    'lending_standards': load_lending_standards_data,
+    'loan_demand': load_loan_demand_data,
+    'indicators': load_indicator_table,
+    'dashboard_aggregates': load_dashboard_aggregates,
+    # Read directly rather than through st.cache_data: pre-generation finishes
+    # after the refresh has already bumped the data version
+    'standard_analyses': load_standard_analyses,
+    'data_summary': load_data_summary,
+}
+
+# What each page reads; nothing is loaded until the page asks for it
+PAGE_DATA_NEEDS = {
+    "📈 Dashboard": ('dashboard_aggregates',),
+    "🔍 Data Explorer": ('snapshot', 'indicators'),
+    "🤖 AI Analysis": ('lending_standards', 'loan_demand', 'standard_analyses'),
+    "💾 Data Management": ('data_summary',),
+}
+
+def snapshot_mean(snapshot):
+    """Row-weighted mean across the categories of a latest-quarter snapshot"""
+    if snapshot.empty or snapshot['observations'].sum() == 0:
+        return float('nan')
+    return (snapshot['mean_value'] * snapshot['observations']).sum() / snapshot['observations'].sum()
 
 def main():
     st.markdown('<div class="main-header">📊 SLOOS Interactive Data Analysis</div>', unsafe_allow_html=True)
     st.markdown('<div class="sub-header">Senior Loan Officer Opinion Survey - Powered by AWS Bedrock & Claude 3.5 Sonnet</div>', unsafe_allow_html=True)
     
     bedrock_analyzer = initialize_app()
+    data_version = read_data_version()
     
     with st.sidebar:
         st.image("https://www.federalreserve.gov/images/fed-logo.png", width=200)
@@ -98,7 +186,7 @@ def main():
         
         page = st.radio(
             "Select Analysis View",
-            ["📈 Dashboard", "🔍 Data Explorer", "🤖 AI Analysis", "💾 Data Management"],
+            list(PAGE_DATA_NEEDS),
             label_visibility="collapsed"
         )
         
@@ -117,49 +205,89 @@ def main():
         st.caption(f"🤖 Model: Claude 3.5 Sonnet")
         st.caption(f"🗄️ Database: SQLite")
         st.caption(f"☁️ Region: us-east-1")
+        if not bedrock_analyzer.uses_prompt_caching():
+            st.caption("🧊 Prompt caching: inactive for this model")
+        # Filled after the page renders so this rerun's AI calls are included
+        ai_metrics_panel = st.container()
+    
+    page_data = PageData(data_version, DATA_LOADERS, PAGE_DATA_NEEDS[page])
     
     if page == "📈 Dashboard":
-        show_dashboard()
+        show_dashboard(page_data)
     elif page == "🔍 Data Explorer":
-        show_data_explorer()
+        show_data_explorer(page_data)
     elif page == "🤖 AI Analysis":
-        show_ai_analysis(bedrock_analyzer)
+        show_ai_analysis(bedrock_analyzer, page_data)
     elif page == "💾 Data Management":
-        show_data_management()
+        show_data_management(page_data)
+    
+    with ai_metrics_panel:
+        show_ai_metrics(bedrock_analyzer)
+
+def format_seconds(value):
+    """Seconds with one decimal, or a dash when there is no measurement yet"""
+    return '–' if value is None else f"{value:.1f}s"
 
-def show_dashboard():
+def show_ai_metrics(bedrock_analyzer):
+    """AI cache, latency percentile and cost figures for the sidebar System Info panel"""
+    if bedrock_analyzer.cache is not None:
+        cache_stats = bedrock_analyzer.cache.stats()
+        st.caption(f"⚡ AI Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['entries'] or 0} stored)")
+    
+    query_stats = get_similar_query_index().stats()
+    if query_stats['hits'] + query_stats['misses']:
+        st.caption(f"♻️ Similar questions: {query_stats['hits']} reused / {query_stats['misses']} new")
+    
+    for model_id, breaker in bedrock_analyzer.breakers.items():
+        if breaker.state != 'closed':
+            st.caption(f"🚧 {model_id}: circuit {breaker.state.replace('_', '-')}, "
+                       f"next attempt in {breaker.retry_in():.0f}s")
+    
+    metrics = bedrock_analyzer.metrics
+    summary = metrics.summary()
+    if summary['calls'] == 0:
+        return
+    
+    st.caption(f"📈 AI calls: {summary['calls']} ({summary['errors']} failed, {summary['retries']} retries, "
+               f"{summary['fallbacks']} fallbacks) · ~${summary['cost_usd']:.4f}")
+    st.caption(f"⏱️ Latency p50/p95/p99: {format_seconds(summary['wall_time_p50'])} / "
+               f"{format_seconds(summary['wall_time_p95'])} / {format_seconds(summary['wall_time_p99'])}")
+    st.caption(f"📡 First byte p50/p95: {format_seconds(summary['time_to_first_byte_p50'])} / "
+               f"{format_seconds(summary['time_to_first_byte_p95'])}")
+    with st.expander("Export AI metrics"):
+        st.download_button("JSON", metrics.to_json(), file_name="ai_metrics.json", mime="application/json")
+        st.download_button("Prometheus", metrics.to_prometheus(), file_name="ai_metrics.prom", mime="text/plain")
+
+def show_dashboard(page_data):
     """Main dashboard with key metrics and visualizations"""
     st.header("📈 Executive Dashboard")
     
-    df_lending = load_lending_standards_data()
-    df_demand = load_loan_demand_data()
+    data_version = page_data.data_version
+    aggregates = page_data.get('dashboard_aggregates')
     
-    if df_lending.empty:
+    if aggregates['lending_trend'].empty:
         st.warning("⚠️ No data available. Please load data from the Data Management page.")
         return
     
-    # Ensure survey_date is datetime type
-    df_lending['survey_date'] = pd.to_datetime(df_lending['survey_date'])
-    df_demand['survey_date'] = pd.to_datetime(df_demand['survey_date'])
-    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        latest_date = df_lending['survey_date'].max()
+        latest_date = aggregates['lending_latest']['survey_date'].max()
         st.metric("Latest Survey", latest_date.strftime("%Y-%m-%d") if latest_date else "N/A")
     
     with col2:
-        avg_tightening = df_lending[df_lending['survey_date'] == latest_date]['net_tightening'].mean()
+        avg_tightening = snapshot_mean(aggregates['lending_latest'])
         st.metric("Avg Net Tightening", f"{avg_tightening:.1f}%", 
                  delta=f"{avg_tightening - 20:.1f}%" if avg_tightening else None)
     
     with col3:
-        avg_demand = df_demand[df_demand['survey_date'] == latest_date]['net_demand'].mean()
+        avg_demand = snapshot_mean(aggregates['demand_latest'])
         st.metric("Avg Net Demand", f"{avg_demand:.1f}%",
                  delta=f"{avg_demand - 5:.1f}%" if avg_demand else None)
     
     with col4:
-        total_categories = df_lending['loan_category'].nunique()
+        total_categories = len(aggregates['lending_stats'])
         st.metric("Loan Categories", total_categories)
     
     st.divider()
@@ -169,26 +297,12 @@ def show_dashboard():
     with col1:
         st.subheader("Net Tightening Trends by Loan Category")
         
-        df_trend = df_lending.groupby(['survey_date', 'loan_category'])['net_tightening'].mean().reset_index()
-        
-        fig = px.line(df_trend, x='survey_date', y='net_tightening', 
-                     color='loan_category',
-                     title='Lending Standards Over Time',
-                     labels={'net_tightening': 'Net Tightening (%)', 'survey_date': 'Survey Date'})
-        fig.update_layout(height=400, hovermode='x unified')
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(trend_figure(data_version, 'lending_standards'), use_container_width=True)
     
     with col2:
         st.subheader("Net Loan Demand by Category")
         
-        df_demand_trend = df_demand.groupby(['survey_date', 'loan_category'])['net_demand'].mean().reset_index()
-        
-        fig = px.line(df_demand_trend, x='survey_date', y='net_demand',
-                     color='loan_category',
-                     title='Loan Demand Over Time',
-                     labels={'net_demand': 'Net Demand (%)', 'survey_date': 'Survey Date'})
-        fig.update_layout(height=400, hovermode='x unified')
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(trend_figure(data_version, 'loan_demand'), use_container_width=True)
     
     st.divider()
     
@@ -197,7 +311,7 @@ def show_dashboard():
     col1, col2 = st.columns(2)
     
     with col1:
-        latest_lending = df_lending[df_lending['survey_date'] == latest_date].groupby('loan_category')['net_tightening'].mean().sort_values(ascending=False)
+        latest_lending = aggregates['lending_latest'].set_index('loan_category')['mean_value'].sort_values(ascending=False)
         
         fig = go.Figure(go.Bar(
             x=latest_lending.values,
@@ -213,7 +327,7 @@ def show_dashboard():
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        latest_demand = df_demand[df_demand['survey_date'] == latest_date].groupby('loan_category')['net_demand'].mean().sort_values(ascending=False)
+        latest_demand = aggregates['demand_latest'].set_index('loan_category')['mean_value'].sort_values(ascending=False)
         
         fig = go.Figure(go.Bar(
             x=latest_demand.values,
@@ -228,20 +342,47 @@ def show_dashboard():
         )
         st.plotly_chart(fig, use_container_width=True)
 
-def show_data_explorer():
+def show_table_page(dataset, data_version, key, **filters):
+    """Newest-first page of a filtered table with Previous/Next keyset navigation"""
+    # Cursors of the pages seen so far; any filter or data change starts over at page one
+    state_key = f'{key}_pages'
+    filter_state = (data_version, repr(sorted(filters.items())))
+    if st.session_state.get(state_key, {}).get('filters') != filter_state:
+        st.session_state[state_key] = {'filters': filter_state, 'cursors': [None]}
+    cursors = st.session_state[state_key]['cursors']
+    
+    page, next_cursor = read_page(dataset, after=cursors[-1], page_size=PAGE_SIZE, **filters)
+    total = estimate_row_count(dataset, **filters)
+    first_row = (len(cursors) - 1) * PAGE_SIZE
+    st.dataframe(page, use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("◀ Previous", key=f'{key}_previous', disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next ▶", key=f'{key}_next', disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with col3:
+        st.caption(f"Rows {first_row + 1 if len(page) else 0:,}-{first_row + len(page):,} of ~{total:,}")
+
+def show_data_explorer(page_data):
     """Detailed data exploration interface"""
     st.header("🔍 Data Explorer")
     
-    df_lending = load_lending_standards_data()
-    df_demand = load_loan_demand_data()
+    data_version = page_data.data_version
+    snapshot = page_data.get('snapshot')
+    df_lending = snapshot.lending_standards
+    df_demand = snapshot.loan_demand
     
     if df_lending.empty:
         st.warning("⚠️ No data available. Please load data from the Data Management page.")
         return
     
-    # Ensure survey_date is datetime type
-    df_lending['survey_date'] = pd.to_datetime(df_lending['survey_date'])
-    df_demand['survey_date'] = pd.to_datetime(df_demand['survey_date'])
+    downsampled = st.toggle("Downsample long series", value=True,
+                            help=f"Charts keep at most {MAX_POINTS_PER_TRACE} shape-preserving points per series")
     
     tab1, tab2, tab3 = st.tabs(["Lending Standards", "Loan Demand", "Comparative Analysis"])
     
@@ -274,25 +415,18 @@ def show_data_explorer():
                 max_value=max_date
             )
         
-        filtered_df = df_lending[df_lending['loan_category'].isin(selected_categories)]
-        if selected_bank_type != 'All':
-            filtered_df = filtered_df[filtered_df['bank_type'] == selected_bank_type]
-        if len(date_range) == 2:
-            # Convert date_range to datetime for comparison
-            start_date = pd.Timestamp(date_range[0])
-            end_date = pd.Timestamp(date_range[1])
-            filtered_df = filtered_df[
-                (filtered_df['survey_date'] >= start_date) &
-                (filtered_df['survey_date'] <= end_date)
-            ]
-        
-        fig = px.line(filtered_df, x='survey_date', y='net_tightening',
-                     color='loan_category',
-                     title='Net Tightening Over Time',
-                     labels={'net_tightening': 'Net Tightening (%)', 'survey_date': 'Date'})
-        st.plotly_chart(fig, use_container_width=True)
+        lending_filters = {
+            'categories': [str(category) for category in selected_categories],
+            'bank_type': None if selected_bank_type == 'All' else selected_bank_type,
+            'start': date_range[0] if len(date_range) == 2 else None,
+            'end': date_range[1] if len(date_range) == 2 else None
+        }
+        st.plotly_chart(explorer_figure(data_version, 'lending_standards', tuple(lending_filters['categories']),
+                                        lending_filters['bank_type'], lending_filters['start'],
+                                        lending_filters['end'], downsampled),
+                        use_container_width=True)
         
-        st.dataframe(filtered_df.sort_values('survey_date', ascending=False), use_container_width=True)
+        show_table_page('lending_standards', data_version, 'lending_table', **lending_filters)
     
     with tab2:
         st.subheader("Loan Demand Analysis")
@@ -314,17 +448,15 @@ def show_data_explorer():
                 key='demand_bank_type'
             )
         
-        filtered_demand = df_demand[df_demand['loan_category'].isin(selected_categories_demand)]
-        if selected_bank_type_demand != 'All':
-            filtered_demand = filtered_demand[filtered_demand['bank_type'] == selected_bank_type_demand]
+        demand_filters = {
+            'categories': [str(category) for category in selected_categories_demand],
+            'bank_type': None if selected_bank_type_demand == 'All' else selected_bank_type_demand
+        }
+        st.plotly_chart(explorer_figure(data_version, 'loan_demand', tuple(demand_filters['categories']),
+                                        demand_filters['bank_type'], downsampled=downsampled),
+                        use_container_width=True)
         
-        fig = px.line(filtered_demand, x='survey_date', y='net_demand',
-                     color='loan_category',
-                     title='Net Loan Demand Over Time',
-                     labels={'net_demand': 'Net Demand (%)', 'survey_date': 'Date'})
-        st.plotly_chart(fig, use_container_width=True)
-        
-        st.dataframe(filtered_demand.sort_values('survey_date', ascending=False), use_container_width=True)
+        show_table_page('loan_demand', data_version, 'demand_table', **demand_filters)
     
     with tab3:
         st.subheader("Comparative Analysis")
@@ -334,8 +466,8 @@ def show_data_explorer():
             options=df_lending['loan_category'].unique()
         )
         
-        category_lending = df_lending[df_lending['loan_category'] == selected_category]
-        category_demand = df_demand[df_demand['loan_category'] == selected_category]
+        category_lending = snapshot.rows('lending_standards', categories=[selected_category])
+        category_demand = snapshot.rows('loan_demand', categories=[selected_category])
         
         merged_data = pd.merge(
             category_lending[['survey_date', 'net_tightening', 'bank_type']],
@@ -361,49 +493,86 @@ def show_data_explorer():
         st.plotly_chart(fig, use_container_width=True)
         
         correlation = merged_data[['net_tightening', 'net_demand']].corr().iloc[0, 1]
-        st.metric("Correlation (Tightening vs Demand)", f"{correlation:.3f}")
+        indicators = page_data.get('indicators')
+        category_indicators = indicators[indicators['loan_category'] == selected_category]
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Correlation (Tightening vs Demand)", f"{correlation:.3f}")
+        if not category_indicators.empty:
+            row = category_indicators.iloc[0]
+            with col2:
+                if pd.notna(row['lead_lag']):
+                    lag = int(row['lead_lag'])
+                    st.metric("Peak Lead/Lag Correlation", f"{row['lead_lag_corr']:.3f}",
+                              help="Largest correlation of tightening with demand shifted up to 8 quarters",
+                              delta=f"tightening {'leads' if lag > 0 else 'lags' if lag < 0 else 'coincides'}"
+                                    f"{f' by {abs(lag)}Q' if lag else ''}", delta_color='off')
+            with col3:
+                if pd.notna(row['zscore']):
+                    st.metric("Tightening Z-Score vs History", f"{row['zscore']:+.2f}")
+        
+        with st.expander("Indicators for all categories"):
+            st.dataframe(indicators, use_container_width=True, hide_index=True)
+
+def render_analysis_stream(stream):
+    """Render streamed analysis text as it arrives, followed by its latency figures"""
+    st.write_stream(stream)
+    
+    metrics = stream.metrics
+    if metrics.get('cached'):
+        st.caption("⚡ Served from analysis cache")
+    elif metrics.get('time_to_first_token') is not None:
+        tokens_per_second = metrics.get('tokens_per_second')
+        input_tokens = metrics.get('input_tokens')
+        cache_read_tokens = metrics.get('cache_read_input_tokens') or 0
+        cache_write_tokens = metrics.get('cache_write_input_tokens') or 0
+        token_note = ''
+        if input_tokens is not None:
+            token_note = f" · {input_tokens + cache_read_tokens + cache_write_tokens:,} input tokens"
+            if cache_read_tokens:
+                token_note += f" ({cache_read_tokens:,} from prompt cache)"
+            elif cache_write_tokens:
+                token_note += f" ({cache_write_tokens:,} written to prompt cache)"
+        st.caption(f"⏱️ First token in {metrics['time_to_first_token']:.2f}s · "
+                   f"{tokens_per_second or 0:.1f} tokens/sec · {metrics.get('total_time', 0):.1f}s total{token_note}")
+
+def show_precomputed_analysis(analysis):
+    """Render a pre-generated standard analysis with when and by which model it was generated"""
+    st.markdown(analysis['analysis'])
+    st.caption(f"⚡ Pre-generated after the last data refresh "
+               f"({analysis['generated_at']:%Y-%m-%d %H:%M} UTC, {analysis['model']})")
 
-def show_ai_analysis(bedrock_analyzer):
+def show_ai_analysis(bedrock_analyzer, page_data):
     """AI-powered analysis using AWS Bedrock"""
     st.header("🤖 AI-Powered Analysis")
     
-    df_lending = load_lending_standards_data()
-    df_demand = load_loan_demand_data()
+    data_version = page_data.data_version
+    df_lending = page_data.get('lending_standards')
+    df_demand = page_data.get('loan_demand')
     
     if df_lending.empty:
         st.warning("⚠️ No data available. Please load data from the Data Management page.")
         return
     
-    # Ensure survey_date is datetime type
-    df_lending['survey_date'] = pd.to_datetime(df_lending['survey_date'])
-    df_demand['survey_date'] = pd.to_datetime(df_demand['survey_date'])
+    precomputed = page_data.get('standard_analyses')
     
     tab1, tab2, tab3, tab4 = st.tabs(["Executive Summary", "Sentiment Analysis", "Custom Query", "Period Comparison"])
     
     with tab1:
         st.subheader("📋 Executive Summary")
-        st.write("Generate an AI-powered executive summary of current SLOOS trends.")
         
-        if st.button("Generate Executive Summary", type="primary"):
-            with st.spinner("Analyzing data with Claude..."):
-                latest_date = df_lending['survey_date'].max()
-                recent_data = df_lending[df_lending['survey_date'] == latest_date]
-                
-                data_summary = f"""
-                Latest Survey Date: {latest_date}
-                
-                Lending Standards Summary:
-                {recent_data.groupby('loan_category')['net_tightening'].mean().to_string()}
-                
-                Average Net Tightening: {recent_data['net_tightening'].mean():.2f}%
-                
-                Loan Demand Summary:
-                {df_demand[df_demand['survey_date'] == latest_date].groupby('loan_category')['net_demand'].mean().to_string()}
-                """
-                
-                summary = bedrock_analyzer.summarize_trends(data_summary)
-                st.markdown("### Analysis Results")
-                st.markdown(summary)
+        if (EXECUTIVE_SUMMARY, '') in precomputed:
+            st.markdown("### Analysis Results")
+            show_precomputed_analysis(precomputed[(EXECUTIVE_SUMMARY, '')])
+        else:
+            st.write("Generate an AI-powered executive summary of current SLOOS trends.")
+            if st.button("Generate Executive Summary", type="primary"):
+                with st.spinner("Analyzing data with Claude..."):
+                    data_summary = build_executive_summary(df_lending, df_demand)
+                    summary = bedrock_analyzer.summarize_trends(data_summary, stream=True)
+                    st.markdown("### Analysis Results")
+                    render_analysis_stream(summary)
     
     with tab2:
         st.subheader("💭 Sentiment Analysis")
@@ -414,23 +583,47 @@ def show_ai_analysis(bedrock_analyzer):
             key='sentiment_category'
         )
         
-        if st.button("Analyze Sentiment", type="primary"):
-            with st.spinner("Performing sentiment analysis..."):
-                category_data = df_lending[df_lending['loan_category'] == selected_category]
-                recent_trend = category_data.tail(4)
-                
-                data_summary = f"""
-                Loan Category: {selected_category}
-                Recent Quarters Net Tightening:
-                {recent_trend[['survey_date', 'net_tightening', 'bank_type']].to_string()}
-                
-                Average Net Tightening (Recent): {recent_trend['net_tightening'].mean():.2f}%
-                Trend Direction: {'Increasing' if recent_trend['net_tightening'].iloc[-1] > recent_trend['net_tightening'].iloc[0] else 'Decreasing'}
-                """
-                
-                sentiment = bedrock_analyzer.sentiment_analysis(data_summary, selected_category)
-                st.markdown("### Sentiment Analysis Results")
-                st.markdown(sentiment)
+        col1, col2 = st.columns(2)
+        with col1:
+            analyze_one = st.button("Analyze Sentiment", type="primary")
+        with col2:
+            analyze_all = st.button("Analyze All Categories")
+        
+        if analyze_one:
+            st.markdown("### Sentiment Analysis Results")
+            if (CATEGORY_SENTIMENT, selected_category) in precomputed:
+                show_precomputed_analysis(precomputed[(CATEGORY_SENTIMENT, selected_category)])
+            else:
+                with st.spinner("Performing sentiment analysis..."):
+                    data_summary = build_sentiment_summary(df_lending, selected_category)
+                    sentiment = bedrock_analyzer.sentiment_analysis(data_summary, selected_category, stream=True)
+                    render_analysis_stream(sentiment)
+        
+        if analyze_all:
+            categories = list(df_lending['loan_category'].unique())
+            
+            st.markdown("### Sentiment by Category")
+            grid = st.columns(2)
+            placeholders = {}
+            for i, category in enumerate(categories):
+                with grid[i % 2]:
+                    st.markdown(f"#### {category}")
+                    placeholders[category] = st.empty()
+                    if (CATEGORY_SENTIMENT, category) in precomputed:
+                        placeholders[category].markdown(precomputed[(CATEGORY_SENTIMENT, category)]['analysis'])
+                    else:
+                        placeholders[category].info("⏳ Waiting for analysis...")
+            
+            # Only categories without a pre-generated analysis go to Bedrock;
+            # results arrive in completion order and each fills its own cell
+            missing = [category for category in categories if (CATEGORY_SENTIMENT, category) not in precomputed]
+            if missing:
+                category_summaries = {category: build_sentiment_summary(df_lending, category) for category in missing}
+                progress = st.progress(0.0, text=f"Analyzing {len(missing)} categories...")
+                for done, (category, sentiment) in enumerate(
+                        bedrock_analyzer.batch_sentiment_analysis(category_summaries), start=1):
+                    placeholders[category].markdown(sentiment)
+                    progress.progress(done / len(missing), text=f"{done}/{len(missing)} categories analyzed")
     
     with tab3:
         st.subheader("❓ Custom Query")
@@ -442,28 +635,40 @@ def show_ai_analysis(bedrock_analyzer):
             height=100
         )
         
+        token_budget = st.slider("Context token budget", min_value=250, max_value=8000,
+                                 value=DEFAULT_TOKEN_BUDGET, step=250,
+                                 help="Upper bound on the data context sent with the question")
+        
+        force_fresh = st.checkbox("Force a fresh answer",
+                                  help="Ask Claude again instead of reusing the answer to a similar earlier question")
+        
         if st.button("Get Answer", type="primary") and query:
             with st.spinner("Processing your query..."):
-                data_context = f"""
-                Available Data Summary:
-                - Date Range: {df_lending['survey_date'].min()} to {df_lending['survey_date'].max()}
-                - Loan Categories: {', '.join(df_lending['loan_category'].unique())}
-                - Bank Types: {', '.join(df_lending['bank_type'].unique())}
-                
-                Recent Lending Standards:
-                {df_lending.tail(20).to_string()}
+                query_context = build_query_context(query, df_lending, df_demand, token_budget)
+                st.caption(f"📎 Context: ~{query_context['input_tokens']:,} of {token_budget:,} tokens · "
+                           f"{query_context['series']} series at {query_context['resolution']} resolution"
+                           f"{' (truncated)' if query_context['truncated'] else ''}")
                 
-                Recent Loan Demand:
-                {df_demand.tail(20).to_string()}
-                """
-                
-                answer = bedrock_analyzer.custom_query(query, data_context)
+                query_index = get_similar_query_index()
+                match = None if force_fresh else query_index.lookup(query, query_context, data_version)
                 st.markdown("### Answer")
-                st.markdown(answer)
+                if match is not None:
+                    st.markdown(match['answer'])
+                    st.caption(f"♻️ Answer to a similar earlier question ({match['similarity']:.0%} match): "
+                               f"\"{match['query']}\"")
+                else:
+                    answer = bedrock_analyzer.custom_query(query, query_context['context'], stream=True,
+                                                           use_cache=not force_fresh)
+                    render_analysis_stream(answer)
+                    # Fallback-model answers are not reused, as in the response cache
+                    if answer.metrics.get('success') and not answer.metrics.get('fallback'):
+                        query_index.add(query, query_context, answer.text, answer.metrics.get('model'), data_version)
     
     with tab4:
         st.subheader("📊 Period Comparison")
         
+        # The last-year vs prior-year comparison is pre-generated; other periods go to Bedrock live
+        prior_year, last_year = year_over_year_periods(df_lending)
         col1, col2 = st.columns(2)
         
         with col1:
@@ -482,36 +687,53 @@ def show_ai_analysis(bedrock_analyzer):
                 key='period2'
             )
         
+        if (YEAR_OVER_YEAR, '') in precomputed:
+            st.caption(f"⚡ {prior_year[0]} – {prior_year[1]} vs {last_year[0]} – {last_year[1]} "
+                       "is pre-generated and shown instantly")
+        
         if st.button("Compare Periods", type="primary"):
-            with st.spinner("Comparing periods..."):
-                if len(period1_dates) == 2 and len(period2_dates) == 2:
-                    period1_data = df_lending[
-                        (df_lending['survey_date'] >= pd.Timestamp(period1_dates[0])) &
-                        (df_lending['survey_date'] <= pd.Timestamp(period1_dates[1]))
-                    ]
-                    
-                    period2_data = df_lending[
-                        (df_lending['survey_date'] >= pd.Timestamp(period2_dates[0])) &
-                        (df_lending['survey_date'] <= pd.Timestamp(period2_dates[1]))
-                    ]
-                    
-                    period1_summary = f"""
-                    Date Range: {period1_dates[0]} to {period1_dates[1]}
-                    Average Net Tightening by Category:
-                    {period1_data.groupby('loan_category')['net_tightening'].mean().to_string()}
-                    """
-                    
-                    period2_summary = f"""
-                    Date Range: {period2_dates[0]} to {period2_dates[1]}
-                    Average Net Tightening by Category:
-                    {period2_data.groupby('loan_category')['net_tightening'].mean().to_string()}
-                    """
-                    
-                    comparison = bedrock_analyzer.compare_periods(period1_summary, period2_summary)
-                    st.markdown("### Comparison Results")
-                    st.markdown(comparison)
+            if len(period1_dates) == 2 and len(period2_dates) == 2:
+                st.markdown("### Comparison Results")
+                if ((tuple(period1_dates), tuple(period2_dates)) == (prior_year, last_year)
+                        and (YEAR_OVER_YEAR, '') in precomputed):
+                    show_precomputed_analysis(precomputed[(YEAR_OVER_YEAR, '')])
+                else:
+                    with st.spinner("Comparing periods..."):
+                        period1_summary = build_period_summary(df_lending, *period1_dates)
+                        period2_summary = build_period_summary(df_lending, *period2_dates)
+                        comparison = bedrock_analyzer.compare_periods(period1_summary, period2_summary, stream=True)
+                        render_analysis_stream(comparison)
+
+@st.cache_resource
+def get_refresh_service():
+    """Process-wide refresh service shared by all user sessions"""
+    return RefreshService(analyzer=initialize_app())
 
-def show_data_management():
+def show_refresh_progress(progress):
+    """Render the state of the current or last FRED refresh"""
+    state = progress['state']
+    if state == 'idle':
+        return
+    
+    series_total = progress.get('series_total') or 0
+    series_done = progress.get('series_done') or 0
+    status = (f"{progress['mode'].capitalize()}: {series_done}/{series_total} series downloaded, "
+              f"{progress.get('rows_written', 0)} rows written, {progress.get('elapsed', 0):.1f}s elapsed")
+    
+    if state == 'running' and progress.get('stage') == 'generating analyses':
+        analyses_total = progress.get('analyses_total') or 0
+        analyses_done = progress.get('analyses_done') or 0
+        st.progress(analyses_done / analyses_total if analyses_total else 0.0,
+                    text=f"⏳ {status} (generating AI analyses: {analyses_done}/{analyses_total})")
+    elif state == 'running':
+        st.progress(series_done / series_total if series_total else 0.0,
+                    text=f"⏳ {status} ({progress.get('stage')})")
+    elif state == 'succeeded':
+        st.success(f"✅ Successfully loaded real SLOOS data from FRED! {status}")
+    else:
+        st.error(f"❌ Error loading data: {progress.get('error')}")
+
+def show_data_management(page_data):
     """Data management interface"""
     st.header("💾 Data Management")
     
@@ -527,21 +749,15 @@ def show_data_management():
             st.write("Download and load real SLOOS data from Federal Reserve Economic Data (FRED).")
             st.info("📊 This will download 9 FRED series with 35+ years of real data")
             
-            if st.button("Update Real Data from FRED", type="primary"):
-                with st.spinner("Downloading real SLOOS data from FRED..."):
-                    import subprocess
-                    result = subprocess.run(
-                        ["uv", "run", "python", "download_real_sloos_data.py"],
-                        capture_output=True,
-                        text=True
-                    )
-                    
-                    if result.returncode == 0:
-                        st.success("✅ Successfully loaded real SLOOS data from FRED!")
-                        st.cache_data.clear()
-                        st.info("Database now contains real Federal Reserve data")
-                    else:
-                        st.error(f"❌ Error loading data: {result.stderr}")
+            refresh_service = get_refresh_service()
+            full_refresh = st.checkbox("Full reload (clear and re-download all history)",
+                                       disabled=refresh_service.is_running())
+            
+            if st.button("Update Real Data from FRED", type="primary", disabled=refresh_service.is_running()):
+                if not refresh_service.start(full_refresh=full_refresh):
+                    st.warning("⚠️ A refresh is already running")
+            
+            show_refresh_progress(refresh_service.progress())
             
             st.markdown("---")
             st.markdown("**Data Source:** Federal Reserve Economic Data (FRED)")
@@ -575,9 +791,7 @@ def show_data_management():
     with tab2:
         st.subheader("Database Status")
         
-        ingestion = SLOOSDataIngestion()
-        summary = ingestion.get_data_summary()
-        ingestion.close()
+        summary = page_data.get('data_summary')
         
         col1, col2, col3 = st.columns(3)
         
@@ -596,15 +810,18 @@ def show_data_management():
         
         st.divider()
         
-        if st.button("Clear All Data", type="secondary"):
+        if st.button("Clear All Data", type="secondary", disabled=get_refresh_service().is_running()):
             if st.checkbox("I confirm I want to delete all data"):
-                session = get_session()
-                session.query(LendingStandard).delete()
-                session.query(LoanDemand).delete()
-                session.commit()
-                session.close()
+                with session_scope() as session:
+                    clear_observations(session)
+                    refresh_aggregates(session)
+                    bump_data_version(session)
                 st.success("All data cleared")
-                st.cache_data.clear()
+    
+    # Poll the background refresh until it finishes
+    if get_refresh_service().is_running():
+        time.sleep(1)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,309 @@
+"""
+asyncio-native counterpart of BedrockAnalyzer.
+
+Every in-flight request is a coroutine on one event loop instead of an OS
+thread, so batch report jobs can keep hundreds of prompts in flight. Requests
+support per-call deadlines and cancellation. Everything but the awaiting
+(prompts, request bodies, retry policy, model selection, result and stream
+parsing, the response cache) comes from bedrock_client's AnalyzerBase.
+
+aiobotocore is optional: pass any client exposing awaitable invoke_model /
+invoke_model_with_response_stream (e.g. tests.fake_bedrock.AsyncFakeBedrockClient),
+or install the async extra (pip install '.[async]') and let the analyzer
+create its own:
+
+    async with AsyncBedrockAnalyzer() as analyzer:
+        async for category, text in analyzer.batch_sentiment_analysis(summaries):
+            ...
+"""
+
+import asyncio
+import json
+import time
+from typing import Optional, Dict, Any, AsyncIterator, Tuple, Union, Callable
+
+from botocore.exceptions import ReadTimeoutError
+
+from ai_metrics import AnalysisMetrics
+from bedrock_client import (
+    AnalysisRequest, AnalyzerBase, StreamRecorder, as_request, cache_lookup, result_text, sentiment_requests,
+    summary_requests, summary_prompt, sentiment_prompt, custom_query_prompt, compare_periods_prompt
+)
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    get_session = None
+
+
+class AsyncStreamingAnalysis:
+    """Async iterable of text chunks from a streaming Bedrock call, with timing recorded as it is consumed"""
+
+    def __init__(self, chunks: AsyncIterator[str], metrics: Dict[str, Any]):
+        self._chunks = chunks
+        self.text = ''
+        self.metrics = metrics
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        async for chunk in self._chunks:
+            self.text += chunk
+            yield chunk
+
+
+class AsyncBedrockAnalyzer(AnalyzerBase):
+    def __init__(self, region_name='us-east-1', model_id='us.anthropic.claude-3-5-sonnet-20240620-v1:0', cache=None, client=None,
+                 max_concurrency: int = 64, requests_per_second: float = 2.0, burst: int = 4,
+                 timeout: Optional[float] = 120.0, prompt_caching: Optional[bool] = None,
+                 metrics: Optional[AnalysisMetrics] = None, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 4, backoff_seconds: float = 1.0, fallback_model_id: Optional[str] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        super().__init__(region_name, model_id, cache, prompt_caching, metrics, requests_per_second, burst,
+                         max_retries, backoff_seconds, fallback_model_id, failure_threshold, reset_timeout)
+        self.client = client
+        # timeout bounds a whole request; read_timeout bounds each attempt against one model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_concurrency = max_concurrency
+        self._client_context = None
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'AsyncBedrockAnalyzer':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Create the aiobotocore client unless one was injected"""
+        if self.client is not None:
+            return
+        if get_session is None:
+            raise ImportError("AsyncBedrockAnalyzer needs aiobotocore (pip install '.[async]') "
+                              "or an injected async client")
+        config = AioConfig(connect_timeout=self.connect_timeout, read_timeout=self.read_timeout,
+                           retries={'total_max_attempts': 1, 'mode': 'standard'})
+        self._client_context = get_session().create_client('bedrock-runtime', region_name=self.region_name,
+                                                           config=config)
+        self.client = await self._client_context.__aenter__()
+
+    async def close(self):
+        """Close the client if this analyzer created it"""
+        if self._client_context is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client_context = None
+            self.client = None
+
+    def _limit(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the loop that actually runs the requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _cache_lookup(self, prompt: str, context: Optional[str], max_tokens: int,
+                            temperature: float, top_p: float) -> Tuple[Optional[str], Optional[str]]:
+        # The cache is SQLite-backed; keep its I/O off the event loop
+        return await asyncio.to_thread(cache_lookup, self.cache, self.model_id, prompt, context,
+                                       max_tokens, temperature, top_p)
+
+    async def _cache_store(self, cache_key: Optional[str], prompt: str, analysis_text: str):
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, prompt, analysis_text, self.model_id)
+
+    async def _attempt(self, invoke: Callable, model_id: str, body: str):
+        try:
+            async with self._limit():
+                return await asyncio.wait_for(invoke(modelId=model_id, body=body), self.read_timeout)
+        except asyncio.TimeoutError:
+            # Report a slow attempt like botocore's read timeout, distinct from the request deadline
+            raise ReadTimeoutError(endpoint_url=f'bedrock-runtime/{model_id}') from None
+
+    async def _invoke_with_retry(self, invoke: Callable, model_id: str, body: str, call: Dict[str, Any]):
+        for attempt in range(self.max_retries + 1):
+            while (wait := self.rate_limiter.try_acquire()) > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await self._attempt(invoke, model_id, body)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, call)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self.rate_limiter.on_success()
+                return response
+
+    async def _call_bedrock(self, invoke: Callable, request_body: Callable[[str], Dict[str, Any]],
+                            call: Dict[str, Any]) -> Tuple[Any, str]:
+        """Invoke the first healthy model, retrying transient errors; returns (response, model_id)"""
+        last_error = None
+        for model_id in self.models():
+            last_error = self._circuit_open_error(model_id)
+            if last_error is not None:
+                continue
+            try:
+                response = await self._invoke_with_retry(invoke, model_id, json.dumps(request_body(model_id)), call)
+            except asyncio.CancelledError:
+                self.breakers[model_id].release()
+                raise
+            except Exception as e:
+                if not self._model_failed(model_id, e):
+                    raise
+                last_error = e
+                continue
+            self._model_succeeded(model_id)
+            return response, model_id
+        raise last_error
+
+    async def _invoke(self, call: Dict[str, Any], prompt: str, context: Optional[str], max_tokens: int,
+                      temperature: float, top_p: float) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response, model_id = await self._call_bedrock(
+            self.client.invoke_model, self._request_body(prompt, context, max_tokens, temperature, top_p), call)
+        time_to_first_byte = time.perf_counter() - start
+        return self._response_result(json.loads(await response['body'].read()), model_id, time_to_first_byte)
+
+    async def analyze_data(self, prompt: str, context: Optional[str] = None, max_tokens: int = 4096,
+                           temperature: float = 0.7, top_p: float = 0.9, use_cache: bool = True,
+                           timeout: Optional[float] = None, operation: str = 'analyze_data') -> Dict[str, Any]:
+        """Send analysis request to Claude via Bedrock, giving up after timeout seconds"""
+        start = time.perf_counter()
+        call = {'retries': 0}
+        result = await self._analyze_data(call, prompt, context, max_tokens, temperature, top_p, use_cache, timeout)
+        result.update(call, wall_time=time.perf_counter() - start)
+        self._record(operation, result, result['wall_time'])
+        return result
+
+    async def _analyze_data(self, call: Dict[str, Any], prompt: str, context: Optional[str], max_tokens: int,
+                            temperature: float, top_p: float, use_cache: bool,
+                            timeout: Optional[float]) -> Dict[str, Any]:
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key, cached_analysis = await self._cache_lookup(prompt, context, max_tokens, temperature, top_p)
+            if cached_analysis is not None:
+                return self._cached_result(cached_analysis)
+
+        deadline = timeout if timeout is not None else self.timeout
+        try:
+            result = await asyncio.wait_for(self._invoke(call, prompt, context, max_tokens, temperature, top_p),
+                                            deadline)
+            if self._cacheable(result, cache_key):
+                await self._cache_store(cache_key, prompt, result['analysis'])
+            return result
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'error': f'Timed out after {deadline}s',
+                'error_code': 'Timeout'
+            }
+        except Exception as e:
+            # CancelledError is not an Exception, so cancellation still propagates to the caller
+            return self._error_result(e)
+
+    def analyze_data_stream(self, prompt: str, context: Optional[str] = None, max_tokens: int = 4096,
+                            temperature: float = 0.7, top_p: float = 0.9, use_cache: bool = True,
+                            operation: str = 'analyze_data') -> AsyncStreamingAnalysis:
+        """Stream analysis text from Claude via Bedrock as it is generated"""
+        metrics: Dict[str, Any] = {}
+        chunks = self._generate_stream(metrics, prompt, context, max_tokens, temperature, top_p, use_cache)
+        return AsyncStreamingAnalysis(self._recorded_stream(operation, metrics, chunks), metrics)
+
+    async def _recorded_stream(self, operation: str, metrics: Dict[str, Any],
+                               chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+            self._record(operation, metrics, metrics.get('total_time'))
+
+    async def _generate_stream(self, metrics: Dict[str, Any], prompt: str, context: Optional[str], max_tokens: int,
+                               temperature: float, top_p: float, use_cache: bool) -> AsyncIterator[str]:
+        stream = StreamRecorder(metrics, self.model_id)
+
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key, cached_analysis = await self._cache_lookup(prompt, context, max_tokens, temperature, top_p)
+            if cached_analysis is not None:
+                yield stream.from_cache(cached_analysis)
+                stream.finish()
+                return
+
+        try:
+            response, model_id = await self._call_bedrock(
+                self.client.invoke_model_with_response_stream,
+                self._request_body(prompt, context, max_tokens, temperature, top_p), metrics)
+            stream.connected(model_id)
+            async for event in response['body']:
+                delta_text = stream.text(event)
+                if delta_text:
+                    yield delta_text
+        except Exception as e:
+            yield stream.failed(e)
+            return
+        finally:
+            stream.finish()
+
+        error = stream.complete()
+        if error:
+            yield error
+        elif stream.cacheable():
+            await self._cache_store(cache_key, prompt, ''.join(stream.text_parts))
+
+    async def _run_analysis(self, operation: str, request: AnalysisRequest, error_message: str, stream: bool,
+                            use_cache: bool = True):
+        context, prompt = request
+        if stream:
+            return self.analyze_data_stream(prompt, context, use_cache=use_cache, operation=operation)
+        return result_text(await self.analyze_data(prompt, context, use_cache=use_cache, operation=operation),
+                           error_message)
+
+    async def summarize_trends(self, data_summary: str, stream: bool = False) -> Union[str, AsyncStreamingAnalysis]:
+        """Generate executive summary of SLOOS trends"""
+        return await self._run_analysis('summarize_trends', summary_prompt(data_summary), 'Error generating summary', stream)
+
+    async def sentiment_analysis(self, data_summary: str, loan_category: str, stream: bool = False) -> Union[str, AsyncStreamingAnalysis]:
+        """Perform sentiment analysis on specific loan category"""
+        return await self._run_analysis('sentiment_analysis', sentiment_prompt(data_summary, loan_category), 'Error generating sentiment analysis', stream)
+
+    async def custom_query(self, query: str, data_context: str, stream: bool = False,
+                           use_cache: bool = True) -> Union[str, AsyncStreamingAnalysis]:
+        """Answer custom questions about SLOOS data; use_cache=False forces a fresh answer"""
+        return await self._run_analysis('custom_query', custom_query_prompt(query, data_context),
+                                        'Error processing query', stream, use_cache)
+
+    async def compare_periods(self, period1_data: str, period2_data: str, stream: bool = False) -> Union[str, AsyncStreamingAnalysis]:
+        """Compare SLOOS data between two time periods"""
+        return await self._run_analysis('compare_periods', compare_periods_prompt(period1_data, period2_data), 'Error comparing periods', stream)
+
+    async def batch_analyze(self, prompts: Dict[str, Union[str, AnalysisRequest]], timeout: Optional[float] = None,
+                            operation: str = 'batch_analyze',
+                            ordered: bool = False) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run many prompts concurrently, yielding (key, result) pairs as each one completes (or in input order)"""
+        async def run(key: str, request: Union[str, AnalysisRequest]) -> Tuple[str, Dict[str, Any]]:
+            context, prompt = as_request(request)
+            return key, await self.analyze_data(prompt, context, timeout=timeout, operation=operation)
+
+        tasks = [asyncio.ensure_future(run(key, request)) for key, request in prompts.items()]
+        try:
+            for next_done in (tasks if ordered else asyncio.as_completed(tasks)):
+                yield await next_done
+        finally:
+            # Closing or cancelling the consumer cancels whatever is still in flight
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def batch_sentiment_analysis(self, category_summaries: Dict[str, str], **batch_options) -> AsyncIterator[Tuple[str, str]]:
+        """Sentiment analysis for many loan categories at once, yielding (category, text) as each completes"""
+        results = self.batch_analyze(sentiment_requests(category_summaries), operation='sentiment_analysis', **batch_options)
+        async for category, result in results:
+            yield category, result_text(result)
+
+    async def batch_summarize_trends(self, category_summaries: Dict[str, str], **batch_options) -> AsyncIterator[Tuple[str, str]]:
+        """Trend summaries for many loan categories at once, yielding (category, text) as each completes"""
+        results = self.batch_analyze(summary_requests(category_summaries), operation='summarize_trends', **batch_options)
+        async for category, result in results:
+            yield category, result_text(result)
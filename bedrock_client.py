@@ -1,64 +1,57 @@
 import boto3
 import json
-from typing import Optional, Dict, Any
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Iterator, Tuple, Union, Callable
 
-class BedrockAnalyzer:
-    def __init__(self, region_name='us-east-1', model_id='us.anthropic.claude-3-5-sonnet-20240620-v1:0'):
-        self.region_name = region_name
-        self.model_id = model_id
-        self.client = boto3.client('bedrock-runtime', region_name=region_name)
-    
-    def analyze_data(self, prompt: str, context: Optional[str] = None, max_tokens: int = 4096) -> Dict[str, Any]:
-        """Send analysis request to Claude via Bedrock"""
-        try:
-            full_prompt = prompt
-            if context:
-                full_prompt = f"Context:\n{context}\n\nQuestion:\n{prompt}"
-            
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9
-            }
-            
-            response = self.client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body)
-            )
-            
-            response_body = json.loads(response['body'].read())
-            
-            if 'content' in response_body and len(response_body['content']) > 0:
-                analysis_text = response_body['content'][0]['text']
-                return {
-                    'success': True,
-                    'analysis': analysis_text,
-                    'model': self.model_id
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'No content in response'
-                }
-        
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
-    
-    def summarize_trends(self, data_summary: str) -> str:
-        """Generate executive summary of SLOOS trends"""
-        prompt = f"""Analyze the following SLOOS (Senior Loan Officer Opinion Survey) data and provide an executive summary of key trends:
+from botocore.config import Config
+
+from ai_metrics import AnalysisMetrics, TOKEN_FIELDS
+
+# Bedrock error codes that mean "slow down" rather than "this request is bad"
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'}
+
+# Transient failures worth retrying with backoff
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {'InternalServerException', 'ModelNotReadyException'}
+
+# Failures that mean the endpoint itself is degraded: they trip the circuit breaker
+# and trigger the fallback model. Client errors such as ValidationException do not.
+ENDPOINT_FAILURE_CODES = RETRYABLE_ERROR_CODES | {
+    'ReadTimeoutError', 'ConnectTimeoutError', 'EndpointConnectionError', 'ConnectionClosedError',
+    'ModelTimeoutException', 'CircuitOpenError'
+}
+
+
+# Stable instructions sent as the system prompt of every request. Together with
+# the data context they form the cacheable prefix; only the task varies per call.
+SLOOS_SYSTEM_PROMPT = """You are a senior credit analyst interpreting the Federal Reserve's Senior Loan Officer Opinion Survey on Bank Lending Practices (SLOOS).
 
-{data_summary}
+About the data:
+- SLOOS is a quarterly survey of up to 80 large domestic banks and 24 U.S. branches and agencies of foreign banks.
+- Lending standards are reported as net percentages: the share of banks reporting tighter standards minus the share reporting easier standards. Positive values mean net tightening, negative values mean net easing.
+- Loan demand is reported the same way: the share of banks reporting stronger demand minus the share reporting weaker demand. Positive values mean demand is strengthening.
+- Readings near zero mean standards or demand were broadly unchanged. Readings above +20 are historically associated with credit contractions; the largest readings occurred in 1990, 2001, 2008 and 2020.
+- Commercial and industrial (C&I) loans are reported separately for large and middle-market firms and for small firms. Household categories include residential mortgages, credit cards, auto loans and other consumer loans.
+
+How to answer:
+- Ground every statement in the figures provided and cite the relevant values and dates.
+- Distinguish the level of a series from its direction of change.
+- Call out divergences between standards and demand and between categories.
+- Be concise and structured, and write for financial decision-makers."""
+
+# Bedrock model families that accept cache_control prompt caching markers
+PROMPT_CACHING_MODELS = ('claude-3-5-haiku', 'claude-3-5-sonnet-20241022', 'claude-3-7-sonnet',
+                         'claude-sonnet-4', 'claude-opus-4', 'claude-haiku-4')
+
+# An analysis request is (data context, task instructions): the context is cacheable, the task varies
+AnalysisRequest = Tuple[Optional[str], str]
+
+
+def summary_prompt(data_summary: str) -> AnalysisRequest:
+    """Request for the executive summary of SLOOS trends"""
+    return data_summary, """Analyze the SLOOS data above and provide an executive summary of key trends.
 
 Please provide:
 1. Overall credit conditions assessment
@@ -68,54 +61,629 @@ Please provide:
 5. Forward-looking implications
 
 Keep the summary concise and actionable for financial decision-makers."""
-        
-        result = self.analyze_data(prompt)
-        return result.get('analysis', 'Error generating summary') if result['success'] else f"Error: {result.get('error')}"
-    
-    def sentiment_analysis(self, data_summary: str, loan_category: str) -> str:
-        """Perform sentiment analysis on specific loan category"""
-        prompt = f"""Analyze the sentiment and trends for {loan_category} based on the following SLOOS data:
 
-{data_summary}
+
+def sentiment_prompt(data_summary: str, loan_category: str) -> AnalysisRequest:
+    """Request for sentiment analysis of one loan category"""
+    return data_summary, f"""Analyze the sentiment and trends for {loan_category} based on the SLOOS data above.
 
 Provide:
 1. Sentiment score (positive/neutral/negative)
 2. Trend direction (tightening/stable/easing)
 3. Key factors driving the sentiment
 4. Comparison to other loan categories if relevant"""
-        
-        result = self.analyze_data(prompt)
-        return result.get('analysis', 'Error generating sentiment analysis') if result['success'] else f"Error: {result.get('error')}"
-    
-    def custom_query(self, query: str, data_context: str) -> str:
-        """Answer custom questions about SLOOS data"""
-        prompt = f"""Based on the following SLOOS data, please answer this question:
 
-Question: {query}
 
-Data Context:
-{data_context}
+def custom_query_prompt(query: str, data_context: str) -> AnalysisRequest:
+    """Request for a free-form question about SLOOS data"""
+    return data_context, f"""Based on the SLOOS data above, please answer this question:
+
+Question: {query}
 
 Provide a detailed, data-driven answer with specific insights and trends."""
-        
-        result = self.analyze_data(prompt)
-        return result.get('analysis', 'Error processing query') if result['success'] else f"Error: {result.get('error')}"
-    
-    def compare_periods(self, period1_data: str, period2_data: str) -> str:
-        """Compare SLOOS data between two time periods"""
-        prompt = f"""Compare the following two periods of SLOOS data and identify key changes:
 
-Period 1:
+
+def compare_periods_prompt(period1_data: str, period2_data: str) -> AnalysisRequest:
+    """Request comparing two periods of SLOOS data"""
+    return f"""Period 1:
 {period1_data}
 
 Period 2:
-{period2_data}
+{period2_data}""", """Compare the two periods of SLOOS data above and identify key changes.
 
 Highlight:
 1. Major shifts in lending standards
 2. Changes in loan demand patterns
 3. Emerging risks or opportunities
 4. Sector-specific trends"""
+
+
+def supports_prompt_caching(model_id: str) -> bool:
+    """Whether Bedrock accepts cache_control markers for this model"""
+    return any(family in model_id for family in PROMPT_CACHING_MODELS)
+
+
+def as_request(request: Union[str, AnalysisRequest]) -> AnalysisRequest:
+    """Normalize a bare prompt string to a (context, prompt) request"""
+    return request if isinstance(request, tuple) else (None, request)
+
+
+def build_request_body(prompt: str, context: Optional[str], max_tokens: int,
+                       temperature: float, top_p: float, prompt_caching: bool = False) -> Dict[str, Any]:
+    """Anthropic Messages API request body: cacheable system prompt and data context, then the task"""
+    cache_marker = {'cache_control': {'type': 'ephemeral'}} if prompt_caching else {}
+    
+    content = []
+    if context:
+        content.append({"type": "text", "text": f"Context:\n{context}", **cache_marker})
+    content.append({"type": "text", "text": prompt})
+    
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "system": [{"type": "text", "text": SLOOS_SYSTEM_PROMPT, **cache_marker}],
+        "messages": [
+            {
+                "role": "user",
+                "content": content
+            }
+        ],
+        "temperature": temperature,
+        "top_p": top_p
+    }
+
+
+def usage_metrics(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Token counts from a Messages API usage block, split into uncached and cache read/write input"""
+    return {
+        'input_tokens': usage.get('input_tokens'),
+        'cache_read_input_tokens': usage.get('cache_read_input_tokens', 0),
+        'cache_write_input_tokens': usage.get('cache_creation_input_tokens', 0),
+    }
+
+
+def cache_lookup(cache, model_id: str, prompt: str, context: Optional[str], max_tokens: int,
+                 temperature: float, top_p: float) -> Tuple[Optional[str], Optional[str]]:
+    """Return (cache_key, cached_analysis); both None when caching is unavailable"""
+    try:
+        cache_key = cache.make_key(model_id, prompt, context, {
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'top_p': top_p,
+            'system': SLOOS_SYSTEM_PROMPT
+        })
+        return cache_key, cache.get(cache_key)
+    except Exception as e:
+        print(f"Analysis cache unavailable: {e}")
+        return None, None
+
+
+def error_code(error: Exception) -> str:
+    """botocore error code of an exception, or its class name for non-AWS errors"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') or type(error).__name__
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit breaker is open"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how many requests start per second.
+    
+    The rate adapts: it halves on every throttle and creeps back up to the
+    configured rate as requests succeed.
+    """
+    
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None, min_rate: Optional[float] = None):
+        self.rate = rate_per_second
+        self.max_rate = rate_per_second
+        self.min_rate = min_rate if min_rate is not None else rate_per_second / 8
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return how many seconds until one will be"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+    
+    def on_throttle(self):
+        """Back off: halve the request rate and drop any saved-up burst"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+    
+    def on_success(self):
+        """Recover the request rate additively towards its configured maximum"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Fast-fails calls to an endpoint after repeated failures, probing again after a cool-down"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+    
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe call through"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+    
+    def allow(self) -> bool:
+        """Whether a call may proceed; in the half-open state only one probe call at a time"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+    
+    def release(self):
+        """End a probe call that neither proved nor disproved the endpoint's health"""
+        with self._lock:
+            self._probing = False
+
+
+def result_text(result: Dict[str, Any], error_message: str = '') -> str:
+    """Analysis text of an analyze_data() result, or its error"""
+    return result.get('analysis', error_message) if result['success'] else f"Error: {result.get('error')}"
+
+
+def sentiment_requests(category_summaries: Dict[str, str]) -> Dict[str, AnalysisRequest]:
+    """Sentiment requests keyed by loan category"""
+    return {category: sentiment_prompt(summary, category) for category, summary in category_summaries.items()}
+
+
+def summary_requests(category_summaries: Dict[str, str]) -> Dict[str, AnalysisRequest]:
+    """Trend summary requests keyed by loan category"""
+    return {category: summary_prompt(summary) for category, summary in category_summaries.items()}
+
+
+class StreamingAnalysis:
+    """Iterable of text chunks from a streaming Bedrock call, with timing recorded as it is consumed"""
+    
+    def __init__(self, chunks: Iterator[str], metrics: Dict[str, Any]):
+        self._chunks = chunks
+        self.text = ''
+        self.metrics = metrics
+    
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            self.text += chunk
+            yield chunk
+
+
+class StreamRecorder:
+    """Parses the events of one streaming call into text and fills in its timing and token metrics"""
+    
+    def __init__(self, metrics: Dict[str, Any], model_id: str):
+        metrics.update({'model': model_id, 'cached': False, 'success': False,
+                        'time_to_first_byte': None, 'time_to_first_token': None, 'tokens_per_second': None,
+                        'input_tokens': None, 'output_tokens': None,
+                        'cache_read_input_tokens': None, 'cache_write_input_tokens': None, 'retries': 0})
+        self.metrics = metrics
+        self.primary_model_id = model_id
+        self.start = time.perf_counter()
+        self.text_parts = []
+        self.first_token_at = None
+    
+    def from_cache(self, analysis: str) -> str:
+        """A cached answer, served as the whole stream"""
+        self.metrics.update({'cached': True, 'success': True, 'time_to_first_token': time.perf_counter() - self.start})
+        return analysis
+    
+    def connected(self, model_id: str):
+        self.metrics.update({'model': model_id, 'fallback': model_id != self.primary_model_id,
+                             'time_to_first_byte': time.perf_counter() - self.start})
+    
+    def text(self, event: Dict[str, Any]) -> Optional[str]:
+        """Text delta carried by a response stream event, recording usage and first-token time on the way"""
+        if 'chunk' not in event:
+            return None
+        payload = json.loads(event['chunk']['bytes'])
+        event_type = payload.get('type')
+        
+        if event_type == 'message_start':
+            self.metrics.update(usage_metrics(payload.get('message', {}).get('usage', {})))
+        elif event_type == 'content_block_delta':
+            delta_text = payload.get('delta', {}).get('text', '')
+            if not delta_text:
+                return None
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+                self.metrics['time_to_first_token'] = self.first_token_at - self.start
+            self.text_parts.append(delta_text)
+            return delta_text
+        elif event_type == 'message_delta':
+            self.metrics['output_tokens'] = payload.get('usage', {}).get('output_tokens')
+        return None
+    
+    def failed(self, error: Exception) -> str:
+        """Text shown in place of the rest of the answer when the call fails"""
+        self.metrics['error'] = str(error)
+        self.metrics['error_code'] = error_code(error)
+        return f"\n\nError: {error}"
+    
+    def finish(self):
+        """Record total time and generation speed; runs however the stream ends"""
+        end = time.perf_counter()
+        self.metrics['total_time'] = end - self.start
+        if self.first_token_at is not None:
+            output_tokens = self.metrics['output_tokens'] or len(self.text_parts)
+            generation_time = end - self.first_token_at
+            self.metrics['tokens_per_second'] = output_tokens / generation_time if generation_time > 0 else None
+    
+    def complete(self) -> Optional[str]:
+        """Mark a finished stream successful, or return the error text when it carried no content"""
+        if not self.text_parts:
+            self.metrics['error'] = 'No content in response'
+            return "Error: No content in response"
+        self.metrics['success'] = True
+        return None
+    
+    def cacheable(self) -> bool:
+        """Whether the answer may be cached: fallback answers are not stored under the primary model's key"""
+        return self.metrics['success'] and self.metrics['model'] == self.primary_model_id
+
+
+class AnalyzerBase:
+    """Model selection, retry policy, request bodies and result building shared by the sync and async analyzers.
+    
+    Subclasses only add the I/O: invoking the client, sleeping between retries and reading responses.
+    """
+    
+    def __init__(self, region_name: str, model_id: str, cache, prompt_caching: Optional[bool],
+                 metrics: Optional[AnalysisMetrics], requests_per_second: float, burst: int, max_retries: int,
+                 backoff_seconds: float, fallback_model_id: Optional[str], failure_threshold: int,
+                 reset_timeout: float):
+        self.region_name = region_name
+        self.model_id = model_id
+        self.fallback_model_id = fallback_model_id
+        # None marks the system prompt and data context as cacheable on models that support it
+        self.prompt_caching = prompt_caching
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        # Shared by every call on this analyzer, so concurrent sessions share one request budget
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.breakers = {model: CircuitBreaker(failure_threshold, reset_timeout) for model in self.models()}
+        self.metrics = metrics if metrics is not None else AnalysisMetrics()
+    
+    def models(self) -> list:
+        """Model ids to try, in order: the primary model, then the fallback if configured"""
+        return [self.model_id] + ([self.fallback_model_id] if self.fallback_model_id else [])
+    
+    def uses_prompt_caching(self, model_id: Optional[str] = None) -> bool:
+        """Whether requests to model_id (default: the primary model) carry cache_control markers"""
+        model_id = model_id or self.model_id
+        return supports_prompt_caching(model_id) if self.prompt_caching is None else self.prompt_caching
+    
+    def _build_request_body(self, prompt: str, context: Optional[str], max_tokens: int,
+                            temperature: float, top_p: float, model_id: Optional[str] = None) -> Dict[str, Any]:
+        return build_request_body(prompt, context, max_tokens, temperature, top_p, self.uses_prompt_caching(model_id))
+    
+    def _request_body(self, prompt: str, context: Optional[str], max_tokens: int,
+                      temperature: float, top_p: float) -> Callable[[str], Dict[str, Any]]:
+        """Request body for whichever model ends up being called"""
+        return lambda model_id: self._build_request_body(prompt, context, max_tokens, temperature, top_p, model_id)
+    
+    def _retry_delay(self, error: Exception, attempt: int, call: Dict[str, Any]) -> Optional[float]:
+        """Seconds to back off before retrying a failed attempt, or None when it should not be retried.
+
+        Retries are counted into call, the metrics of the call being made.
+        """
+        code = error_code(error)
+        if code in THROTTLING_ERROR_CODES:
+            self.rate_limiter.on_throttle()
+        if code not in RETRYABLE_ERROR_CODES or attempt == self.max_retries:
+            return None
+        call['retries'] += 1
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff_seconds * 2 ** attempt)
+    
+    def _circuit_open_error(self, model_id: str) -> Optional[CircuitOpenError]:
+        """The error to report instead of calling model_id, or None when its breaker lets the call through"""
+        breaker = self.breakers[model_id]
+        if breaker.allow():
+            return None
+        return CircuitOpenError(f"{model_id} is temporarily unavailable, retrying in {breaker.retry_in():.0f}s")
+    
+    def _model_failed(self, model_id: str, error: Exception) -> bool:
+        """Record a failed call on model_id's breaker; False when the request, not the endpoint, was at fault"""
+        breaker = self.breakers[model_id]
+        if error_code(error) not in ENDPOINT_FAILURE_CODES:
+            breaker.release()
+            return False
+        breaker.record_failure()
+        return True
+    
+    def _model_succeeded(self, model_id: str):
+        self.breakers[model_id].record_success()
+        if model_id != self.model_id:
+            self.metrics.record_fallback()
+    
+    def _cached_result(self, analysis: str) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'analysis': analysis,
+            'model': self.model_id,
+            'cached': True
+        }
+    
+    def _response_result(self, response_body: Dict[str, Any], model_id: str,
+                         time_to_first_byte: Optional[float]) -> Dict[str, Any]:
+        if 'content' in response_body and len(response_body['content']) > 0:
+            return {
+                'success': True,
+                'analysis': response_body['content'][0]['text'],
+                'model': model_id,
+                'fallback': model_id != self.model_id,
+                'cached': False,
+                'time_to_first_byte': time_to_first_byte,
+                'output_tokens': response_body.get('usage', {}).get('output_tokens'),
+                **usage_metrics(response_body.get('usage', {}))
+            }
+        return {
+            'success': False,
+            'error': 'No content in response'
+        }
+    
+    @staticmethod
+    def _error_result(error: Exception) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': str(error),
+            'error_code': error_code(error)
+        }
+    
+    def _cacheable(self, result: Dict[str, Any], cache_key: Optional[str]) -> bool:
+        # Fallback answers are not cached under the primary model's key
+        return cache_key is not None and result['success'] and result['model'] == self.model_id
+    
+    def _record(self, operation: str, outcome: Dict[str, Any], wall_time: float):
+        self.metrics.record(
+            outcome.get('model') or self.model_id, operation,
+            success=outcome.get('success', False),
+            cached=outcome.get('cached', False),
+            wall_time=wall_time,
+            time_to_first_byte=outcome.get('time_to_first_byte'),
+            time_to_first_token=outcome.get('time_to_first_token'),
+            error_code=outcome.get('error_code'),
+            retries=outcome.get('retries', 0),
+            **{field: outcome.get(field) for field in TOKEN_FIELDS}
+        )
+
+
+class BedrockAnalyzer(AnalyzerBase):
+    def __init__(self, region_name='us-east-1', model_id='us.anthropic.claude-3-5-sonnet-20240620-v1:0', cache=None, client=None,
+                 requests_per_second: float = 2.0, burst: int = 4, prompt_caching: Optional[bool] = None,
+                 metrics: Optional[AnalysisMetrics] = None, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 4, backoff_seconds: float = 1.0, fallback_model_id: Optional[str] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        super().__init__(region_name, model_id, cache, prompt_caching, metrics, requests_per_second, burst,
+                         max_retries, backoff_seconds, fallback_model_id, failure_threshold, reset_timeout)
+        if client is None:
+            # Retries are handled below (adaptive rate, circuit breaker, fallback), so botocore makes one attempt
+            config = Config(connect_timeout=connect_timeout, read_timeout=read_timeout,
+                            retries={'total_max_attempts': 1, 'mode': 'standard'})
+            client = boto3.client('bedrock-runtime', region_name=region_name, config=config)
+        self.client = client
+    
+    def _invoke_with_retry(self, invoke: Callable, model_id: str, body: str, call: Dict[str, Any]):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = invoke(modelId=model_id, body=body)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, call)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self.rate_limiter.on_success()
+                return response
+    
+    def _call_bedrock(self, invoke: Callable, request_body: Callable[[str], Dict[str, Any]],
+                      call: Dict[str, Any]) -> Tuple[Any, str]:
+        """Invoke the first healthy model, retrying transient errors; returns (response, model_id)"""
+        last_error = None
+        for model_id in self.models():
+            last_error = self._circuit_open_error(model_id)
+            if last_error is not None:
+                continue
+            try:
+                response = self._invoke_with_retry(invoke, model_id, json.dumps(request_body(model_id)), call)
+            except Exception as e:
+                if not self._model_failed(model_id, e):
+                    raise
+                last_error = e
+                continue
+            self._model_succeeded(model_id)
+            return response, model_id
+        raise last_error
+    
+    def _cache_lookup(self, prompt: str, context: Optional[str], max_tokens: int,
+                      temperature: float, top_p: float) -> Tuple[Optional[str], Optional[str]]:
+        """Return (cache_key, cached_analysis); both None when caching is unavailable"""
+        return cache_lookup(self.cache, self.model_id, prompt, context, max_tokens, temperature, top_p)
+    
+    def analyze_data(self, prompt: str, context: Optional[str] = None, max_tokens: int = 4096,
+                     temperature: float = 0.7, top_p: float = 0.9, use_cache: bool = True,
+                     operation: str = 'analyze_data') -> Dict[str, Any]:
+        """Send analysis request to Claude via Bedrock"""
+        start = time.perf_counter()
+        call = {'retries': 0}
+        result = self._analyze_data(start, call, prompt, context, max_tokens, temperature, top_p, use_cache)
+        result.update(call, wall_time=time.perf_counter() - start)
+        self._record(operation, result, result['wall_time'])
+        return result
+    
+    def _analyze_data(self, start: float, call: Dict[str, Any], prompt: str, context: Optional[str], max_tokens: int,
+                      temperature: float, top_p: float, use_cache: bool) -> Dict[str, Any]:
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key, cached_analysis = self._cache_lookup(prompt, context, max_tokens, temperature, top_p)
+            if cached_analysis is not None:
+                return self._cached_result(cached_analysis)
         
-        result = self.analyze_data(prompt)
-        return result.get('analysis', 'Error comparing periods') if result['success'] else f"Error: {result.get('error')}"
+        try:
+            response, model_id = self._call_bedrock(
+                self.client.invoke_model, self._request_body(prompt, context, max_tokens, temperature, top_p), call)
+            time_to_first_byte = time.perf_counter() - start
+            result = self._response_result(json.loads(response['body'].read()), model_id, time_to_first_byte)
+            if self._cacheable(result, cache_key):
+                self.cache.set(cache_key, prompt, result['analysis'], self.model_id)
+            return result
+        except Exception as e:
+            return self._error_result(e)
+    
+    def analyze_data_stream(self, prompt: str, context: Optional[str] = None, max_tokens: int = 4096,
+                            temperature: float = 0.7, top_p: float = 0.9, use_cache: bool = True,
+                            operation: str = 'analyze_data') -> StreamingAnalysis:
+        """Stream analysis text from Claude via Bedrock as it is generated"""
+        metrics: Dict[str, Any] = {}
+        chunks = self._generate_stream(metrics, prompt, context, max_tokens, temperature, top_p, use_cache)
+        return StreamingAnalysis(self._recorded_stream(operation, metrics, chunks), metrics)
+    
+    def _recorded_stream(self, operation: str, metrics: Dict[str, Any], chunks: Iterator[str]) -> Iterator[str]:
+        # Records on exhaustion and also when the consumer abandons the stream early
+        try:
+            yield from chunks
+        finally:
+            self._record(operation, metrics, metrics.get('total_time'))
+    
+    def _generate_stream(self, metrics: Dict[str, Any], prompt: str, context: Optional[str], max_tokens: int,
+                         temperature: float, top_p: float, use_cache: bool) -> Iterator[str]:
+        stream = StreamRecorder(metrics, self.model_id)
+        
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key, cached_analysis = self._cache_lookup(prompt, context, max_tokens, temperature, top_p)
+            if cached_analysis is not None:
+                yield stream.from_cache(cached_analysis)
+                stream.finish()
+                return
+        
+        try:
+            response, model_id = self._call_bedrock(
+                self.client.invoke_model_with_response_stream,
+                self._request_body(prompt, context, max_tokens, temperature, top_p), metrics)
+            stream.connected(model_id)
+            for event in response['body']:
+                delta_text = stream.text(event)
+                if delta_text:
+                    yield delta_text
+        except Exception as e:
+            yield stream.failed(e)
+            return
+        finally:
+            stream.finish()
+        
+        error = stream.complete()
+        if error:
+            yield error
+        elif cache_key is not None and stream.cacheable():
+            self.cache.set(cache_key, prompt, ''.join(stream.text_parts), self.model_id)
+    
+    def _run_analysis(self, operation: str, request: AnalysisRequest, error_message: str, stream: bool,
+                      use_cache: bool = True):
+        context, prompt = request
+        if stream:
+            return self.analyze_data_stream(prompt, context, use_cache=use_cache, operation=operation)
+        return result_text(self.analyze_data(prompt, context, use_cache=use_cache, operation=operation), error_message)
+    
+    def summarize_trends(self, data_summary: str, stream: bool = False) -> Union[str, StreamingAnalysis]:
+        """Generate executive summary of SLOOS trends"""
+        return self._run_analysis('summarize_trends', summary_prompt(data_summary), 'Error generating summary', stream)
+    
+    def sentiment_analysis(self, data_summary: str, loan_category: str, stream: bool = False) -> Union[str, StreamingAnalysis]:
+        """Perform sentiment analysis on specific loan category"""
+        return self._run_analysis('sentiment_analysis', sentiment_prompt(data_summary, loan_category), 'Error generating sentiment analysis', stream)
+    
+    def custom_query(self, query: str, data_context: str, stream: bool = False,
+                     use_cache: bool = True) -> Union[str, StreamingAnalysis]:
+        """Answer custom questions about SLOOS data; use_cache=False forces a fresh answer"""
+        return self._run_analysis('custom_query', custom_query_prompt(query, data_context), 'Error processing query',
+                                  stream, use_cache)
+    
+    def compare_periods(self, period1_data: str, period2_data: str, stream: bool = False) -> Union[str, StreamingAnalysis]:
+        """Compare SLOOS data between two time periods"""
+        return self._run_analysis('compare_periods', compare_periods_prompt(period1_data, period2_data), 'Error comparing periods', stream)
+    
+    def _analyze_request(self, request: Union[str, AnalysisRequest], operation: str) -> Dict[str, Any]:
+        context, prompt = as_request(request)
+        return self.analyze_data(prompt, context, operation=operation)
+    
+    def batch_analyze(self, prompts: Dict[str, Union[str, AnalysisRequest]], max_workers: int = 4,
+                      operation: str = 'batch_analyze', ordered: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run many prompts concurrently, yielding (key, result) pairs as each one completes (or in input order)"""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._analyze_request, request, operation): key
+                for key, request in prompts.items()
+            }
+            for future in (futures if ordered else as_completed(futures)):
+                yield futures[future], future.result()
+    
+    def batch_sentiment_analysis(self, category_summaries: Dict[str, str], **batch_options) -> Iterator[Tuple[str, str]]:
+        """Sentiment analysis for many loan categories at once, yielding (category, text) as each completes"""
+        results = self.batch_analyze(sentiment_requests(category_summaries), operation='sentiment_analysis', **batch_options)
+        for category, result in results:
+            yield category, result_text(result)
+    
+    def batch_summarize_trends(self, category_summaries: Dict[str, str], **batch_options) -> Iterator[Tuple[str, str]]:
+        """Trend summaries for many loan categories at once, yielding (category, text) as each completes"""
+        results = self.batch_analyze(summary_requests(category_summaries), operation='summarize_trends', **batch_options)
+        for category, result in results:
+            yield category, result_text(result)
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the SLOOS data pipeline.
+
+Each benchmark runs against synthetic data in a temporary SQLite database, so
+nothing here touches sloos_data.db or the network.
+
+Usage:
+    uv run python benchmark.py loader --rows 1000000
+    uv run python benchmark.py download --series 60 --latency 0.2
+    uv run python benchmark.py session --requests 500
+    uv run python benchmark.py frames --rows 500000
+    uv run python benchmark.py ai-batch --prompts 300 --latency 0.5
+    uv run python benchmark.py indicators --series 500
+    uv run python benchmark.py snapshot --base-rows 5000 --scales 10 100
+    uv run python benchmark.py charts --series 20 --points 20000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import init_database, get_session, dispose_engines, read_data_version, LendingStandard, LoanDemand
+from download_real_sloos_data import RealSLOOSDataDownloader
+from data_access import read_lending_standards
+from bedrock_client import BedrockAnalyzer
+from async_bedrock_client import AsyncBedrockAnalyzer
+from tests.fake_bedrock import FakeBedrockClient, AsyncFakeBedrockClient
+from snapshot_store import write_snapshot, read_table, TABLE_READERS
+from charts import line_figure
+from indicators import rolling_mean, rolling_std, zscores, diffusion_index, cross_correlation, turning_points
+
+
+def synthetic_downloaded_data(total_rows, series_count, seed=42):
+    """Build a downloader.downloaded_data dict holding total_rows observations over series_count series"""
+    rng = np.random.default_rng(seed)
+    rows_per_series = max(1, total_rows // series_count)
+    dates = pd.Series(pd.date_range('1990-04-01', periods=rows_per_series, freq='D'))
+
+    downloaded_data = {}
+    for i in range(series_count):
+        series_type = 'lending_standards' if i % 2 == 0 else 'loan_demand'
+        downloaded_data[f'SYN{i:04d}'] = {
+            'data': pd.DataFrame({
+                'date': dates,
+                'value': rng.uniform(-60, 80, rows_per_series).round(1)
+            }),
+            'category': f'Synthetic Category {i:04d}',
+            'type': 'net_tightening' if series_type == 'lending_standards' else 'net_demand',
+            'bank_type': 'Domestic',
+            'series_type': series_type
+        }
+    return downloaded_data
+
+
+def legacy_load(session, downloaded_data):
+    """The original per-row iterrows()/session.add() loader, kept as the benchmark baseline"""
+    records_added = 0
+    for code, info in downloaded_data.items():
+        for _, row in info['data'].iterrows():
+            survey_date = row['date'].date()
+            net_value = row['value']
+            if net_value > 0:
+                increase_pct = min(100, abs(net_value) + 50)
+                decrease_pct = max(0, 50 - abs(net_value))
+            else:
+                increase_pct = max(0, 50 - abs(net_value))
+                decrease_pct = min(100, abs(net_value) + 50)
+            unchanged_pct = max(0, 100 - increase_pct - decrease_pct)
+
+            if info['series_type'] == 'lending_standards':
+                session.add(LendingStandard(
+                    survey_date=survey_date, loan_category=info['category'],
+                    standard_type='Overall Standards', tightened_pct=increase_pct,
+                    eased_pct=decrease_pct, unchanged_pct=unchanged_pct,
+                    net_tightening=net_value, bank_type=info['bank_type']))
+            else:
+                session.add(LoanDemand(
+                    survey_date=survey_date, loan_category=info['category'],
+                    stronger_pct=increase_pct, weaker_pct=decrease_pct,
+                    unchanged_pct=unchanged_pct, net_demand=net_value,
+                    bank_type=info['bank_type']))
+            records_added += 1
+    session.commit()
+    return records_added
+
+
+def _report(label, rows, elapsed):
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"  {label:<28} {rows:>10,} rows  {elapsed:>8.2f}s  {rate:>12,.0f} rows/sec")
+    return rate
+
+
+def bench_loader(args):
+    """Per-row ORM loader vs vectorized Core bulk loader"""
+    print(f"Loader benchmark: {args.rows:,} rows across {args.series} series")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_rows = min(args.rows, args.legacy_rows)
+        legacy_data = synthetic_downloaded_data(legacy_rows, args.series)
+        legacy_db = os.path.join(tmp, 'legacy.db')
+        init_database(legacy_db)
+        session = get_session(legacy_db)
+        start = time.perf_counter()
+        rows = legacy_load(session, legacy_data)
+        legacy_rate = _report('per-row ORM (iterrows)', rows, time.perf_counter() - start)
+        session.close()
+
+        bulk_data = synthetic_downloaded_data(args.rows, args.series)
+        bulk_db = os.path.join(tmp, 'bulk.db')
+        init_database(bulk_db)
+        downloader = RealSLOOSDataDownloader(db_path=bulk_db)
+        downloader.downloaded_data = bulk_data
+        start = time.perf_counter()
+        downloader.load_to_database()
+        elapsed = time.perf_counter() - start
+        rows = sum(len(info['data']) for info in bulk_data.values())
+        bulk_rate = _report('vectorized bulk insert', rows, elapsed)
+        downloader.close()
+
+    print(f"  Speedup: {bulk_rate / legacy_rate:.1f}x")
+
+
+class CannedFREDHandler(BaseHTTPRequestHandler):
+    """fredgraph.csv stand-in serving the same CSV for every series after a fixed latency"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    fail_first = False
+    csv_body = b''
+    seen = set()
+    seen_lock = threading.Lock()
+
+    def do_GET(self):
+        series_code = parse_qs(urlparse(self.path).query).get('id', [''])[0]
+        time.sleep(self.latency)
+
+        with self.seen_lock:
+            first_request = series_code not in self.seen
+            self.seen.add(series_code)
+
+        if self.fail_first and first_request:
+            status, body = 503, b'busy'
+        else:
+            status, body = 200, self.csv_body
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_download(args):
+    """Sequential vs concurrent FRED downloads against a local canned-CSV server"""
+    dates = pd.date_range('1990-04-01', periods=args.observations, freq='QS')
+    csv = pd.DataFrame({'observation_date': dates.strftime('%Y-%m-%d'), 'SERIES': 10.0}).to_csv(index=False)
+    CannedFREDHandler.csv_body = csv.encode('utf-8')
+    CannedFREDHandler.latency = args.latency
+    CannedFREDHandler.fail_first = args.fail_first
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CannedFREDHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/graph/fredgraph.csv"
+    catalog = {f'SYN{i:04d}': (f'Synthetic Category {i:04d}', 'net_tightening', 'Domestic')
+               for i in range(args.series)}
+
+    print(f"Download benchmark: {args.series} series, {args.latency:.2f}s server latency"
+          f"{', first request per series fails with 503' if args.fail_first else ''}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'download.db')
+        init_database(db_path)
+        for workers in (1, args.workers):
+            CannedFREDHandler.seen = set()
+            downloader = RealSLOOSDataDownloader(db_path=db_path, max_workers=workers, backoff_seconds=0.05)
+            downloader.base_url = base_url
+            downloader.series = {'lending_standards': catalog}
+            downloader.download_all_series()
+            stats = downloader.download_stats
+            print(f"  workers={workers:<3} {stats['succeeded']:>4}/{stats['series']} series  "
+                  f"{stats['wall_time']:>7.2f}s wall  {stats['retries']:>4} retries  "
+                  f"slowest {stats['slowest_series_time']:.2f}s")
+            downloader.close()
+    server.shutdown()
+
+
+def bench_session(args):
+    """Per-request engine creation vs the shared engine registry"""
+    print(f"Session benchmark: {args.requests} requests, each opening a session and counting rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'session.db')
+        init_database(db_path)
+        downloader = RealSLOOSDataDownloader(db_path=db_path)
+        downloader.downloaded_data = synthetic_downloaded_data(10_000, 10)
+        downloader.load_to_database()
+        downloader.close()
+
+        def engine_per_request():
+            # The original get_session(): a new engine, pool and dialect every call
+            engine = create_engine(f'sqlite:///{db_path}')
+            session = sessionmaker(bind=engine)()
+            session.query(LendingStandard).count()
+            session.close()
+
+        def shared_engine():
+            session = get_session(db_path)
+            session.query(LendingStandard).count()
+            session.close()
+
+        for label, request in (('engine per request', engine_per_request),
+                               ('shared engine registry', shared_engine)):
+            request()
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                request()
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<24} {elapsed / args.requests * 1000:>8.3f} ms/request")
+        dispose_engines()
+
+
+def legacy_read_lending_standards(db_path):
+    """The original app loader: ORM objects -> dicts -> DataFrame, then pd.to_datetime per page"""
+    session = get_session(db_path)
+    data = [{
+        'survey_date': record.survey_date,
+        'loan_category': record.loan_category,
+        'tightened_pct': record.tightened_pct,
+        'eased_pct': record.eased_pct,
+        'unchanged_pct': record.unchanged_pct,
+        'net_tightening': record.net_tightening,
+        'bank_type': record.bank_type
+    } for record in session.query(LendingStandard).all()]
+    session.close()
+    df = pd.DataFrame(data)
+    df['survey_date'] = pd.to_datetime(df['survey_date'])
+    return df
+
+
+def bench_frames(args):
+    """ORM hydration vs direct typed column reads for the dashboard frames"""
+    print(f"Frame load benchmark: {args.rows:,} lending standards rows")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'frames.db')
+        init_database(db_path)
+        downloader = RealSLOOSDataDownloader(db_path=db_path)
+        # Every generated series is a lending standards series
+        data = synthetic_downloaded_data(args.rows * 2, args.series * 2)
+        downloader.downloaded_data = {code: info for code, info in data.items()
+                                      if info['series_type'] == 'lending_standards'}
+        downloader.load_to_database()
+        downloader.close()
+
+        for label, loader in (('ORM hydration', legacy_read_lending_standards),
+                              ('typed column read', read_lending_standards)):
+            start = time.perf_counter()
+            loader(db_path)
+            elapsed = time.perf_counter() - start
+
+            # Separate pass for memory: tracemalloc slows allocation-heavy code down
+            tracemalloc.start()
+            df = loader(db_path)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            frame_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+            print(f"  {label:<20} {elapsed:>7.2f}s  peak {peak / 1024 ** 2:>8.1f} MB  "
+                  f"frame {frame_mb:>7.1f} MB")
+        dispose_engines()
+
+
+def bench_ai_batch(args):
+    """Thread-pool BedrockAnalyzer vs asyncio AsyncBedrockAnalyzer on a batch of prompts"""
+    print(f"AI batch benchmark: {args.prompts} prompts, {args.latency:.2f}s model latency")
+    prompts = {f'prompt-{i}': f'Synthetic prompt {i}' for i in range(args.prompts)}
+    # The rate limiter is opened up so the benchmark measures concurrency, not the request budget
+    unlimited = {'requests_per_second': 1e9, 'burst': args.prompts}
+
+    analyzer = BedrockAnalyzer(client=FakeBedrockClient(first_token_latency=args.latency), **unlimited)
+    start = time.perf_counter()
+    results = list(analyzer.batch_analyze(prompts, max_workers=args.workers))
+    elapsed = time.perf_counter() - start
+    print(f"  {'threads (' + str(args.workers) + ' workers)':<28} {len(results):>6} prompts  {elapsed:>7.2f}s  "
+          f"{args.workers:>4} OS threads")
+
+    async def run_async():
+        analyzer = AsyncBedrockAnalyzer(client=AsyncFakeBedrockClient(first_token_latency=args.latency),
+                                        max_concurrency=args.concurrency, **unlimited)
+        return [result async for result in analyzer.batch_analyze(prompts)]
+
+    start = time.perf_counter()
+    results = asyncio.run(run_async())
+    elapsed = time.perf_counter() - start
+    print(f"  {'asyncio (' + str(args.concurrency) + ' in flight)':<28} {len(results):>6} prompts  {elapsed:>7.2f}s  "
+          f"{1:>4} OS thread")
+
+
+def bench_indicators(args):
+    """Per-series pandas loops vs the batched NumPy indicators"""
+    print(f"Indicators benchmark: {args.series} series x {args.quarters} quarters, {args.max_lag} lags")
+    rng = np.random.default_rng(42)
+    tightening = np.cumsum(rng.normal(0, 5, size=(args.quarters, args.series)), axis=0)
+    tightening[rng.random(tightening.shape) < 0.02] = np.nan
+    demand = -np.roll(tightening, 2, axis=0) + rng.normal(0, 5, size=tightening.shape)
+    dates = pd.date_range('1990-01-01', periods=args.quarters, freq='QS')
+    tightening_df = pd.DataFrame(tightening, index=dates)
+    demand_df = pd.DataFrame(demand, index=dates)
+
+    def pandas_loops():
+        for column in tightening_df:
+            series = tightening_df[column]
+            series.rolling(4).mean()
+            series.rolling(4).std()
+            (series - series.mean()) / series.std()
+            for lag in range(-args.max_lag, args.max_lag + 1):
+                series.corr(demand_df[column].shift(-lag))
+            window = series.rolling(5, center=True)
+            (series == window.max()) & (series > series.shift(1))
+            (series == window.min()) & (series < series.shift(1))
+        (tightening_df > 0).sum(axis=1) - (tightening_df < 0).sum(axis=1)
+
+    def numpy_batched():
+        rolling_mean(tightening, 4)
+        rolling_std(tightening, 4)
+        zscores(tightening)
+        cross_correlation(tightening, demand, args.max_lag)
+        turning_points(tightening, window=2)
+        diffusion_index(tightening)
+
+    for label, run in (('pandas per-series loops', pandas_loops), ('numpy batched', numpy_batched)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        print(f"  {label:<26} {min(timings) * 1000:>9.1f} ms  (best of {args.repeat})")
+
+
+def legacy_read_loan_demand(db_path):
+    """The loan demand ORM read app.py used before data_access"""
+    session = get_session(db_path)
+    data = [{
+        'survey_date': record.survey_date,
+        'loan_category': record.loan_category,
+        'net_demand': record.net_demand,
+        'bank_type': record.bank_type
+    } for record in session.query(LoanDemand).all()]
+    session.close()
+    df = pd.DataFrame(data)
+    df['survey_date'] = pd.to_datetime(df['survey_date'])
+    return df
+
+
+def _rss_mb():
+    # Current resident set size; falls back to the peak where /proc is unavailable
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cold_load(loader, db_path, data_version, results):
+    # Runs in a fresh process so the timing and RSS include nothing from earlier loads
+    loaders = {
+        'SQLite ORM': lambda: [legacy_read_lending_standards(db_path), legacy_read_loan_demand(db_path)],
+        'SQLite typed read': lambda: [reader(db_path) for reader in TABLE_READERS.values()],
+        'Arrow snapshot (mmap)': lambda: [read_table(table, data_version, db_path) for table in TABLE_READERS],
+    }
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    frames = loaders[loader]()
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, _rss_mb() - baseline, sum(len(frame) for frame in frames)))
+
+
+def bench_snapshot(args):
+    """Cold-start load of both tables: SQLite ORM vs typed SQLite read vs memory-mapped Arrow snapshot"""
+    print(f"Snapshot benchmark: {args.base_rows:,} base rows at {', '.join(f'{s}x' for s in args.scales)}")
+    context = multiprocessing.get_context('spawn')
+
+    for scale in args.scales:
+        rows = args.base_rows * scale
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'snapshot.db')
+            init_database(db_path)
+            downloader = RealSLOOSDataDownloader(db_path=db_path)
+            downloader.downloaded_data = synthetic_downloaded_data(rows, args.series)
+            downloader.load_to_database()
+            downloader.close()
+            data_version = read_data_version(db_path)
+            if not write_snapshot(db_path, data_version):
+                print("  pyarrow is required for the snapshot benchmark")
+                return
+            dispose_engines()
+
+            print(f"  {scale}x ({rows:,} rows)")
+            for loader in ('SQLite ORM', 'SQLite typed read', 'Arrow snapshot (mmap)'):
+                results = context.Queue()
+                process = context.Process(target=_cold_load, args=(loader, db_path, data_version, results))
+                process.start()
+                elapsed, rss_mb, loaded = results.get()
+                process.join()
+                print(f"    {loader:<24} {loaded:>10,} rows  {elapsed:>7.3f}s  +{rss_mb:>7.1f} MB RSS")
+
+
+def bench_charts(args):
+    """Full-resolution px.line vs downsampled line_figure: build time and browser payload"""
+    print(f"Chart benchmark: {args.series} series x {args.points:,} points")
+    rng = np.random.default_rng(42)
+    dates = pd.date_range('1990-01-01', periods=args.points, freq='D')
+    df = pd.DataFrame({
+        'survey_date': np.tile(dates, args.series),
+        'loan_category': pd.Categorical(np.repeat([f'Category {i:03d}' for i in range(args.series)], args.points)),
+        'net_tightening': np.cumsum(rng.normal(0, 1, args.series * args.points)).astype(np.float32)
+    })
+
+    builders = (
+        ('px.line (full)', lambda: px.line(df, x='survey_date', y='net_tightening', color='loan_category')),
+        ('line_figure (LTTB)', lambda: line_figure(df, 'survey_date', 'net_tightening', 'loan_category')),
+    )
+    for label, build in builders:
+        start = time.perf_counter()
+        payload = build().to_json()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<22} {elapsed:>7.2f}s  payload {len(payload) / 1024 ** 2:>8.2f} MB")
+
+
+BENCHMARKS = {
+    'loader': bench_loader,
+    'download': bench_download,
+    'session': bench_session,
+    'frames': bench_frames,
+    'ai-batch': bench_ai_batch,
+    'indicators': bench_indicators,
+    'snapshot': bench_snapshot,
+    'charts': bench_charts,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SLOOS pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    loader = subparsers.add_parser('loader', help=bench_loader.__doc__)
+    loader.add_argument('--rows', type=int, default=1_000_000)
+    loader.add_argument('--series', type=int, default=200)
+    loader.add_argument('--legacy-rows', type=int, default=100_000,
+                        help="cap for the slow per-row baseline (rows/sec is still comparable)")
+
+    download = subparsers.add_parser('download', help=bench_download.__doc__)
+    download.add_argument('--series', type=int, default=60)
+    download.add_argument('--observations', type=int, default=140)
+    download.add_argument('--latency', type=float, default=0.2)
+    download.add_argument('--workers', type=int, default=8)
+    download.add_argument('--fail-first', action='store_true',
+                          help="answer the first request for each series with HTTP 503")
+
+    session = subparsers.add_parser('session', help=bench_session.__doc__)
+    session.add_argument('--requests', type=int, default=500)
+
+    frames = subparsers.add_parser('frames', help=bench_frames.__doc__)
+    frames.add_argument('--rows', type=int, default=500_000)
+    frames.add_argument('--series', type=int, default=100)
+
+    ai_batch = subparsers.add_parser('ai-batch', help=bench_ai_batch.__doc__)
+    ai_batch.add_argument('--prompts', type=int, default=300)
+    ai_batch.add_argument('--latency', type=float, default=0.5)
+    ai_batch.add_argument('--workers', type=int, default=8)
+    ai_batch.add_argument('--concurrency', type=int, default=100)
+
+    indicators = subparsers.add_parser('indicators', help=bench_indicators.__doc__)
+    indicators.add_argument('--series', type=int, default=500)
+    indicators.add_argument('--quarters', type=int, default=140)
+    indicators.add_argument('--max-lag', type=int, default=8)
+    indicators.add_argument('--repeat', type=int, default=5)
+
+    snapshot = subparsers.add_parser('snapshot', help=bench_snapshot.__doc__)
+    snapshot.add_argument('--base-rows', type=int, default=5_000,
+                          help="approximate row count of a full FRED load")
+    snapshot.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    snapshot.add_argument('--series', type=int, default=40)
+
+    charts = subparsers.add_parser('charts', help=bench_charts.__doc__)
+    charts.add_argument('--series', type=int, default=20)
+    charts.add_argument('--points', type=int, default=20_000)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
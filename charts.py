@@ -0,0 +1,79 @@
+"""
+Bounded-size Plotly line charts.
+
+Long series are downsampled on the server with Largest-Triangle-Three-Buckets
+(LTTB), which keeps the points that shape the line (peaks, troughs, turns)
+instead of every n-th point, and charts with many points overall switch to
+WebGL traces. Chart payloads and browser render time then stay bounded as
+series and date ranges grow. app.py caches the resulting figures per data
+version and filter state.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Points kept per trace once a series is longer than this
+MAX_POINTS_PER_TRACE = 500
+
+# Total points above which traces render with WebGL (Scattergl) instead of SVG
+WEBGL_MIN_POINTS = 2000
+
+
+def lttb(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps when reducing (x, y) to threshold points"""
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # First and last points are always kept; the rest are split into threshold - 2 buckets
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's centroid stands in for the point not chosen yet
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else length
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(df, x, y, max_points=MAX_POINTS_PER_TRACE):
+    """Rows of one series reduced to max_points with LTTB; unchanged when it is short enough or max_points is None"""
+    df = df.dropna(subset=[y])
+    if max_points is None or len(df) <= max_points:
+        return df
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype('datetime64[ns]').astype(np.int64)
+    return df.iloc[lttb(x_values, df[y].to_numpy(), max_points)]
+
+
+def line_figure(df, x, y, color, title=None, labels=None, max_points=MAX_POINTS_PER_TRACE,
+                webgl_min_points=WEBGL_MIN_POINTS):
+    """px.line-style figure with one trace per color group, downsampled and WebGL-rendered when large"""
+    labels = labels or {}
+    groups = [(str(name), downsample(df[df[color] == name], x, y, max_points))
+              for name in pd.unique(df[color])]
+    total_points = sum(len(group) for _, group in groups)
+    trace = go.Scattergl if total_points > webgl_min_points else go.Scatter
+
+    fig = go.Figure([trace(x=group[x], y=group[y], mode='lines', name=name, legendgroup=name)
+                     for name, group in groups])
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        legend_title_text=labels.get(color, color)
+    )
+    return fig
@@ -0,0 +1,112 @@
+"""
+Read SLOOS tables straight into typed pandas DataFrames.
+
+Rows are fetched through the DB-API cursor instead of being hydrated as ORM
+objects, and the columns come back ready to plot: datetime64 survey dates,
+categorical labels and float32 metrics.
+
+read_page() serves the Data Explorer tables: filters run in SQL against the
+table indexes and pages are fetched by keyset (the last row's survey date and
+id) rather than OFFSET, so each page costs about the same however deep it is.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database import get_engine, LendingStandard, LoanDemand
+
+LENDING_STANDARDS_COLUMNS = ['survey_date', 'loan_category', 'tightened_pct', 'eased_pct',
+                             'unchanged_pct', 'net_tightening', 'bank_type']
+LOAN_DEMAND_COLUMNS = ['survey_date', 'loan_category', 'stronger_pct', 'weaker_pct',
+                       'unchanged_pct', 'net_demand', 'bank_type']
+CATEGORICAL_COLUMNS = ('loan_category', 'bank_type')
+
+# Dataset name -> (model, columns)
+TABLES = {
+    'lending_standards': (LendingStandard, LENDING_STANDARDS_COLUMNS),
+    'loan_demand': (LoanDemand, LOAN_DEMAND_COLUMNS),
+}
+
+PAGE_SIZE = 100
+
+
+def _typed_frame(rows, columns):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for column in columns:
+        if column == 'survey_date':
+            df[column] = pd.to_datetime(df[column], format='%Y-%m-%d')
+        elif column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
+        else:
+            df[column] = df[column].astype(np.float32)
+    return df
+
+
+def read_table_frame(model, columns, db_path='sloos_data.db'):
+    """Read the given columns of a SLOOS table into a typed DataFrame ordered by survey date"""
+    sql = (f"SELECT {', '.join(columns)} FROM {model.__tablename__} "
+           f"ORDER BY survey_date, loan_category, bank_type")
+    with get_engine(db_path).connect() as conn:
+        rows = conn.exec_driver_sql(sql).fetchall()
+    return _typed_frame(rows, columns)
+
+
+def read_lending_standards(db_path='sloos_data.db'):
+    """Lending standards as a typed, plot-ready DataFrame"""
+    return read_table_frame(LendingStandard, LENDING_STANDARDS_COLUMNS, db_path)
+
+
+def read_loan_demand(db_path='sloos_data.db'):
+    """Loan demand as a typed, plot-ready DataFrame"""
+    return read_table_frame(LoanDemand, LOAN_DEMAND_COLUMNS, db_path)
+
+
+def filter_sql(categories=None, bank_type=None, start=None, end=None):
+    """(WHERE conditions, params) for the explorer filters; None means unfiltered"""
+    conditions, params = [], {}
+    if categories is not None:
+        if not categories:
+            conditions.append('0')
+        names = [f'category_{i}' for i in range(len(categories))]
+        if names:
+            conditions.append(f"loan_category IN ({', '.join(':' + name for name in names)})")
+            params.update({name: str(category) for name, category in zip(names, categories)})
+    if bank_type is not None:
+        conditions.append('bank_type = :bank_type')
+        params['bank_type'] = str(bank_type)
+    if start is not None:
+        conditions.append('survey_date >= :start')
+        params['start'] = pd.Timestamp(start).date().isoformat()
+    if end is not None:
+        conditions.append('survey_date <= :end')
+        params['end'] = pd.Timestamp(end).date().isoformat()
+    return conditions, params
+
+
+def read_page(dataset, categories=None, bank_type=None, start=None, end=None, after=None,
+              page_size=PAGE_SIZE, db_path='sloos_data.db'):
+    """One page of filtered rows, newest first, and the cursor for the next page (None on the last page).
+
+    after is the cursor returned with the previous page.
+    """
+    model, columns = TABLES[dataset]
+    conditions, params = filter_sql(categories, bank_type, start, end)
+    if after is not None:
+        conditions.append('(survey_date < :after_date OR (survey_date = :after_date AND id < :after_id))')
+        params.update({'after_date': after[0], 'after_id': after[1]})
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    params['limit'] = page_size + 1
+
+    with get_engine(db_path).connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT id, {', '.join(columns)} FROM {model.__tablename__} {where} "
+            f"ORDER BY survey_date DESC, id DESC LIMIT :limit"
+        ), params).fetchall()
+
+    # The extra row only tells us whether another page follows
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][1], rows[-1][0])
+    return _typed_frame([row[1:] for row in rows], columns), next_cursor
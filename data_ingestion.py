@@ -3,6 +3,7 @@ import pandas as pd
 from bs4 import BeautifulSoup
 from datetime import datetime
 from database import SurveyResponse, LendingStandard, LoanDemand, get_session
+from sqlalchemy import func
 import io
 
 class SLOOSDataIngestion:
@@ -47,16 +48,14 @@ class SLOOSDataIngestion:
         return False, "❌ Sample data is deprecated. Use real SLOOS data from FRED instead. Run: ./update_sloos_data.sh"
     
     def get_data_summary(self):
-        """Get summary of data in database"""
+        """Get summary of data in database (row counts and date range in one query)"""
         try:
-            lending_count = self.session.query(LendingStandard).count()
-            demand_count = self.session.query(LoanDemand).count()
-            
-            if lending_count > 0:
-                min_date = self.session.query(LendingStandard.survey_date).order_by(LendingStandard.survey_date).first()[0]
-                max_date = self.session.query(LendingStandard.survey_date).order_by(LendingStandard.survey_date.desc()).first()[0]
-            else:
-                min_date = max_date = None
+            lending_count, demand_count, min_date, max_date = self.session.query(
+                self.session.query(func.count(LendingStandard.id)).scalar_subquery(),
+                self.session.query(func.count(LoanDemand.id)).scalar_subquery(),
+                self.session.query(func.min(LendingStandard.survey_date)).scalar_subquery(),
+                self.session.query(func.max(LendingStandard.survey_date)).scalar_subquery()
+            ).one()
             
             return {
                 'lending_standards_count': lending_count,
@@ -0,0 +1,125 @@
+"""
+Process-wide, read-only snapshot of the SLOOS frames shared by every session.
+
+st.cache_data hands each caller its own unpickled copy of a DataFrame, so
+memory grows with the number of concurrent users. A DataSnapshot is built
+once per data version and handed out by reference instead: its frames are
+never modified in place (callers get copy-on-write views) and it carries
+per-category and per-bank-type row indexes, so filtering picks rows by
+position instead of scanning string columns. SharedSnapshot swaps in the
+next version with a single reference assignment, so a session sees either
+the old snapshot or the new one, never a mix.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from snapshot_store import read_table
+
+DATASETS = ('lending_standards', 'loan_demand')
+
+
+def enable_copy_on_write():
+    """Turn on pandas copy-on-write for the process; call once at startup before handing out snapshot frames"""
+    # Always on from pandas 3; on pandas 2 an in-place write to a shallow copy
+    # would otherwise change the shared frame
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+def _group_index(column):
+    # {label: sorted row positions} for a categorical column, from one stable argsort
+    codes = column.cat.codes.to_numpy()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(column.cat.categories) + 1))
+    index = {}
+    for code, label in enumerate(column.cat.categories):
+        positions = order[bounds[code]:bounds[code + 1]]
+        if positions.size:
+            positions.flags.writeable = False
+            index[str(label)] = positions
+    return index
+
+
+class DataSnapshot:
+    """Immutable frames of one data version plus row indexes by loan category and bank type"""
+
+    def __init__(self, data_version, frames):
+        self.data_version = data_version
+        self._frames = frames
+        self._category_index = {}
+        self._bank_type_index = {}
+        for dataset, df in frames.items():
+            self._category_index[dataset] = _group_index(df['loan_category'])
+            self._bank_type_index[dataset] = _group_index(df['bank_type'])
+
+    @classmethod
+    def load(cls, data_version, db_path='sloos_data.db'):
+        """Read every dataset for data_version (memory-mapped snapshot or SQLite)"""
+        return cls(data_version, {dataset: read_table(dataset, data_version, db_path) for dataset in DATASETS})
+
+    def frame(self, dataset):
+        """The full frame as a copy-on-write view (see enable_copy_on_write): cheap, and changes to it stay private to the caller"""
+        return self._frames[dataset].copy(deep=False)
+
+    @property
+    def lending_standards(self):
+        return self.frame('lending_standards')
+
+    @property
+    def loan_demand(self):
+        return self.frame('loan_demand')
+
+    def categories(self, dataset):
+        """Loan categories present in a dataset, in first-seen order"""
+        return list(self._frames[dataset]['loan_category'].unique())
+
+    def bank_types(self, dataset):
+        """Bank types present in a dataset, in first-seen order"""
+        return list(self._frames[dataset]['bank_type'].unique())
+
+    def rows(self, dataset, categories=None, bank_type=None, start=None, end=None):
+        """Rows matching the filters, in survey date order, found through the precomputed indexes"""
+        df = self._frames[dataset]
+        if categories is None:
+            positions = np.arange(len(df))
+        else:
+            index = self._category_index[dataset]
+            parts = [index[str(category)] for category in categories if str(category) in index]
+            positions = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+        if bank_type is not None:
+            bank_rows = self._bank_type_index[dataset].get(str(bank_type), np.array([], dtype=np.intp))
+            positions = positions[np.isin(positions, bank_rows, assume_unique=True)]
+        if start is not None or end is not None:
+            dates = df['survey_date'].to_numpy()[positions]
+            keep = np.ones(positions.size, dtype=bool)
+            if start is not None:
+                keep &= dates >= np.datetime64(pd.Timestamp(start))
+            if end is not None:
+                keep &= dates <= np.datetime64(pd.Timestamp(end))
+            positions = positions[keep]
+        return df.take(positions)
+
+
+class SharedSnapshot:
+    """Holds the current DataSnapshot and replaces it when the data version changes"""
+
+    def __init__(self, db_path='sloos_data.db'):
+        self.db_path = db_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self, data_version):
+        """Snapshot for data_version, built once no matter how many sessions ask at the same time"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.data_version == data_version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.data_version != data_version:
+                snapshot = DataSnapshot.load(data_version, self.db_path)
+                # Sessions still rendering the previous snapshot keep their reference
+                self._snapshot = snapshot
+        return snapshot
@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, Text, DateTime
+from sqlalchemy import create_engine, event, inspect, text, func, Index, Column, Integer, String, Float, Date, Text, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import hashlib
+import os
+import threading
+import uuid
 
 Base = declarative_base()
 
@@ -20,8 +25,30 @@ class SurveyResponse(Base):
     net_percentage = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Natural keys: one observation per survey date, category, bank type (and standard type)
+LENDING_STANDARDS_KEY = ('survey_date', 'loan_category', 'bank_type', 'standard_type')
+LOAN_DEMAND_KEY = ('survey_date', 'loan_category', 'bank_type')
+
+# Nullable key columns are indexed as COALESCE(column, ''): SQLite unique
+# indexes treat NULLs as distinct, so a plain index would accept duplicates
+NULLABLE_KEY_COLUMNS = ('bank_type', 'standard_type')
+
+def natural_key_sql(key):
+    """SQL expressions of a natural key as indexed (also the ON CONFLICT target)"""
+    return [f"COALESCE({column}, '')" if column in NULLABLE_KEY_COLUMNS else column for column in key]
+
+def _natural_key_index(name, key):
+    return Index(name, *(text(expression) if expression != column else column
+                         for column, expression in zip(key, natural_key_sql(key))), unique=True)
+
 class LendingStandard(Base):
     __tablename__ = 'lending_standards'
+    __table_args__ = (
+        _natural_key_index('uq_lending_standards_natural_key', LENDING_STANDARDS_KEY),
+        Index('ix_lending_standards_category_bank_date', 'loan_category', 'bank_type', 'survey_date'),
+        # Serves the explorer's newest-first keyset pages (SQLite appends the rowid id)
+        Index('ix_lending_standards_date', 'survey_date'),
+    )
     
     id = Column(Integer, primary_key=True)
     survey_date = Column(Date, nullable=False)
@@ -36,6 +63,12 @@ class LendingStandard(Base):
 
 class LoanDemand(Base):
     __tablename__ = 'loan_demand'
+    __table_args__ = (
+        _natural_key_index('uq_loan_demand_natural_key', LOAN_DEMAND_KEY),
+        Index('ix_loan_demand_category_bank_date', 'loan_category', 'bank_type', 'survey_date'),
+        # Serves the explorer's newest-first keyset pages (SQLite appends the rowid id)
+        Index('ix_loan_demand_date', 'survey_date'),
+    )
     
     id = Column(Integer, primary_key=True)
     survey_date = Column(Date, nullable=False)
@@ -54,15 +87,255 @@ class AnalysisCache(Base):
     query_hash = Column(String(64), unique=True, nullable=False)
     query_text = Column(Text, nullable=False)
     analysis_result = Column(Text, nullable=False)
+    model_id = Column(String(200))
+    data_version = Column(String(64))
+    hit_count = Column(Integer, default=0)
+    last_accessed = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class AnsweredQuery(Base):
+    __tablename__ = 'answered_queries'
+    __table_args__ = (
+        Index('idx_answered_queries_data_version', 'data_version'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    query_text = Column(Text, nullable=False)
+    signature = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    model_id = Column(String(200))
+    data_version = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SeriesRefreshState(Base):
+    __tablename__ = 'series_refresh_state'
+    
+    id = Column(Integer, primary_key=True)
+    series_code = Column(String(50), unique=True, nullable=False)
+    series_type = Column(String(50), nullable=False)
+    last_observation_date = Column(Date)
+    rows_written = Column(Integer, default=0)
+    last_refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class QuarterlyRollup(Base):
+    __tablename__ = 'quarterly_rollups'
+    __table_args__ = (
+        Index('ix_quarterly_rollups_dataset_date', 'dataset', 'survey_date', 'loan_category'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    dataset = Column(String(50), nullable=False)
+    survey_date = Column(Date, nullable=False)
+    loan_category = Column(String(100), nullable=False)
+    bank_type = Column(String(50))
+    mean_value = Column(Float)
+    observations = Column(Integer)
+
+class LatestSnapshot(Base):
+    __tablename__ = 'latest_snapshot'
+    __table_args__ = (
+        Index('ix_latest_snapshot_dataset', 'dataset'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    dataset = Column(String(50), nullable=False)
+    survey_date = Column(Date, nullable=False)
+    loan_category = Column(String(100), nullable=False)
+    mean_value = Column(Float)
+    observations = Column(Integer)
+
+class CategoryStats(Base):
+    __tablename__ = 'category_stats'
+    __table_args__ = (
+        Index('ix_category_stats_dataset', 'dataset'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    dataset = Column(String(50), nullable=False)
+    loan_category = Column(String(100), nullable=False)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    mean_value = Column(Float)
+    first_date = Column(Date)
+    last_date = Column(Date)
+    observations = Column(Integer)
+
+class DataMetadata(Base):
+    __tablename__ = 'data_metadata'
+    
+    id = Column(Integer, primary_key=True)
+    key = Column(String(100), unique=True, nullable=False)
+    value = Column(String(200))
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+DATA_VERSION_KEY = 'data_version'
+
+class PrecomputedAnalysis(Base):
+    __tablename__ = 'precomputed_analyses'
+    __table_args__ = (
+        Index('uq_precomputed_analyses_key', 'analysis_type', 'subject', 'data_version', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    analysis_type = Column(String(50), nullable=False)
+    subject = Column(String(200), nullable=False, default='')
+    data_version = Column(String(64), nullable=False)
+    model_id = Column(String(200))
+    analysis_text = Column(Text, nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow)
+
+def _add_missing_columns(engine):
+    """Add columns declared on the models but missing from an existing database file"""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+# Applied to every new SQLite connection: WAL lets dashboard readers keep
+# reading while a refresh writes, and the page/mmap caches keep hot pages in memory
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+_engines = {}
+_session_factories = {}
+_registry_lock = threading.Lock()
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def get_engine(db_path='sloos_data.db'):
+    """Process-wide engine for db_path, created once with a pooled connection setup"""
+    key = os.path.abspath(db_path)
+    engine = _engines.get(key)
+    if engine is None:
+        with _registry_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = create_engine(
+                    f'sqlite:///{db_path}',
+                    pool_size=5,
+                    max_overflow=10,
+                    connect_args={'check_same_thread': False, 'timeout': 30}
+                )
+                event.listen(engine, 'connect', _apply_sqlite_pragmas)
+                _session_factories[key] = sessionmaker(bind=engine)
+                _engines[key] = engine
+    return engine
+
+def get_session_factory(db_path='sloos_data.db'):
+    """Shared sessionmaker bound to the engine for db_path"""
+    get_engine(db_path)
+    return _session_factories[os.path.abspath(db_path)]
+
+def dispose_engines():
+    """Close all pooled connections and forget the registered engines"""
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
+
+def _create_missing_indexes(engine):
+    """Create declared indexes on existing tables, dropping duplicate rows before adding unique keys"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            # Read from sqlite_master: the inspector skips expression indexes
+            existing_indexes = set(conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+            ), {'table': table.name}).scalars())
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if index.unique:
+                    # Group by the indexed expressions so the dedup agrees with the constraint
+                    key_columns = ', '.join(expression.name if isinstance(expression, Column) else str(expression)
+                                            for expression in index.expressions)
+                    removed = conn.execute(text(
+                        f'DELETE FROM {table.name} WHERE id NOT IN '
+                        f'(SELECT MAX(id) FROM {table.name} GROUP BY {key_columns})'
+                    )).rowcount
+                    if removed:
+                        print(f"Removed {removed} duplicate rows from {table.name}")
+                index.create(conn)
+
 def init_database(db_path='sloos_data.db'):
-    engine = create_engine(f'sqlite:///{db_path}')
+    engine = get_engine(db_path)
     Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return engine, Session
+    _add_missing_columns(engine)
+    _create_missing_indexes(engine)
+    return engine, get_session_factory(db_path)
 
 def get_session(db_path='sloos_data.db'):
-    engine = create_engine(f'sqlite:///{db_path}')
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return get_session_factory(db_path)()
+
+@contextmanager
+def session_scope(db_path='sloos_data.db'):
+    """Session that commits on success, rolls back on error and is always closed"""
+    session = get_session(db_path)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def bump_data_version(session):
+    """Stamp a new data version in the caller's transaction; every write to the SLOOS tables calls this"""
+    entry = session.query(DataMetadata).filter(DataMetadata.key == DATA_VERSION_KEY).first()
+    if entry is None:
+        entry = DataMetadata(key=DATA_VERSION_KEY)
+        session.add(entry)
+    # A random token rather than a counter: a recreated database would restart a
+    # counter and hand old cache keys to new data
+    entry.value = uuid.uuid4().hex
+    entry.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    return entry.value
+
+def clear_observations(session):
+    """Delete every SLOOS observation in the caller's transaction, with the per-series refresh state
+    
+    Without the refresh state the next incremental refresh downloads each series' full history again.
+    """
+    session.query(LendingStandard).delete()
+    session.query(LoanDemand).delete()
+    session.query(SeriesRefreshState).delete()
+
+def get_data_version(session):
+    """Current data version stamp, falling back to a table fingerprint for databases never stamped"""
+    stamp = session.query(DataMetadata.value).filter(DataMetadata.key == DATA_VERSION_KEY).scalar()
+    if stamp is not None:
+        return stamp
+    return _fingerprint_data(session)
+
+def read_data_version(db_path='sloos_data.db'):
+    """Data version for db_path in a single short read"""
+    session = get_session(db_path)
+    try:
+        return get_data_version(session)
+    finally:
+        session.close()
+
+def _fingerprint_data(session):
+    parts = []
+    for model in (LendingStandard, LoanDemand):
+        count, max_id, last_created = session.query(
+            func.count(model.id), func.max(model.id), func.max(model.created_at)).one()
+        parts.append(f"{model.__tablename__}:{count}:{max_id}:{last_created}")
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
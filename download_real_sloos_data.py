@@ -7,9 +7,20 @@ FRED database and loads it into the SQLite database.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from database import LendingStandard, LoanDemand, get_session
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from database import (LendingStandard, LoanDemand, SeriesRefreshState, get_session, init_database,
+                      bump_data_version, clear_observations, natural_key_sql, LENDING_STANDARDS_KEY, LOAN_DEMAND_KEY)
+from aggregates import refresh_aggregates
+from standard_analyses import pregenerate_analyses
+from snapshot_store import write_snapshot
 
 # FRED SLOOS Series Mapping
 # Format: 'FRED_CODE': ('Category Name', 'Type', 'Bank Type')
@@ -39,78 +50,183 @@ LOAN_DEMAND_SERIES = {
     'DRSDCL': ('Consumer Loans - Other', 'net_demand', 'Domestic'),
 }
 
+# Incremental refreshes re-fetch this much history before the last stored
+# observation so that revisions to recent quarters are picked up
+REVISION_LOOKBACK = timedelta(days=370)
+
+# Transient FRED responses worth retrying with backoff
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def estimate_components(net_values):
+    """Split net percentages into (increase, decrease, unchanged) percentage arrays"""
+    net_values = np.asarray(net_values, dtype=float)
+    magnitude = np.abs(net_values)
+    majority = np.minimum(100, magnitude + 50)
+    minority = np.maximum(0, 50 - magnitude)
+    
+    positive = net_values > 0
+    increase_pct = np.where(positive, majority, minority)
+    decrease_pct = np.where(positive, minority, majority)
+    unchanged_pct = np.maximum(0, 100 - increase_pct - decrease_pct)
+    return increase_pct, decrease_pct, unchanged_pct
+
 
 class RealSLOOSDataDownloader:
     """Download and process real SLOOS data from FRED"""
     
-    def __init__(self):
+    def __init__(self, db_path='sloos_data.db', max_workers=4, max_retries=3, backoff_seconds=0.5, timeout=15,
+                 progress_callback=None):
         self.base_url = "https://fred.stlouisfed.org/graph/fredgraph.csv"
-        self.session = get_session()
+        self.session = get_session(db_path)
         self.downloaded_data = {}
+        self.progress_callback = progress_callback
+        self.series = {
+            'lending_standards': LENDING_STANDARDS_SERIES,
+            'loan_demand': LOAN_DEMAND_SERIES
+        }
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.download_stats = {'retries': 0}
+        self._stats_lock = threading.Lock()
         
-    def download_series(self, series_code):
-        """Download a single FRED series as CSV"""
-        try:
-            url = f"{self.base_url}?id={series_code}"
-            response = requests.get(url, timeout=15)
+        # One keep-alive connection pool shared by all download threads
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
+        
+    def download_series(self, series_code, start_date=None):
+        """Download a single FRED series as CSV, optionally only observations from start_date on"""
+        url = f"{self.base_url}?id={series_code}"
+        if start_date is not None:
+            url += f"&cosd={start_date.isoformat()}"
+        
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self._record_retry()
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+            
+            try:
+                response = self.http.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"⚠️  Error downloading {series_code} (attempt {attempt + 1}): {e}")
+                continue
             
             if response.status_code == 200:
-                df = pd.read_csv(pd.io.common.StringIO(response.text))
-                df.columns = ['date', 'value']
-                df['date'] = pd.to_datetime(df['date'])
-                df['value'] = pd.to_numeric(df['value'], errors='coerce')
-                df = df.dropna()
+                try:
+                    df = pd.read_csv(pd.io.common.StringIO(response.text))
+                    df.columns = ['date', 'value']
+                    df['date'] = pd.to_datetime(df['date'])
+                    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+                    df = df.dropna()
+                except Exception as e:
+                    print(f"❌ Error parsing {series_code}: {e}")
+                    return None
                 
                 print(f"✅ Downloaded {series_code}: {len(df)} observations")
                 return df
-            else:
-                print(f"❌ Failed to download {series_code}: HTTP {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ Error downloading {series_code}: {e}")
-            return None
+            
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            print(f"⚠️  {series_code} returned HTTP {response.status_code} (attempt {attempt + 1})")
+        
+        print(f"❌ Failed to download {series_code}")
+        return None
+    
+    def _record_retry(self):
+        with self._stats_lock:
+            self.download_stats['retries'] += 1
     
-    def download_all_series(self):
-        """Download all SLOOS series from FRED"""
+    def get_refresh_state(self):
+        """Last stored observation date per FRED series code"""
+        return {
+            state.series_code: state.last_observation_date
+            for state in self.session.query(SeriesRefreshState).all()
+        }
+    
+    def _timed_download(self, code, start_date):
+        started = time.perf_counter()
+        df = self.download_series(code, start_date)
+        return df, time.perf_counter() - started
+    
+    def download_all_series(self, incremental=False):
+        """Download all SLOOS series from FRED concurrently (only recent observations when incremental)"""
         print("=" * 80)
         print("DOWNLOADING REAL SLOOS DATA FROM FRED")
         print("=" * 80)
         
-        print("\n📊 Downloading Lending Standards Data...")
-        for code, (category, data_type, bank_type) in LENDING_STANDARDS_SERIES.items():
-            df = self.download_series(code)
-            if df is not None:
-                self.downloaded_data[code] = {
-                    'data': df,
-                    'category': category,
-                    'type': data_type,
-                    'bank_type': bank_type,
-                    'series_type': 'lending_standards'
-                }
-        
-        print("\n📈 Downloading Loan Demand Data...")
-        for code, (category, data_type, bank_type) in LOAN_DEMAND_SERIES.items():
-            df = self.download_series(code)
-            if df is not None:
-                self.downloaded_data[code] = {
-                    'data': df,
+        last_observations = self.get_refresh_state() if incremental else {}
+        
+        jobs = []
+        for series_type, catalog in self.series.items():
+            for code, (category, data_type, bank_type) in catalog.items():
+                jobs.append((code, {
                     'category': category,
                     'type': data_type,
                     'bank_type': bank_type,
-                    'series_type': 'loan_demand'
-                }
+                    'series_type': series_type,
+                    'start_date': self._incremental_start(last_observations.get(code))
+                }))
+        
+        print(f"\n📊 Downloading {len(jobs)} series with up to {self.max_workers} parallel connections...")
+        self.download_stats = {'series': len(jobs), 'succeeded': 0, 'failed': 0, 'retries': 0}
+        
+        self._report_progress(stage='downloading', series_total=len(jobs), series_done=0)
+        started = time.perf_counter()
+        series_times = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._timed_download, code, info['start_date']): (code, info)
+                       for code, info in jobs}
+            results = {}
+            for future in as_completed(futures):
+                code, info = futures[future]
+                df, elapsed = future.result()
+                series_times[code] = elapsed
+                results[code] = df
+                self._report_progress(stage='downloading', series_done=len(results))
+        
+        # Keep the catalog order so loads are deterministic
+        for code, info in jobs:
+            if results[code] is not None:
+                self.downloaded_data[code] = dict(info, data=results[code])
         
-        print(f"\n✅ Successfully downloaded {len(self.downloaded_data)} series")
+        wall_time = time.perf_counter() - started
+        self.download_stats.update({
+            'succeeded': len(self.downloaded_data),
+            'failed': len(jobs) - len(self.downloaded_data),
+            'wall_time': wall_time,
+            'total_series_time': sum(series_times.values()),
+            'slowest_series': max(series_times, key=series_times.get) if series_times else None,
+            'slowest_series_time': max(series_times.values()) if series_times else 0.0
+        })
+        
+        print(f"\n✅ Successfully downloaded {len(self.downloaded_data)} series "
+              f"in {wall_time:.2f}s ({self.download_stats['retries']} retries, "
+              f"{self.download_stats['total_series_time']:.2f}s of sequential request time)")
         return len(self.downloaded_data) > 0
     
-    def clear_existing_data(self):
-        """Clear existing sample data from database"""
+    def _report_progress(self, **fields):
+        if self.progress_callback is not None:
+            self.progress_callback(fields)
+    
+    @staticmethod
+    def _incremental_start(last_observation_date):
+        if last_observation_date is None:
+            return None
+        return last_observation_date - REVISION_LOOKBACK
+    
+    def clear_existing_data(self, commit=True):
+        """Clear existing data from database (left uncommitted with commit=False for an atomic reload)"""
         try:
-            print("\n🗑️  Clearing existing sample data...")
-            self.session.query(LendingStandard).delete()
-            self.session.query(LoanDemand).delete()
-            self.session.commit()
+            print("\n🗑️  Clearing existing data...")
+            clear_observations(self.session)
+            bump_data_version(self.session)
+            if commit:
+                self.session.commit()
             print("✅ Existing data cleared")
             return True
         except Exception as e:
@@ -118,6 +234,51 @@ class RealSLOOSDataDownloader:
             self.session.rollback()
             return False
     
+    def build_series_frame(self, info):
+        """Build insert-ready rows for one downloaded series with vectorized component estimates"""
+        df = info['data']
+        net_values = df['value'].to_numpy(dtype=float)
+        
+        # The FRED series only publish the net percentage, so the components are
+        # estimated around a 50/50 split (this is a simplification)
+        increase_pct, decrease_pct, unchanged_pct = estimate_components(net_values)
+        
+        frame = pd.DataFrame({
+            # ISO strings are SQLAlchemy's storage format for Date columns on SQLite
+            'survey_date': df['date'].dt.strftime('%Y-%m-%d'),
+            'loan_category': info['category'],
+            'bank_type': info['bank_type'],
+            'unchanged_pct': unchanged_pct,
+        })
+        
+        if info['series_type'] == 'lending_standards':
+            frame['standard_type'] = 'Overall Standards'
+            frame['tightened_pct'] = increase_pct
+            frame['eased_pct'] = decrease_pct
+            frame['net_tightening'] = net_values
+        else:
+            frame['stronger_pct'] = increase_pct
+            frame['weaker_pct'] = decrease_pct
+            frame['net_demand'] = net_values
+        
+        return frame
+    
+    def _bulk_insert(self, table, frame, conflict_key=None):
+        """Insert a frame with one executemany call inside the session's transaction
+        
+        With conflict_key, rows whose natural key already exists are updated in place.
+        """
+        frame = frame.assign(created_at=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f'))
+        columns = list(frame.columns)
+        sql = (f"INSERT INTO {table.name} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        if conflict_key:
+            updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column not in conflict_key)
+            sql += f" ON CONFLICT ({', '.join(natural_key_sql(conflict_key))}) DO UPDATE SET {updates}"
+        rows = list(zip(*(frame[column].tolist() for column in columns)))
+        self.session.connection().exec_driver_sql(sql, rows)
+        return len(rows)
+    
     def load_to_database(self):
         """Load downloaded data into SQLite database"""
         if not self.downloaded_data:
@@ -125,69 +286,28 @@ class RealSLOOSDataDownloader:
             return False
         
         print("\n💾 Loading data into database...")
+        self._report_progress(stage='writing')
         
-        records_added = 0
-        
+        frames = {'lending_standards': [], 'loan_demand': []}
         for code, info in self.downloaded_data.items():
-            df = info['data']
-            category = info['category']
-            bank_type = info['bank_type']
-            series_type = info['series_type']
-            
-            for _, row in df.iterrows():
-                survey_date = row['date'].date()
-                net_value = row['value']
-                
-                if series_type == 'lending_standards':
-                    # For lending standards, net_tightening is the value
-                    # We'll estimate the components (this is a simplification)
-                    if net_value > 0:
-                        tightened_pct = min(100, abs(net_value) + 50)
-                        eased_pct = max(0, 50 - abs(net_value))
-                    else:
-                        tightened_pct = max(0, 50 - abs(net_value))
-                        eased_pct = min(100, abs(net_value) + 50)
-                    
-                    unchanged_pct = max(0, 100 - tightened_pct - eased_pct)
-                    
-                    record = LendingStandard(
-                        survey_date=survey_date,
-                        loan_category=category,
-                        standard_type='Overall Standards',
-                        tightened_pct=tightened_pct,
-                        eased_pct=eased_pct,
-                        unchanged_pct=unchanged_pct,
-                        net_tightening=net_value,
-                        bank_type=bank_type
-                    )
-                    self.session.add(record)
-                    records_added += 1
-                    
-                elif series_type == 'loan_demand':
-                    # For loan demand, net_demand is the value
-                    if net_value > 0:
-                        stronger_pct = min(100, abs(net_value) + 50)
-                        weaker_pct = max(0, 50 - abs(net_value))
-                    else:
-                        stronger_pct = max(0, 50 - abs(net_value))
-                        weaker_pct = min(100, abs(net_value) + 50)
-                    
-                    unchanged_pct = max(0, 100 - stronger_pct - weaker_pct)
-                    
-                    record = LoanDemand(
-                        survey_date=survey_date,
-                        loan_category=category,
-                        stronger_pct=stronger_pct,
-                        weaker_pct=weaker_pct,
-                        unchanged_pct=unchanged_pct,
-                        net_demand=net_value,
-                        bank_type=bank_type
-                    )
-                    self.session.add(record)
-                    records_added += 1
+            if info['series_type'] in frames:
+                frames[info['series_type']].append(self.build_series_frame(info))
+        
+        records_added = 0
         
         try:
+            for series_type, model in (('lending_standards', LendingStandard), ('loan_demand', LoanDemand)):
+                if frames[series_type]:
+                    frame = pd.concat(frames[series_type], ignore_index=True)
+                    records_added += self._bulk_insert(model.__table__, frame)
+            
+            for code, info in self.downloaded_data.items():
+                self._update_refresh_state(code, info, len(info['data']))
+            
+            refresh_aggregates(self.session)
+            bump_data_version(self.session)
             self.session.commit()
+            self._report_progress(stage='written', rows_written=records_added)
             print(f"✅ Successfully loaded {records_added} records into database")
             return True
         except Exception as e:
@@ -195,6 +315,79 @@ class RealSLOOSDataDownloader:
             self.session.rollback()
             return False
     
+    def _upsert_series(self, info):
+        """Write only the new or revised observations of one series, returning the number of rows written"""
+        frame = self.build_series_frame(info)
+        if frame.empty:
+            return 0
+        
+        if info['series_type'] == 'lending_standards':
+            model, value_column, natural_key = LendingStandard, 'net_tightening', LENDING_STANDARDS_KEY
+            filters = [LendingStandard.standard_type == 'Overall Standards']
+        else:
+            model, value_column, natural_key = LoanDemand, 'net_demand', LOAN_DEMAND_KEY
+            filters = []
+        
+        first_date = pd.Timestamp(frame['survey_date'].min()).date()
+        stored = self.session.query(model.survey_date, getattr(model, value_column)).filter(
+            model.loan_category == info['category'],
+            model.bank_type == info['bank_type'],
+            model.survey_date >= first_date,
+            *filters
+        ).all()
+        stored_values = {survey_date.isoformat(): value for survey_date, value in stored}
+        
+        previous = frame['survey_date'].map(stored_values).to_numpy(dtype=float)
+        changed = ~np.isclose(previous, frame[value_column].to_numpy(dtype=float))
+        changes = frame[changed]
+        if changes.empty:
+            return 0
+        
+        return self._bulk_insert(model.__table__, changes, conflict_key=natural_key)
+    
+    def _update_refresh_state(self, code, info, rows_written):
+        state = self.session.query(SeriesRefreshState).filter(
+            SeriesRefreshState.series_code == code).first()
+        if state is None:
+            state = SeriesRefreshState(series_code=code, series_type=info['series_type'])
+            self.session.add(state)
+        
+        if not info['data'].empty:
+            latest = info['data']['date'].max().date()
+            if state.last_observation_date is None or latest > state.last_observation_date:
+                state.last_observation_date = latest
+        state.rows_written = rows_written
+        state.last_refreshed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    def upsert_to_database(self):
+        """Apply downloaded observations incrementally; all series are committed together"""
+        if not self.downloaded_data:
+            print("❌ No data to load")
+            return False
+        
+        print("\n💾 Applying new and revised observations...")
+        self._report_progress(stage='writing')
+        
+        try:
+            records_written = 0
+            for code, info in self.downloaded_data.items():
+                rows_written = self._upsert_series(info)
+                self._update_refresh_state(code, info, rows_written)
+                records_written += rows_written
+                print(f"  {code}: {rows_written} new or revised rows")
+            
+            if records_written:
+                refresh_aggregates(self.session)
+                bump_data_version(self.session)
+            self.session.commit()
+            self._report_progress(stage='written', rows_written=records_written)
+            print(f"✅ Successfully wrote {records_written} new or revised records")
+            return True
+        except Exception as e:
+            print(f"❌ Error updating data: {e}")
+            self.session.rollback()
+            return False
+    
     def get_summary(self):
         """Get summary of loaded data"""
         try:
@@ -226,34 +419,45 @@ class RealSLOOSDataDownloader:
             print(f"❌ Error getting summary: {e}")
     
     def close(self):
-        """Close database session"""
+        """Close database session and HTTP connections"""
         self.session.close()
+        self.http.close()
 
 
-def main():
+def main(full_refresh=False, db_path='sloos_data.db', progress_callback=None, pregenerate=True, analyzer=None):
     """Main execution function"""
     print("\n" + "=" * 80)
     print("REAL SLOOS DATA DOWNLOADER")
     print("Downloading data from FRED (Federal Reserve Economic Data)")
+    print("Mode: " + ("full reload" if full_refresh else "incremental update"))
     print("=" * 80 + "\n")
     
-    downloader = RealSLOOSDataDownloader()
+    # Create or migrate the schema before the refresh state is read
+    init_database(db_path)
+    downloader = RealSLOOSDataDownloader(db_path=db_path, progress_callback=progress_callback)
     
     try:
-        # Step 1: Download all series
-        if not downloader.download_all_series():
+        # Step 1: Download all series (only recent observations when incremental)
+        if not downloader.download_all_series(incremental=not full_refresh):
             print("\n❌ Failed to download data")
             return False
         
-        # Step 2: Clear existing sample data
-        if not downloader.clear_existing_data():
-            print("\n❌ Failed to clear existing data")
-            return False
-        
-        # Step 3: Load real data into database
-        if not downloader.load_to_database():
-            print("\n❌ Failed to load data into database")
-            return False
+        if full_refresh:
+            # Step 2: Clear existing data; uncommitted so readers keep seeing the
+            # old rows until the reload below commits in the same transaction
+            if not downloader.clear_existing_data(commit=False):
+                print("\n❌ Failed to clear existing data")
+                return False
+            
+            # Step 3: Load real data into database
+            if not downloader.load_to_database():
+                print("\n❌ Failed to load data into database")
+                return False
+        else:
+            # Steps 2-3: Upsert only new and revised observations
+            if not downloader.upsert_to_database():
+                print("\n❌ Failed to update data in database")
+                return False
         
         # Step 4: Show summary
         downloader.get_summary()
@@ -261,6 +465,20 @@ def main():
         print("\n✅ SUCCESS! Real SLOOS data has been loaded into the database.")
         print("🚀 You can now use the application with real Federal Reserve data!\n")
         
+        # Step 5: Columnar snapshot the app memory-maps on cold starts
+        try:
+            write_snapshot(db_path)
+        except Exception as e:
+            print(f"\n⚠️  Columnar snapshot failed, the app will read from SQLite: {e}")
+        
+        # Step 6: Pre-generate the standard AI analyses for the new data; the
+        # data is already committed, so a Bedrock failure doesn't fail the refresh
+        if pregenerate:
+            try:
+                pregenerate_analyses(db_path, analyzer=analyzer, progress_callback=progress_callback)
+            except Exception as e:
+                print(f"\n⚠️  AI analysis pre-generation failed: {e}")
+        
         return True
         
     except Exception as e:
@@ -272,5 +490,12 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="Download real SLOOS data from FRED")
+    parser.add_argument('--full', action='store_true',
+                        help="clear and reload the full history instead of an incremental update")
+    parser.add_argument('--skip-analyses', action='store_true',
+                        help="don't pre-generate the standard AI analyses after loading")
+    args = parser.parse_args()
+    
+    success = main(full_refresh=args.full, pregenerate=not args.skip_analyses)
     exit(0 if success else 1)
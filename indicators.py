@@ -0,0 +1,232 @@
+"""
+Vectorized SLOOS indicators computed over all series at once.
+
+Series are held as a panel: a (dates x series) float array with NaN where a
+series has no observation. Every indicator works on the whole panel with
+NumPy array operations (cumulative sums, sliding windows, masked reductions)
+instead of looping over categories in pandas, so hundreds of series take
+milliseconds:
+
+    panel = build_panel(df_lending, 'net_tightening')
+    volatility = rolling_std(panel.values, window=4)
+    lags, corr = cross_correlation(tightening.values, demand.values, max_lag=8)
+"""
+
+from typing import NamedTuple, List
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Panel(NamedTuple):
+    """Aligned observations of many series: values[t, i] is series i at dates[t]"""
+    dates: np.ndarray
+    series: List[str]
+    values: np.ndarray
+
+
+def build_panel(df, value_column, by='loan_category'):
+    """Panel of value_column per `by` group, averaged across the other dimensions (e.g. bank type)"""
+    table = df.pivot_table(index='survey_date', columns=by, values=value_column, aggfunc='mean', observed=True)
+    return Panel(table.index.to_numpy(), [str(column) for column in table.columns], table.to_numpy(dtype=np.float64))
+
+
+def align_panels(left, right):
+    """Restrict two panels to their common dates and series, in the same order"""
+    dates = np.intersect1d(left.dates, right.dates)
+    series = [name for name in left.series if name in right.series]
+
+    def select(panel):
+        rows = np.searchsorted(panel.dates, dates)
+        columns = [panel.series.index(name) for name in series]
+        return Panel(dates, series, panel.values[np.ix_(rows, columns)])
+
+    return select(left), select(right)
+
+
+def reindex_panel(panel, dates, series):
+    """Panel on the given dates and series, NaN where the source has no observation"""
+    values = np.full((len(dates), len(series)), np.nan)
+    found = np.isin(dates, panel.dates)
+    rows = np.searchsorted(panel.dates, dates[found])
+    for i, name in enumerate(series):
+        if name in panel.series:
+            values[found, i] = panel.values[rows, panel.series.index(name)]
+    return Panel(dates, list(series), values)
+
+
+def _window_sums(values, window):
+    # Sums of x, x^2 and the observation count over each trailing window (shorter
+    # at the start of the series), NaNs skipped
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    ends = np.arange(1, values.shape[0] + 1)
+    starts = np.maximum(ends - window, 0)
+    sums = []
+    for term in (x, x * x, valid.astype(np.float64)):
+        cumulative = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(term, axis=0)])
+        sums.append(cumulative[ends] - cumulative[starts])
+    return sums
+
+
+def rolling_mean(values, window=4, min_periods=None):
+    """Trailing rolling mean of each column; NaN until min_periods (default window) observations"""
+    total, _, count = _window_sums(values, window)
+    min_periods = window if min_periods is None else min_periods
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count >= min_periods, total / count, np.nan)
+
+
+def rolling_std(values, window=4, min_periods=None):
+    """Trailing rolling sample standard deviation (ddof=1) of each column"""
+    total, squares, count = _window_sums(values, window)
+    min_periods = max(2, window if min_periods is None else min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - total * total / count) / (count - 1)
+        return np.where(count >= min_periods, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+
+def zscores(values, expanding=False):
+    """Each value's z-score against its series' history.
+
+    With expanding=True only observations up to that date count as history,
+    which avoids look-ahead when the scores are used as signals.
+    """
+    if expanding:
+        valid = ~np.isnan(values)
+        x = np.where(valid, values, 0.0)
+        count = np.cumsum(valid, axis=0)
+        total = np.cumsum(x, axis=0)
+        squares = np.cumsum(x * x, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum((squares - total * mean) / (count - 1), 0.0))
+    else:
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (values - mean) / std
+    return np.where(np.isfinite(scores), scores, np.nan)
+
+
+def diffusion_index(values, change=False):
+    """Net share of series above zero at each date, in percent (-100 to 100).
+
+    With change=True the index counts series rising minus series falling
+    since the previous date instead, a breadth measure of momentum.
+    """
+    if change:
+        values = np.diff(values, axis=0, prepend=np.nan)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    net = (np.where(valid, values, 0.0) > 0).sum(axis=1) - (np.where(valid, values, 0.0) < 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, 100.0 * net / count, np.nan)
+
+
+def cross_correlation(x, y, max_lag=8, min_periods=8):
+    """Pearson correlation of x[t] with y[t + lag] for every column and lag in [-max_lag, max_lag].
+
+    Returns (lags, corr) with corr shaped (lags, columns). A peak at a positive
+    lag means x leads y by that many periods. Each lag uses the dates where
+    both series are observed; fewer than min_periods pairs gives NaN.
+    """
+    lags = np.arange(-max_lag, max_lag + 1)
+    corr = np.full((lags.size, x.shape[1]), np.nan)
+    length = x.shape[0]
+    for i, lag in enumerate(lags):
+        if abs(lag) >= length:
+            continue
+        a = x[max(0, -lag):length - max(0, lag)]
+        b = y[max(0, lag):length - max(0, -lag)]
+        both = ~(np.isnan(a) | np.isnan(b))
+        n = both.sum(axis=0)
+        a = np.where(both, a, 0.0)
+        b = np.where(both, b, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_a = a.sum(axis=0) / n
+            mean_b = b.sum(axis=0) / n
+            da = np.where(both, a - mean_a, 0.0)
+            db = np.where(both, b - mean_b, 0.0)
+            r = (da * db).sum(axis=0) / np.sqrt((da * da).sum(axis=0) * (db * db).sum(axis=0))
+        corr[i] = np.where(n >= min_periods, r, np.nan)
+    return lags, corr
+
+
+def peak_lag(lags, corr):
+    """(lag, correlation) with the largest absolute correlation for each column; NaN where undefined"""
+    magnitude = np.where(np.isnan(corr), -np.inf, np.abs(corr))
+    best = magnitude.argmax(axis=0)
+    columns = np.arange(corr.shape[1])
+    defined = np.isfinite(magnitude[best, columns])
+    return (np.where(defined, lags[best], np.nan),
+            np.where(defined, corr[best, columns], np.nan))
+
+
+def turning_points(values, window=2, min_amplitude=0.0):
+    """+1 at peaks, -1 at troughs, 0 elsewhere, for each column.
+
+    A peak is the highest value within `window` dates on either side, above
+    the previous value and at least min_amplitude above the lowest value in
+    that span; troughs mirror this. Windows that touch a gap or the ends of
+    the series are not marked.
+    """
+    points = np.zeros(values.shape, dtype=np.int8)
+    span = 2 * window + 1
+    if values.shape[0] < span:
+        return points
+
+    windows = sliding_window_view(values, span, axis=0)
+    centre = values[window:-window]
+    previous = values[window - 1:-window - 1]
+    with np.errstate(invalid='ignore'):
+        high = windows.max(axis=-1)
+        low = windows.min(axis=-1)
+        complete = ~np.isnan(windows).any(axis=-1)
+        peaks = complete & (centre == high) & (centre > previous) & (centre - low >= min_amplitude)
+        troughs = complete & (centre == low) & (centre < previous) & (high - centre >= min_amplitude)
+    points[window:-window] = peaks.astype(np.int8) - troughs.astype(np.int8)
+    return points
+
+
+def latest_values(values):
+    """Last observed value of each column, NaN for all-missing columns"""
+    valid = ~np.isnan(values)
+    last = values.shape[0] - 1 - valid[::-1].argmax(axis=0)
+    result = values[last, np.arange(values.shape[1])]
+    return np.where(valid.any(axis=0), result, np.nan)
+
+
+def indicator_table(df_lending, df_demand, window=4, max_lag=8):
+    """Per-category summary of the latest indicators of tightening vs demand, as a DataFrame.
+
+    Every lending category gets a row; the demand and lead/lag columns are NaN
+    for categories without a demand series.
+    """
+    columns = ['loan_category', 'net_tightening', 'rolling_mean', 'volatility', 'zscore', 'net_demand',
+               'lead_lag', 'lead_lag_corr', 'last_turning_point']
+    if df_lending.empty:
+        return pd.DataFrame(columns=columns)
+    tightening = build_panel(df_lending, 'net_tightening')
+    demand = (build_panel(df_demand, 'net_demand') if not df_demand.empty
+              else Panel(tightening.dates[:0], [], np.empty((0, 0))))
+    # Demand on the lending dates and categories, so the lending panel sets the rows
+    demand = reindex_panel(demand, tightening.dates, tightening.series)
+    lags, corr = cross_correlation(tightening.values, demand.values, max_lag)
+    lead, lead_corr = peak_lag(lags, corr)
+    points = turning_points(tightening.values, window=2)
+    turned = np.where(points != 0, np.arange(points.shape[0])[:, None], -1).max(axis=0)
+    last_turn = pd.Series(tightening.dates[np.maximum(turned, 0)]).where(turned >= 0)
+
+    return pd.DataFrame({
+        'loan_category': tightening.series,
+        'net_tightening': latest_values(tightening.values),
+        'rolling_mean': latest_values(rolling_mean(tightening.values, window)),
+        'volatility': latest_values(rolling_std(tightening.values, window)),
+        'zscore': latest_values(zscores(tightening.values)),
+        'net_demand': latest_values(demand.values),
+        'lead_lag': lead,
+        'lead_lag_corr': lead_corr,
+        'last_turning_point': last_turn.to_numpy()
+    })
@@ -0,0 +1,44 @@
+"""
+Lazy, per-rerun data access for the app's pages.
+
+Every Streamlit rerun runs the whole script, so anything a page loads up
+front is paid on each widget click and navigation, whether or not the view
+that is showing uses it. Instead each page declares the data it needs by
+name, and main() hands it a PageData built for this rerun: a resource is
+only loaded when the page first reads it, and reading it again later in the
+same rerun (another tab, a chart helper) returns the same object.
+
+    PAGE_NEEDS = {'Dashboard': ('dashboard_aggregates',)}
+    data = PageData(data_version, LOADERS, PAGE_NEEDS['Dashboard'])
+    aggregates = data.get('dashboard_aggregates')
+"""
+
+
+class PageData:
+    """The data one page render needs, each resource loaded on first use and at most once.
+
+    loaders maps resource names to functions of the data version (usually the
+    app's cached loaders). Reading a resource the page did not declare raises
+    KeyError, so the declarations stay an accurate list of what a view loads.
+    """
+
+    def __init__(self, data_version, loaders, needs):
+        unknown = set(needs) - set(loaders)
+        if unknown:
+            raise ValueError(f"No loader for page data: {', '.join(sorted(unknown))}")
+        self.data_version = data_version
+        self.needs = tuple(needs)
+        self._loaders = loaders
+        self._loaded = {}
+
+    def get(self, name):
+        """The named resource, loaded now if this is its first use in the rerun"""
+        if name not in self.needs:
+            raise KeyError(f"Page did not declare '{name}' (declared: {', '.join(self.needs) or 'nothing'})")
+        if name not in self._loaded:
+            self._loaded[name] = self._loaders[name](self.data_version)
+        return self._loaded[name]
+
+    def loaded(self):
+        """Names of the resources this rerun actually loaded, in load order"""
+        return list(self._loaded)
@@ -0,0 +1,192 @@
+"""
+Token-budgeted data context for custom AI queries.
+
+Instead of pasting the last raw rows of each table, the context builder picks
+the series a question is about (loan categories, standards vs demand, date
+range), encodes them as compact quarterly or annual value lists with summary
+statistics, and degrades resolution until the context fits the token budget.
+"""
+
+import math
+import re
+
+import pandas as pd
+
+# Rough chars-per-token ratio for English text and numbers on Claude models
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Extra phrases users type for each category, on top of the words in its name
+CATEGORY_ALIASES = {
+    'Commercial & Industrial Loans - Large Firms': ('c&i', 'c & i', 'business', 'corporate', 'large firm',
+                                                    'large business', 'large compan', 'middle market'),
+    'Commercial & Industrial Loans - Small Firms': ('c&i', 'c & i', 'business', 'small firm', 'small business',
+                                                    'small compan'),
+    'Residential Mortgages - Prime': ('mortgage', 'housing', 'home loan', 'real estate'),
+    'Consumer Credit Cards': ('credit card', 'card'),
+    'Auto Loans': ('auto', 'car loan', 'vehicle'),
+    'Consumer Loans - Other': ('consumer', 'personal loan'),
+}
+
+# Name words too generic to identify a category on their own
+_NAME_STOPWORDS = {'loans', 'loan', 'firms', 'other', 'and', 'prime', 'credit'}
+
+# Dataset -> (metric column, words that point at it)
+DATASET_KEYWORDS = {
+    'lending_standards': ('net_tightening', ('standard', 'tighten', 'eased', 'easing', 'loosen', 'credit condition')),
+    'loan_demand': ('net_demand', ('demand', 'appetite', 'borrowing need')),
+}
+
+# Progressively coarser encodings tried until the context fits the budget
+RESOLUTIONS = ('quarterly', 'annual+recent', 'annual', 'stats')
+
+RECENT_QUARTERS = 8
+
+_YEAR = r'(19[89]\d|20\d\d)'
+
+
+def estimate_tokens(text):
+    """Approximate token count of a prompt fragment"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _category_keywords(category):
+    words = re.findall(r"[a-z&]+", category.lower())
+    return set(CATEGORY_ALIASES.get(category, ())) | {w for w in words if len(w) > 3 and w not in _NAME_STOPWORDS}
+
+
+def match_categories(query, categories):
+    """Categories the query mentions, best matches only; empty when none are mentioned"""
+    text = query.lower()
+    scores = {category: sum(1 for keyword in _category_keywords(category) if keyword in text)
+              for category in categories}
+    best = max(scores.values(), default=0)
+    if best == 0:
+        return []
+    return [category for category in categories if scores[category] == best]
+
+
+def match_datasets(query):
+    """Datasets the query is about; both when it names neither or both"""
+    text = query.lower()
+    matched = [dataset for dataset, (_, keywords) in DATASET_KEYWORDS.items()
+               if any(keyword in text for keyword in keywords)]
+    return matched or list(DATASET_KEYWORDS)
+
+
+def match_date_range(query, latest_date):
+    """(start, end) timestamps implied by the query; None for an open end"""
+    text = query.lower()
+
+    relative = re.search(r'(?:last|past|previous)\s+(\d+)\s+(year|quarter)s?', text)
+    if relative:
+        count, unit = int(relative.group(1)), relative.group(2)
+        months = count * (12 if unit == 'year' else 3)
+        return latest_date - pd.DateOffset(months=months), None
+
+    years = [int(year) for year in re.findall(rf'\b{_YEAR}\b', text)]
+    if len(years) >= 2:
+        return pd.Timestamp(min(years), 1, 1), pd.Timestamp(max(years), 12, 31)
+    if len(years) == 1:
+        if re.search(rf'\b(?:since|after|from|starting)\s+(?:\w+\s+)?{years[0]}\b', text):
+            return pd.Timestamp(years[0], 1, 1), None
+        return pd.Timestamp(years[0], 1, 1), pd.Timestamp(years[0], 12, 31)
+    if re.search(r'\b(?:recent|recently|latest|current|currently|now|lately)\b', text):
+        return latest_date - pd.DateOffset(months=3 * RECENT_QUARTERS), None
+    return None, None
+
+
+def _quarter_label(timestamp):
+    return f"{timestamp.year}Q{(timestamp.month - 1) // 3 + 1}"
+
+
+def _series_stats(series):
+    change = series.iloc[-1] - series.iloc[0]
+    return (f"n={len(series)}, latest {series.iloc[-1]:.1f} ({_quarter_label(series.index[-1])}), "
+            f"mean {series.mean():.1f}, min {series.min():.1f} ({_quarter_label(series.idxmin())}), "
+            f"max {series.max():.1f} ({_quarter_label(series.idxmax())}), change {change:+.1f}")
+
+
+def _encode_quarterly(series):
+    return ' '.join(f"{_quarter_label(date)}:{value:.1f}" for date, value in series.items())
+
+
+def _encode_annual(series):
+    annual = series.groupby(series.index.year).mean()
+    return ' '.join(f"{year}:{value:.1f}" for year, value in annual.items())
+
+
+def _encode_series(name, series, resolution):
+    lines = [f"{name}: {_series_stats(series)}"]
+    if resolution == 'quarterly':
+        lines.append(f"  quarterly {_encode_quarterly(series)}")
+    elif resolution == 'annual+recent':
+        lines.append(f"  annual mean {_encode_annual(series)}")
+        lines.append(f"  recent quarters {_encode_quarterly(series.tail(RECENT_QUARTERS))}")
+    elif resolution == 'annual':
+        lines.append(f"  annual mean {_encode_annual(series)}")
+    return '\n'.join(lines)
+
+
+def _category_series(df, value_column, category, start, end):
+    rows = df[df['loan_category'] == category]
+    if start is not None:
+        rows = rows[rows['survey_date'] >= start]
+    if end is not None:
+        rows = rows[rows['survey_date'] <= end]
+    # Average across bank types so each category is one series
+    return rows.groupby('survey_date')[value_column].mean().astype(float).dropna()
+
+
+def build_query_context(query, df_lending, df_demand, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Context for a custom query, restricted to the series it asks about and fitted to token_budget"""
+    frames = {'lending_standards': df_lending, 'loan_demand': df_demand}
+    all_categories = sorted(set(df_lending['loan_category'].unique()) | set(df_demand['loan_category'].unique()))
+    latest_date = max(df['survey_date'].max() for df in frames.values() if not df.empty)
+
+    categories = match_categories(query, all_categories) or all_categories
+    datasets = match_datasets(query)
+    start, end = match_date_range(query, latest_date)
+
+    header = (f"Values are percent of banks, net (tightening minus easing; stronger minus weaker demand), "
+              f"averaged across bank types. Series run "
+              f"{(start or min(df['survey_date'].min() for df in frames.values() if not df.empty)).date()} "
+              f"to {(end or latest_date).date()}.")
+
+    series = []
+    for dataset in datasets:
+        value_column = DATASET_KEYWORDS[dataset][0]
+        for category in categories:
+            values = _category_series(frames[dataset], value_column, category, start, end)
+            if not values.empty:
+                series.append((f"{category} [{value_column}]", values))
+
+    for resolution in RESOLUTIONS:
+        sections = [header] + [_encode_series(name, values, resolution) for name, values in series]
+        context = '\n'.join(sections)
+        if estimate_tokens(context) <= token_budget:
+            truncated = False
+            break
+    else:
+        # Even stats-only is too long: keep as many series as fit
+        kept = [header]
+        for section in sections[1:]:
+            if estimate_tokens('\n'.join(kept + [section])) > token_budget:
+                break
+            kept.append(section)
+        context = '\n'.join(kept)
+        truncated = True
+
+    return {
+        'context': context,
+        'input_tokens': estimate_tokens(context),
+        'token_budget': token_budget,
+        'categories': categories,
+        'datasets': datasets,
+        'start': start,
+        'end': end,
+        'resolution': resolution,
+        'series': len(series),
+        'truncated': truncated
+    }
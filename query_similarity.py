@@ -0,0 +1,229 @@
+"""
+Near-duplicate matching for custom AI queries.
+
+Users often ask paraphrases of a question that has already been answered
+("how have small business standards changed since 2020" vs "how did small
+firm standards shift since 2020"). Each answered query is stored with a
+lightweight lexical vector of its normalized words and the categories,
+datasets and date range the context builder resolved for it. A new query is
+served an earlier answer instead of a new Bedrock call only when it resolved
+to the same series, has the same match key and its vector is similar enough.
+The match key is the query's direction words (tighter vs easier, stronger vs
+weaker, more vs less, highest vs lowest, increase vs decrease, each possibly
+negated: "did not tighten") and statistic words (average, median, maximum,
+minimum), since queries differing only in those want different answers.
+Everything is computed locally, with no embedding model or network access.
+
+Matching is lexical, so a paraphrase in entirely different words ("C&I small
+firm tightening" for "small business standards changed") is not recognized.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+from database import AnsweredQuery, session_scope
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.85
+
+_STOPWORDS = {
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'been', 'by', 'can', 'did', 'do', 'does', 'for', 'from',
+    'has', 'have', 'how', 'i', 'in', 'is', 'it', 'its', 'loan', 'loans', 'me', 'of', 'on', 'or', 'over', 'please',
+    'show', 'tell', 'than', 'that', 'the', 'their', 'there', 'this', 'to', 'was', 'were', 'what', 'when', 'which',
+    'why', 'with', 'you',
+}
+
+# Words users use interchangeably for the same idea
+_SYNONYMS = {
+    'firm': 'business', 'firms': 'business', 'company': 'business', 'companies': 'business',
+    'corporate': 'business', 'businesses': 'business', 'c&i': 'business',
+    # Direction words fold to one token per direction, never across directions
+    'tightened': 'tighten', 'tightening': 'tighten', 'tighter': 'tighten', 'tightest': 'tighten',
+    'eased': 'ease', 'easing': 'ease', 'easier': 'ease', 'loosen': 'ease', 'loosened': 'ease',
+    'loosening': 'ease', 'looser': 'ease', 'loose': 'ease',
+    'stronger': 'strong', 'strongest': 'strong', 'strengthen': 'strong', 'strengthened': 'strong',
+    'strengthening': 'strong', 'weaker': 'weak', 'weakest': 'weak', 'weaken': 'weak', 'weakened': 'weak',
+    'weakening': 'weak', 'fewer': 'less',
+    'highest': 'high', 'higher': 'high', 'peak': 'high', 'peaked': 'high',
+    'lowest': 'low', 'lower': 'low', 'trough': 'low', 'bottom': 'low',
+    'increased': 'increase', 'increasing': 'increase', 'increases': 'increase', 'rise': 'increase',
+    'rose': 'increase', 'rising': 'increase', 'grow': 'increase', 'grew': 'increase', 'growing': 'increase',
+    'decreased': 'decrease', 'decreasing': 'decrease', 'decreases': 'decrease', 'fall': 'decrease',
+    'fell': 'decrease', 'falling': 'decrease', 'decline': 'decrease', 'declined': 'decrease',
+    'declining': 'decrease', 'drop': 'decrease', 'dropped': 'decrease',
+    'mortgage': 'housing', 'mortgages': 'housing', 'home': 'housing',
+    'car': 'auto', 'vehicle': 'auto', 'cards': 'card',
+    'shift': 'change', 'shifted': 'change', 'evolve': 'change', 'evolved': 'change', 'moved': 'change',
+    'recent': 'recently', 'lately': 'recently', 'latest': 'recently',
+    # Statistics fold the same way; they are part of the match key too
+    'mean': 'average', 'avg': 'average', 'max': 'maximum', 'min': 'minimum',
+}
+
+# Words negating the next direction word of their clause
+_NEGATIONS = {'not', 'no', 'never', 'nor', 'without'}
+
+_SUFFIXES = ('ing', 'ed', 'es', 'e', 's')
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+_DIRECTION_TERMS = {_stem(word) for word in ('tighten', 'ease', 'strong', 'weak', 'more', 'less', 'high', 'low',
+                                              'increase', 'decrease')}
+_STATISTIC_TERMS = {_stem(word) for word in ('average', 'median', 'maximum', 'minimum')}
+
+
+def query_terms(query):
+    """Normalized content words of a query, with negated direction words marked as not_<word>"""
+    terms = []
+    for clause in re.split(r"[,.;:!?]", query.lower()):
+        negated = False
+        for word in re.findall(r"[a-z0-9&]+(?:'t)?", clause):
+            if word in _NEGATIONS or word.endswith("n't"):
+                negated = True
+                continue
+            if word in _STOPWORDS:
+                continue
+            term = _stem(_SYNONYMS.get(word, word))
+            if negated and term in _DIRECTION_TERMS:
+                term, negated = f'not_{term}', False
+            terms.append(term)
+    return terms
+
+
+def query_key(terms):
+    """Direction and statistic words among a query's terms; two queries can only share an answer when these are equal"""
+    return frozenset(term for term in terms
+                     if term in _STATISTIC_TERMS or term.replace('not_', '', 1) in _DIRECTION_TERMS)
+
+
+def query_signature(query_context):
+    """The series a build_query_context() result resolved to, as a comparable string"""
+    start, end = query_context['start'], query_context['end']
+    return '|'.join([
+        ','.join(sorted(query_context['categories'])),
+        ','.join(sorted(query_context['datasets'])),
+        start.date().isoformat() if start is not None else '',
+        end.date().isoformat() if end is not None else '',
+    ])
+
+
+def query_vector(terms):
+    """Sparse {term: count} vector of a query's terms"""
+    return Counter(terms)
+
+
+def cosine_similarity(a, b):
+    """Cosine similarity of two sparse vectors"""
+    dot = sum(weight * b[feature] for feature, weight in a.items() if feature in b)
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class SimilarQueryIndex:
+    """Answered custom queries of the current data version, searchable by similarity.
+
+    Entries persist in the answered_queries table; the in-memory index is
+    rebuilt from it whenever the data version changes.
+    """
+
+    def __init__(self, db_path='sloos_data.db', threshold=DEFAULT_SIMILARITY_THRESHOLD, max_entries=500):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._entries = []
+
+    def _load(self, data_version):
+        # Caller holds the lock
+        if data_version == self._data_version:
+            return
+        with session_scope(self.db_path) as session:
+            rows = session.query(AnsweredQuery).filter(
+                AnsweredQuery.data_version == data_version).order_by(AnsweredQuery.id).all()
+            self._entries = []
+            for row in rows:
+                terms = query_terms(row.query_text)
+                self._entries.append({
+                    'query': row.query_text,
+                    'signature': row.signature,
+                    'answer': row.answer,
+                    'model': row.model_id,
+                    'key': query_key(terms),
+                    'vector': query_vector(terms)
+                })
+        self._data_version = data_version
+
+    def lookup(self, query, query_context, data_version, threshold=None):
+        """Best earlier answer to a similar query, or None when none reaches the threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        signature = query_signature(query_context)
+        terms = query_terms(query)
+        key = query_key(terms)
+        vector = query_vector(terms)
+        best, best_similarity = None, 0.0
+        try:
+            with self._lock:
+                self._load(data_version)
+                # Only queries resolved to the same series and asking in the
+                # same direction for the same statistic can share an answer
+                for entry in self._entries:
+                    if entry['signature'] != signature or entry['key'] != key:
+                        continue
+                    similarity = cosine_similarity(vector, entry['vector'])
+                    if similarity > best_similarity:
+                        best, best_similarity = entry, similarity
+        except Exception as e:
+            print(f"Similar query lookup failed: {e}")
+
+        if best is None or best_similarity < threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            'query': best['query'],
+            'answer': best['answer'],
+            'model': best['model'],
+            'similarity': best_similarity
+        }
+
+    def add(self, query, query_context, answer, model_id, data_version):
+        """Remember an answered query; drops entries of other data versions and the oldest beyond max_entries"""
+        signature = query_signature(query_context)
+        try:
+            with self._lock:
+                with session_scope(self.db_path) as session:
+                    session.add(AnsweredQuery(query_text=query, signature=signature, answer=answer,
+                                              model_id=model_id, data_version=data_version,
+                                              created_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+                    session.query(AnsweredQuery).filter(
+                        AnsweredQuery.data_version != data_version).delete(synchronize_session=False)
+                    session.flush()
+                    overflow = session.query(AnsweredQuery).count() - self.max_entries
+                    if overflow > 0:
+                        oldest = session.query(AnsweredQuery.id).order_by(AnsweredQuery.id).limit(overflow).all()
+                        session.query(AnsweredQuery).filter(
+                            AnsweredQuery.id.in_([row[0] for row in oldest])).delete(synchronize_session=False)
+                # Rebuilt on the next lookup
+                self._data_version = None
+        except Exception as e:
+            print(f"Similar query store failed: {e}")
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries)
+        }
@@ -0,0 +1,82 @@
+"""
+In-process FRED refresh service.
+
+Runs the downloader on a background thread inside the Streamlit server so the
+"Update Real Data from FRED" button returns immediately. The UI polls
+progress(); other sessions keep reading the previous data until the refresh
+commits and bumps the data version. The standard AI analyses are pre-generated
+for the new version before the refresh reports success.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+import download_real_sloos_data
+
+
+class RefreshService:
+    """Runs at most one FRED refresh at a time on a background thread"""
+
+    def __init__(self, db_path: str = 'sloos_data.db', analyzer=None):
+        self.db_path = db_path
+        self.analyzer = analyzer
+        self._lock = threading.Lock()
+        self._thread = None
+        self._progress = {'state': 'idle'}
+
+    def is_running(self) -> bool:
+        with self._lock:
+            return self._progress['state'] == 'running'
+
+    def start(self, full_refresh: bool = False) -> bool:
+        """Start a refresh; returns False if one is already running"""
+        with self._lock:
+            if self._progress['state'] == 'running':
+                return False
+            self._progress = {
+                'state': 'running',
+                'mode': 'full reload' if full_refresh else 'incremental update',
+                'stage': 'starting',
+                'series_total': 0,
+                'series_done': 0,
+                'rows_written': 0,
+                'started_at': datetime.now(),
+                'started': time.perf_counter(),
+                'error': None
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(full_refresh,), name='sloos-refresh', daemon=True)
+            self._thread.start()
+            return True
+
+    def progress(self) -> Dict[str, Any]:
+        """Snapshot of the current (or last) refresh, safe to read from any session"""
+        with self._lock:
+            progress = dict(self._progress)
+        if 'started' in progress:
+            end = progress.get('finished', time.perf_counter())
+            progress['elapsed'] = end - progress.pop('started')
+            progress.pop('finished', None)
+        return progress
+
+    def _update(self, fields: Dict[str, Any]):
+        with self._lock:
+            self._progress.update(fields)
+
+    def _run(self, full_refresh: bool):
+        try:
+            success = download_real_sloos_data.main(
+                full_refresh=full_refresh, db_path=self.db_path, progress_callback=self._update,
+                analyzer=self.analyzer)
+            error = None if success else 'Refresh failed, see the server log for details'
+        except Exception as e:
+            success, error = False, str(e)
+
+        self._update({
+            'state': 'succeeded' if success else 'failed',
+            'stage': 'done',
+            'error': error,
+            'finished': time.perf_counter()
+        })
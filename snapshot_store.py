@@ -0,0 +1,101 @@
+"""
+Columnar snapshots of the SLOOS tables, one per data version.
+
+After each refresh the downloader writes lending_standards and loan_demand as
+uncompressed Arrow IPC files next to the database. The app reads them through
+a memory map, so a cold start maps the columns instead of pulling every row
+out of SQLite, and numeric columns reach pandas without being copied.
+
+pyarrow is optional: without it, or when no snapshot matches the current data
+version, reads fall back to data_access and SQLite.
+"""
+
+import glob
+import os
+
+from database import read_data_version
+from data_access import read_lending_standards, read_loan_demand
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Snapshot table name -> SQLite reader used to build it and as the fallback
+TABLE_READERS = {
+    'lending_standards': read_lending_standards,
+    'loan_demand': read_loan_demand,
+}
+
+SNAPSHOT_SUFFIX = '.arrow'
+
+
+def snapshot_dir(db_path='sloos_data.db'):
+    """Directory holding the snapshots of db_path"""
+    return os.path.splitext(db_path)[0] + '_snapshots'
+
+
+def snapshot_path(table, data_version, db_path='sloos_data.db'):
+    """Path of a table's snapshot for data_version"""
+    return os.path.join(snapshot_dir(db_path), f"{table}-{data_version}{SNAPSHOT_SUFFIX}")
+
+
+def has_snapshot(data_version, db_path='sloos_data.db'):
+    """Whether every table has a snapshot for data_version"""
+    return all(os.path.exists(snapshot_path(table, data_version, db_path)) for table in TABLE_READERS)
+
+
+def write_snapshot(db_path='sloos_data.db', data_version=None):
+    """Write every table for the current data version and delete older snapshots; False without pyarrow"""
+    if pa is None:
+        print("pyarrow not installed, skipping columnar snapshot")
+        return False
+    if data_version is None:
+        data_version = read_data_version(db_path)
+
+    directory = snapshot_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    for table, reader in TABLE_READERS.items():
+        arrow_table = pa.Table.from_pandas(reader(db_path), preserve_index=False)
+        path = snapshot_path(table, data_version, db_path)
+        # Readers only ever see complete files
+        temp_path = path + '.tmp'
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(temp_path, path)
+
+    current = {snapshot_path(table, data_version, db_path) for table in TABLE_READERS}
+    for path in glob.glob(os.path.join(directory, f"*{SNAPSHOT_SUFFIX}")):
+        if path not in current:
+            os.remove(path)
+    print(f"✓ Wrote columnar snapshot for data version {data_version} to {directory}")
+    return True
+
+
+def ensure_snapshot(db_path='sloos_data.db'):
+    """Write the snapshot for databases loaded before snapshots existed (or without pyarrow at the time)"""
+    if pa is None:
+        return False
+    try:
+        data_version = read_data_version(db_path)
+        if has_snapshot(data_version, db_path):
+            return True
+        return write_snapshot(db_path, data_version)
+    except Exception as e:
+        print(f"Columnar snapshot unavailable: {e}")
+        return False
+
+
+def read_table(table, data_version, db_path='sloos_data.db'):
+    """Typed DataFrame of a table, memory-mapped from its snapshot when present, else read from SQLite"""
+    path = snapshot_path(table, data_version, db_path)
+    if pa is not None and os.path.exists(path):
+        try:
+            # Left open: the returned columns are views into the mapping
+            arrow_table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+            # split_blocks keeps one block per column so null-free numeric columns are not copied
+            return arrow_table.to_pandas(split_blocks=True)
+        except Exception as e:
+            print(f"Columnar snapshot read failed, falling back to SQLite: {e}")
+    return TABLE_READERS[table](db_path)
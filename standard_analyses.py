@@ -0,0 +1,151 @@
+"""
+Standard AI analyses, pre-generated after each data refresh.
+
+The executive summary, per-category sentiment and the last-year vs prior-year
+comparison depend only on the loaded data, so they are generated in one batch
+once a refresh commits and stored in the precomputed_analyses table under the
+new data version. The AI Analysis page serves them from there instead of
+making the first viewer after a release wait for Bedrock.
+"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database import PrecomputedAnalysis, session_scope, read_data_version
+from data_access import read_lending_standards, read_loan_demand
+from bedrock_client import BedrockAnalyzer, summary_prompt, sentiment_prompt, compare_periods_prompt
+from analysis_cache import AnalysisResponseCache
+
+EXECUTIVE_SUMMARY = 'executive_summary'
+CATEGORY_SENTIMENT = 'category_sentiment'
+YEAR_OVER_YEAR = 'year_over_year'
+
+
+def build_executive_summary(df_lending, df_demand):
+    """Latest-quarter data summary used for the executive summary"""
+    latest_date = df_lending['survey_date'].max()
+    recent_data = df_lending[df_lending['survey_date'] == latest_date]
+
+    return f"""
+    Latest Survey Date: {latest_date}
+
+    Lending Standards Summary:
+    {recent_data.groupby('loan_category', observed=True)['net_tightening'].mean().to_string()}
+
+    Average Net Tightening: {recent_data['net_tightening'].mean():.2f}%
+
+    Loan Demand Summary:
+    {df_demand[df_demand['survey_date'] == latest_date].groupby('loan_category', observed=True)['net_demand'].mean().to_string()}
+    """
+
+
+def build_sentiment_summary(df_lending, loan_category):
+    """Recent-quarter data summary used for a category's sentiment analysis"""
+    category_data = df_lending[df_lending['loan_category'] == loan_category]
+    recent_trend = category_data.tail(4)
+
+    return f"""
+    Loan Category: {loan_category}
+    Recent Quarters Net Tightening:
+    {recent_trend[['survey_date', 'net_tightening', 'bank_type']].to_string()}
+
+    Average Net Tightening (Recent): {recent_trend['net_tightening'].mean():.2f}%
+    Trend Direction: {'Increasing' if recent_trend['net_tightening'].iloc[-1] > recent_trend['net_tightening'].iloc[0] else 'Decreasing'}
+    """
+
+
+def build_period_summary(df_lending, start, end):
+    """Average net tightening by category between two dates, used for period comparisons"""
+    period_data = df_lending[
+        (df_lending['survey_date'] >= pd.Timestamp(start)) &
+        (df_lending['survey_date'] <= pd.Timestamp(end))
+    ]
+
+    return f"""
+    Date Range: {start} to {end}
+    Average Net Tightening by Category:
+    {period_data.groupby('loan_category', observed=True)['net_tightening'].mean().to_string()}
+    """
+
+
+def year_over_year_periods(df_lending):
+    """((start, end), (start, end)) dates of the prior year and the last year of data"""
+    max_date = df_lending['survey_date'].max().date()
+    return ((max_date - timedelta(days=730), max_date - timedelta(days=365)),
+            (max_date - timedelta(days=365), max_date))
+
+
+def standard_requests(df_lending, df_demand):
+    """{(analysis_type, subject): request} for every standard analysis of the given data"""
+    requests = {(EXECUTIVE_SUMMARY, ''): summary_prompt(build_executive_summary(df_lending, df_demand))}
+    for category in df_lending['loan_category'].unique():
+        requests[(CATEGORY_SENTIMENT, str(category))] = sentiment_prompt(
+            build_sentiment_summary(df_lending, category), category)
+    prior_year, last_year = year_over_year_periods(df_lending)
+    requests[(YEAR_OVER_YEAR, '')] = compare_periods_prompt(
+        build_period_summary(df_lending, *prior_year), build_period_summary(df_lending, *last_year))
+    return requests
+
+
+def load_standard_analyses(data_version, db_path='sloos_data.db'):
+    """{(analysis_type, subject): row dict} of the analyses stored for data_version"""
+    with session_scope(db_path) as session:
+        rows = session.query(PrecomputedAnalysis).filter(PrecomputedAnalysis.data_version == data_version).all()
+        return {
+            (row.analysis_type, row.subject): {
+                'analysis': row.analysis_text,
+                'model': row.model_id,
+                'generated_at': row.generated_at
+            }
+            for row in rows
+        }
+
+
+def pregenerate_analyses(db_path='sloos_data.db', analyzer=None, progress_callback=None):
+    """Generate and store the standard analyses for the current data version; returns counts"""
+    stats = {'generated': 0, 'failed': 0, 'skipped': 0}
+    df_lending = read_lending_standards(db_path)
+    df_demand = read_loan_demand(db_path)
+    if df_lending.empty:
+        print("No data loaded, skipping AI analysis pre-generation")
+        return stats
+
+    data_version = read_data_version(db_path)
+    stored = load_standard_analyses(data_version, db_path)
+    requests = {key: request for key, request in standard_requests(df_lending, df_demand).items()
+                if key not in stored}
+    stats['skipped'] = len(stored)
+
+    if analyzer is None:
+        analyzer = BedrockAnalyzer(region_name='us-east-1', cache=AnalysisResponseCache(db_path))
+
+    if progress_callback is not None:
+        progress_callback({'stage': 'generating analyses', 'analyses_total': len(requests), 'analyses_done': 0})
+
+    print(f"\nPre-generating {len(requests)} AI analyses for data version {data_version}...")
+    for done, (key, result) in enumerate(analyzer.batch_analyze(requests, operation='pregenerate'), start=1):
+        if result['success']:
+            with session_scope(db_path) as session:
+                session.add(PrecomputedAnalysis(
+                    analysis_type=key[0],
+                    subject=key[1],
+                    data_version=data_version,
+                    model_id=result.get('model'),
+                    analysis_text=result['analysis'],
+                    generated_at=datetime.utcnow()
+                ))
+            stats['generated'] += 1
+        else:
+            print(f"  ⚠️  {key[0]} {key[1]}: {result.get('error')}")
+            stats['failed'] += 1
+        if progress_callback is not None:
+            progress_callback({'analyses_done': done})
+
+    # Analyses of older data versions can never be served again
+    with session_scope(db_path) as session:
+        session.query(PrecomputedAnalysis).filter(PrecomputedAnalysis.data_version != data_version).delete()
+
+    print(f"✓ Pre-generated {stats['generated']} analyses "
+          f"({stats['failed']} failed, {stats['skipped']} already stored)")
+    return stats
@@ -0,0 +1,223 @@
+"""
+Local stand-in for the boto3 bedrock-runtime client.
+
+Emits the same response shapes as Bedrock's Anthropic Messages API so that
+BedrockAnalyzer can be exercised without AWS credentials or network access:
+
+    from tests.fake_bedrock import FakeBedrockClient
+    analyzer = BedrockAnalyzer(client=FakeBedrockClient("Credit is tightening."))
+
+AsyncFakeBedrockClient does the same for AsyncBedrockAnalyzer, sleeping on the
+event loop instead of blocking a thread.
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
+
+from botocore.exceptions import ClientError, EventStreamError, ReadTimeoutError
+
+
+class FakeBedrockClient:
+    """Fake bedrock-runtime client returning canned text, optionally chunked, delayed, throttled or failing.
+
+    response_text and first_token_latency may also be functions of the prompt
+    text, to give each request its own answer or speed. read_timeout mimics
+    botocore's: a response slower than it raises ReadTimeoutError. Calls to any
+    model in unavailable_models raise ServiceUnavailableException, and a stream
+    breaks off with a ModelStreamErrorException after fail_after_chunks chunks.
+    """
+
+    def __init__(self, response_text: Union[str, Callable[[str], str]] = "This is a fake SLOOS analysis.",
+                 chunk_size: int = 8, first_token_latency: Union[float, Callable[[str], float]] = 0.0,
+                 chunk_latency: float = 0.0, throttle_first: int = 0, read_timeout: Optional[float] = None,
+                 unavailable_models: Iterable[str] = (), fail_after_chunks: Optional[int] = None):
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.throttle_first = throttle_first
+        self.read_timeout = read_timeout
+        self.unavailable_models = set(unavailable_models)
+        self.fail_after_chunks = fail_after_chunks
+        self.calls: List[Dict[str, Any]] = []
+        self.throttled = 0
+        self.cached_prefixes = set()
+        # Requests being answered right now, the most seen at once, and how many were cancelled
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def _record_call(self, modelId: str, body: str) -> Dict[str, Any]:
+        request = json.loads(body)
+        with self._lock:
+            self.calls.append({'modelId': modelId, 'body': request, 'time': time.monotonic()})
+            throttle = len(self.calls) <= self.throttle_first
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests'}},
+                              'InvokeModel')
+        if modelId in self.unavailable_models:
+            raise ClientError({'Error': {'Code': 'ServiceUnavailableException', 'Message': 'Model is unavailable'}},
+                              'InvokeModel')
+        return request
+
+    def _started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _first_token_latency(self, request: Dict[str, Any]) -> float:
+        latency = self.first_token_latency
+        return latency(prompt_text(request)) if callable(latency) else latency
+
+    def _timed_out(self, request: Dict[str, Any]) -> bool:
+        return self.read_timeout is not None and self._first_token_latency(request) > self.read_timeout
+
+    def _read_timeout_error(self) -> ReadTimeoutError:
+        return ReadTimeoutError(endpoint_url='https://bedrock-runtime.fake.amazonaws.com')
+
+    def _stream_error(self) -> EventStreamError:
+        return EventStreamError({'Error': {'Code': 'ModelStreamErrorException', 'Message': 'Stream interrupted'}},
+                                'InvokeModelWithResponseStream')
+
+    def _chunks(self, request: Dict[str, Any]) -> List[str]:
+        text = self.response_text(prompt_text(request)) if callable(self.response_text) else self.response_text
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _input_usage(self, request: Dict[str, Any]) -> Dict[str, int]:
+        """Input token usage, simulating prompt caching of everything up to the last cache_control block"""
+        system = request.get('system', [])
+        blocks = system if isinstance(system, list) else [{'type': 'text', 'text': system}]
+        for message in request.get('messages', []):
+            content = message['content']
+            blocks = blocks + (content if isinstance(content, list) else [{'type': 'text', 'text': content}])
+
+        marked = [i for i, block in enumerate(blocks) if 'cache_control' in block]
+        split = marked[-1] + 1 if marked else 0
+        prefix_tokens = len(json.dumps(blocks[:split])) // 4 if split else 0
+        input_tokens = max(1, len(json.dumps(blocks[split:])) // 4)
+
+        usage = {'input_tokens': input_tokens, 'cache_read_input_tokens': 0, 'cache_creation_input_tokens': 0}
+        if split:
+            prefix = json.dumps(blocks[:split], sort_keys=True)
+            with self._lock:
+                hit = prefix in self.cached_prefixes
+                self.cached_prefixes.add(prefix)
+            usage['cache_read_input_tokens' if hit else 'cache_creation_input_tokens'] = prefix_tokens
+        return usage
+
+    def _response_delay(self, request: Dict[str, Any]) -> float:
+        return self._first_token_latency(request) + self.chunk_latency * len(self._chunks(request))
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        request = self._record_call(modelId, body)
+        self._started()
+        try:
+            if self._timed_out(request):
+                time.sleep(self.read_timeout)
+                raise self._read_timeout_error()
+            time.sleep(self._response_delay(request))
+            return {'body': io.BytesIO(json.dumps(self._response_body(request)).encode('utf-8'))}
+        finally:
+            self._finished()
+
+    def _response_body(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        chunks = self._chunks(request)
+        return {
+            'type': 'message',
+            'role': 'assistant',
+            'content': [{'type': 'text', 'text': ''.join(chunks)}],
+            'stop_reason': 'end_turn',
+            'usage': {
+                **self._input_usage(request),
+                'output_tokens': len(chunks)
+            }
+        }
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        request = self._record_call(modelId, body)
+        if self._timed_out(request):
+            time.sleep(self.read_timeout)
+            raise self._read_timeout_error()
+        return {'body': self._event_stream(request)}
+
+    def _event_stream(self, request: Dict[str, Any]):
+        for event, delay in self._timed_events(request):
+            time.sleep(delay)
+            yield event
+
+    def _timed_events(self, request: Dict[str, Any]):
+        """(event, seconds to wait before emitting it) pairs of one streamed response"""
+        chunks = self._chunks(request)
+        yield _event({'type': 'message_start',
+                      'message': {'usage': {**self._input_usage(request), 'output_tokens': 0}}}), 0.0
+        yield _event({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}), 0.0
+        for i, chunk in enumerate(chunks):
+            if i == self.fail_after_chunks:
+                raise self._stream_error()
+            yield _event({'type': 'content_block_delta', 'index': 0,
+                          'delta': {'type': 'text_delta', 'text': chunk}}), \
+                self._first_token_latency(request) if i == 0 else self.chunk_latency
+        yield _event({'type': 'content_block_stop', 'index': 0}), self.chunk_latency if chunks else 0.0
+        yield _event({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'},
+                      'usage': {'output_tokens': len(chunks)}}), 0.0
+        yield _event({'type': 'message_stop'}), 0.0
+
+
+class AsyncFakeBedrockClient(FakeBedrockClient):
+    """Awaitable variant of FakeBedrockClient with the aiobotocore response shapes"""
+
+    async def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        request = self._record_call(modelId, body)
+        self._started()
+        try:
+            if self._timed_out(request):
+                await asyncio.sleep(self.read_timeout)
+                raise self._read_timeout_error()
+            await asyncio.sleep(self._response_delay(request))
+            return {'body': _AsyncBody(json.dumps(self._response_body(request)).encode('utf-8'))}
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self._finished()
+
+    async def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        request = self._record_call(modelId, body)
+        if self._timed_out(request):
+            await asyncio.sleep(self.read_timeout)
+            raise self._read_timeout_error()
+        return {'body': self._async_event_stream(request)}
+
+    async def _async_event_stream(self, request: Dict[str, Any]):
+        for event, delay in self._timed_events(request):
+            await asyncio.sleep(delay)
+            yield event
+
+
+class _AsyncBody:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+def prompt_text(request: Dict[str, Any]) -> str:
+    """Text of the last content block of a request body: the task prompt"""
+    content = request['messages'][-1]['content']
+    return content if isinstance(content, str) else content[-1]['text']
+
+
+def _event(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
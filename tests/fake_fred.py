@@ -0,0 +1,100 @@
+"""
+Local stand-in for FRED's fredgraph.csv endpoint.
+
+Serves canned quarterly observations for any series id over HTTP on a free
+port, so RealSLOOSDataDownloader can be exercised without network access:
+
+    with FakeFredServer(latency=0.05) as fred:
+        downloader = RealSLOOSDataDownloader(db_path)
+        downloader.base_url = fred.url
+
+Per-series failures are scripted as a list of HTTP statuses returned before
+the series is served (errors) or on every request (always_fail).
+"""
+
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def quarterly_observations(first_year: int = 2015, last_year: int = 2024) -> List[tuple]:
+    """(date, value) pairs for every quarter of the given years"""
+    return [(date(year, month, 1), float((year - first_year) * 4 + month // 3))
+            for year in range(first_year, last_year + 1) for month in (1, 4, 7, 10)]
+
+
+class FakeFredServer:
+    """Threaded HTTP server answering fredgraph.csv requests, recording each one"""
+
+    def __init__(self, latency: float = 0.0, errors: Optional[Dict[str, Iterable[int]]] = None,
+                 always_fail: Optional[Dict[str, int]] = None, observations: Optional[List[tuple]] = None):
+        self.latency = latency
+        self.errors = {code: list(statuses) for code, statuses in (errors or {}).items()}
+        self.always_fail = dict(always_fail or {})
+        self.observations = observations if observations is not None else quarterly_observations()
+        # (series id, cosd or None, HTTP status) of every request, in arrival order
+        self.requests: List[tuple] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/graph/fredgraph.csv"
+
+    def requests_for(self, series_code: str) -> List[tuple]:
+        return [request for request in self.requests if request[0] == series_code]
+
+    def __enter__(self) -> 'FakeFredServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _respond(self, series_code: str, start: Optional[str]):
+        """(status, body) for one request"""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            pending = self.errors.get(series_code)
+            status = self.always_fail.get(series_code) or (pending.pop(0) if pending else 200)
+            self.requests.append((series_code, start, status))
+        try:
+            time.sleep(self.latency)
+            if status != 200:
+                return status, 'error'
+            rows = [f"{day.isoformat()},{value}" for day, value in self.observations
+                    if start is None or day.isoformat() >= start]
+            return status, '\n'.join([f"observation_date,{series_code}"] + rows) + '\n'
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                status, body = server._respond(query['id'][0], query.get('cosd', [None])[0])
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
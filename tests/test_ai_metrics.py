@@ -0,0 +1,27 @@
+from ai_metrics import AnalysisMetrics
+
+MODEL = 'us.anthropic.claude-3-5-sonnet-20240620-v1:0'
+
+
+def test_latency_sum_and_count_cover_every_call_not_just_the_window():
+    metrics = AnalysisMetrics(window=2)
+    for wall_time in (1.0, 2.0, 3.0):
+        metrics.record(MODEL, wall_time=wall_time)
+    metrics.record(MODEL, cached=True, wall_time=0.001)
+
+    summary = metrics.summary()
+
+    assert summary['window'] == 2
+    assert summary['wall_time_count'] == 3
+    assert summary['wall_time_sum'] == 6.0
+    assert summary['wall_time_p50'] == 3.0
+    assert 'sloos_ai_wall_time_seconds_sum 6.0' in metrics.to_prometheus()
+
+
+def test_retries_are_recorded_per_call_and_in_total():
+    metrics = AnalysisMetrics()
+    metrics.record(MODEL, wall_time=1.0, retries=2)
+    metrics.record(MODEL, wall_time=1.0)
+
+    assert [record['retries'] for record in metrics.recent()] == [2, 0]
+    assert metrics.totals['retries'] == 2
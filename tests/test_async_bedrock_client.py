@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from async_bedrock_client import AsyncBedrockAnalyzer
+from tests.fake_bedrock import AsyncFakeBedrockClient
+
+PROMPTS = {f'prompt-{i}': f"Prompt {i}" for i in range(10)}
+
+
+def make_analyzer(client, **options):
+    # No pacing or backoff delays, so only the client's latency is measured
+    return AsyncBedrockAnalyzer(client=client, requests_per_second=1000, burst=100, backoff_seconds=0.0, **options)
+
+
+async def run_batch(analyzer, prompts, **options):
+    return {key: result async for key, result in analyzer.batch_analyze(prompts, **options)}
+
+
+def test_batch_in_flight_requests_are_bounded_by_max_concurrency():
+    client = AsyncFakeBedrockClient(first_token_latency=0.02)
+    analyzer = make_analyzer(client, max_concurrency=3)
+
+    results = asyncio.run(run_batch(analyzer, PROMPTS))
+
+    assert all(result['success'] for result in results.values())
+    assert client.max_in_flight == 3
+
+
+def test_deadline_times_out_one_request_without_holding_up_the_batch():
+    client = AsyncFakeBedrockClient(first_token_latency=lambda prompt: 5.0 if prompt == "Prompt 0" else 0.01)
+    analyzer = make_analyzer(client)
+
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(analyzer, PROMPTS, timeout=0.2))
+
+    assert time.perf_counter() - start < 1.0
+    assert results['prompt-0']['error_code'] == 'Timeout'
+    assert all(results[key]['success'] for key in PROMPTS if key != 'prompt-0')
+    # The abandoned request was cancelled rather than left running
+    assert client.cancelled == 1
+    assert client.in_flight == 0
+
+
+def test_cancelling_the_batch_cancels_in_flight_requests():
+    client = AsyncFakeBedrockClient(first_token_latency=5.0)
+    analyzer = make_analyzer(client, max_concurrency=4)
+
+    async def cancel_batch():
+        consumer = asyncio.ensure_future(run_batch(analyzer, PROMPTS))
+        while client.in_flight < 4:
+            await asyncio.sleep(0.01)
+        consumer.cancel()
+        try:
+            await consumer
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    start = time.perf_counter()
+    assert asyncio.run(cancel_batch())
+
+    assert time.perf_counter() - start < 1.0
+    assert client.cancelled == 4
+    assert client.in_flight == 0
+    # Requests still queued on the semaphore never reached the client
+    assert len(client.calls) == 4
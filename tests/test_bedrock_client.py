@@ -0,0 +1,159 @@
+import pytest
+
+from bedrock_client import BedrockAnalyzer
+from tests.fake_bedrock import FakeBedrockClient
+
+PROMPTS = {key: f"Prompt {key}" for key in 'abcdef'}
+PRIMARY = 'us.anthropic.claude-3-5-sonnet-20240620-v1:0'
+FALLBACK = 'us.anthropic.claude-3-5-haiku-20241022-v1:0'
+
+
+def make_analyzer(client, **options):
+    # No pacing or backoff delays, so the tests run instantly
+    return BedrockAnalyzer(client=client, model_id=PRIMARY, requests_per_second=1000, burst=100,
+                           backoff_seconds=0.0, **options)
+
+
+def test_stream_yields_text_chunks():
+    client = FakeBedrockClient("Credit is tightening.", chunk_size=5)
+    analysis = make_analyzer(client).analyze_data_stream("How have standards changed?")
+
+    assert list(analysis) == ["Credi", "t is ", "tight", "ening", "."]
+    assert analysis.text == "Credit is tightening."
+    assert analysis.metrics['success']
+
+
+def test_stream_records_first_token_time_and_usage():
+    client = FakeBedrockClient("Credit is tightening.", chunk_size=5, first_token_latency=0.05)
+    analyzer = make_analyzer(client)
+    analysis = analyzer.analyze_data_stream("How have standards changed?", context="Net tightening: 12.5")
+
+    ''.join(analysis)
+
+    metrics = analysis.metrics
+    assert metrics['time_to_first_byte'] < 0.05 <= metrics['time_to_first_token'] <= metrics['total_time']
+    assert metrics['input_tokens'] > 0
+    assert metrics['output_tokens'] == 5
+    assert metrics['tokens_per_second'] > 0
+    assert analyzer.metrics.recent()[-1]['time_to_first_token'] == metrics['time_to_first_token']
+
+
+def test_stream_error_mid_response_is_reported():
+    client = FakeBedrockClient("Credit is tightening.", chunk_size=5, fail_after_chunks=2)
+    analyzer = make_analyzer(client)
+    analysis = analyzer.analyze_data_stream("How have standards changed?")
+
+    chunks = list(analysis)
+
+    assert chunks[:2] == ["Credi", "t is "]
+    assert chunks[2].startswith("\n\nError:")
+    assert not analysis.metrics['success']
+    assert analysis.metrics['error_code'] == 'ModelStreamErrorException'
+    assert analyzer.metrics.totals['errors'] == 1
+
+
+def test_throttled_requests_are_retried():
+    client = FakeBedrockClient(throttle_first=2)
+    analyzer = make_analyzer(client, max_retries=4)
+
+    result = analyzer.analyze_data("How have standards changed?")
+
+    assert result['success']
+    assert client.throttled == 2
+    assert len(client.calls) == 3
+    assert result['retries'] == 2
+    assert analyzer.metrics.recent()[-1]['retries'] == 2
+    assert analyzer.metrics.totals['retries'] == 2
+
+
+def test_throttling_beyond_max_retries_fails():
+    client = FakeBedrockClient(throttle_first=10)
+    analyzer = make_analyzer(client, max_retries=2)
+
+    result = analyzer.analyze_data("How have standards changed?")
+
+    assert not result['success']
+    assert result['error_code'] == 'ThrottlingException'
+    assert len(client.calls) == 3
+
+
+def test_circuit_breaker_opens_after_repeated_timeouts():
+    client = FakeBedrockClient(first_token_latency=0.02, read_timeout=0.01)
+    analyzer = make_analyzer(client, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        assert analyzer.analyze_data("How have standards changed?")['error_code'] == 'ReadTimeoutError'
+    assert analyzer.breakers[PRIMARY].state == 'open'
+
+    result = analyzer.analyze_data("How have standards changed?")
+    assert result['error_code'] == 'CircuitOpenError'
+    # The open breaker fails fast without calling the model
+    assert len(client.calls) == 2
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_fallback_model_answers_when_primary_is_unavailable(stream):
+    client = FakeBedrockClient("Fallback answer.", unavailable_models=[PRIMARY])
+    analyzer = make_analyzer(client, max_retries=1, fallback_model_id=FALLBACK)
+
+    if stream:
+        analysis = analyzer.analyze_data_stream("How have standards changed?")
+        text, result = ''.join(analysis), analysis.metrics
+    else:
+        result = analyzer.analyze_data("How have standards changed?")
+        text = result['analysis']
+
+    assert text == "Fallback answer."
+    assert result['model'] == FALLBACK
+    assert result['fallback']
+    assert [call['modelId'] for call in client.calls] == [PRIMARY, PRIMARY, FALLBACK]
+    assert analyzer.metrics.totals['fallbacks'] == 1
+
+
+def test_batch_results_map_to_their_prompts():
+    # Later prompts answer sooner, so completion order is the reverse of input order
+    delays = {prompt: 0.01 * (len(PROMPTS) - i) for i, prompt in enumerate(PROMPTS.values())}
+    client = FakeBedrockClient(lambda prompt: f"Answer to {prompt}", first_token_latency=delays.get)
+    analyzer = make_analyzer(client)
+
+    completed = list(analyzer.batch_analyze(PROMPTS, max_workers=len(PROMPTS)))
+    ordered = list(analyzer.batch_analyze(PROMPTS, max_workers=len(PROMPTS), ordered=True))
+
+    assert [key for key, _ in completed] != list(PROMPTS)
+    assert {key: result['analysis'] for key, result in completed} == {
+        key: f"Answer to {prompt}" for key, prompt in PROMPTS.items()}
+    assert [(key, result['analysis']) for key, result in ordered] == [
+        (key, f"Answer to {prompt}") for key, prompt in PROMPTS.items()]
+
+
+def test_batch_throttling_is_retried_and_counted():
+    client = FakeBedrockClient(throttle_first=3)
+    analyzer = make_analyzer(client, max_retries=4)
+
+    results = dict(analyzer.batch_analyze(PROMPTS, max_workers=3))
+
+    assert all(result['success'] for result in results.values())
+    assert client.throttled == 3
+    assert sum(result['retries'] for result in results.values()) == 3
+    assert analyzer.metrics.totals['retries'] == 3
+
+
+def test_batch_concurrency_is_capped_by_workers():
+    client = FakeBedrockClient(first_token_latency=0.05)
+    analyzer = make_analyzer(client)
+
+    list(analyzer.batch_analyze(PROMPTS, max_workers=2))
+
+    assert client.max_in_flight == 2
+
+
+def test_batch_start_rate_is_capped_by_token_bucket():
+    client = FakeBedrockClient()
+    analyzer = BedrockAnalyzer(client=client, model_id=PRIMARY, requests_per_second=20, burst=2)
+
+    list(analyzer.batch_analyze(PROMPTS, max_workers=len(PROMPTS)))
+
+    # A burst of 2 starts at once; the other 4 wait for tokens at 20 per second
+    starts = sorted(call['time'] for call in client.calls)
+    assert starts[1] - starts[0] < 0.04
+    assert starts[-1] - starts[0] >= (len(PROMPTS) - 2) / 20 - 0.02
@@ -0,0 +1,39 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from database import init_database
+from download_real_sloos_data import RealSLOOSDataDownloader
+
+INSERT_DEMAND = ("INSERT INTO loan_demand (survey_date, loan_category, bank_type, net_demand) "
+                 "VALUES ('2020-01-01', 'Auto Loans', NULL, ?)")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'sloos_data.db')
+    init_database(path)
+    return path
+
+
+def test_natural_key_rejects_duplicates_with_null_bank_type(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(INSERT_DEMAND, (1.0,))
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute(INSERT_DEMAND, (2.0,))
+
+
+def test_upsert_updates_rows_with_null_bank_type_in_place(db_path):
+    downloader = RealSLOOSDataDownloader(db_path=db_path)
+    info = {'category': 'Auto Loans', 'type': 'net_demand', 'bank_type': None, 'series_type': 'loan_demand'}
+    try:
+        for value in (1.0, 2.0):
+            data = pd.DataFrame({'date': pd.to_datetime(['2020-01-01']), 'value': [value]})
+            assert downloader._upsert_series(dict(info, data=data)) == 1
+            downloader.session.commit()
+    finally:
+        downloader.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*), MAX(net_demand) FROM loan_demand").fetchone() == (1, 2.0)
@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+from database import init_database, session_scope, bump_data_version, clear_observations
+from download_real_sloos_data import RealSLOOSDataDownloader, LENDING_STANDARDS_SERIES, LOAN_DEMAND_SERIES
+from tests.fake_fred import FakeFredServer, quarterly_observations
+
+SERIES_COUNT = len(LENDING_STANDARDS_SERIES) + len(LOAN_DEMAND_SERIES)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'sloos_data.db')
+    init_database(path)
+    return path
+
+
+def make_downloader(db_path, fred, **options):
+    downloader = RealSLOOSDataDownloader(db_path=db_path, backoff_seconds=0.0, **options)
+    downloader.base_url = fred.url
+    return downloader
+
+
+def download(db_path, fred, **options):
+    downloader = make_downloader(db_path, fred, **options)
+    try:
+        downloader.download_all_series()
+        return downloader.downloaded_data, downloader.download_stats
+    finally:
+        downloader.close()
+
+
+def refresh(db_path, fred):
+    """An incremental refresh, as the app and the CLI run it by default"""
+    downloader = make_downloader(db_path, fred)
+    try:
+        return downloader.download_all_series(incremental=True) and downloader.upsert_to_database()
+    finally:
+        downloader.close()
+
+
+def row_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                     for table in ('lending_standards', 'loan_demand'))
+    finally:
+        conn.close()
+
+
+def test_series_are_downloaded_concurrently(db_path):
+    with FakeFredServer(latency=0.1) as fred:
+        downloaded, stats = download(db_path, fred, max_workers=4)
+
+    assert len(downloaded) == SERIES_COUNT
+    assert fred.max_in_flight == 4
+    # Nine 0.1s requests four at a time take three rounds, not nine
+    assert stats['wall_time'] < 0.1 * SERIES_COUNT / 2
+
+
+def test_throttled_and_server_errors_are_retried(db_path):
+    with FakeFredServer(errors={'DRTSCIS': [429, 503], 'DRSDSP': [500]}) as fred:
+        downloaded, stats = download(db_path, fred)
+
+    assert len(downloaded) == SERIES_COUNT
+    assert [status for _, _, status in fred.requests_for('DRTSCIS')] == [429, 503, 200]
+    assert [status for _, _, status in fred.requests_for('DRSDSP')] == [500, 200]
+    assert stats['retries'] == 3
+
+
+def test_failing_series_does_not_abort_the_others(db_path):
+    with FakeFredServer(always_fail={'DRTSCIS': 503, 'DRSDCL': 404}) as fred:
+        downloaded, stats = download(db_path, fred, max_retries=2)
+
+    assert set(downloaded) == (set(LENDING_STANDARDS_SERIES) | set(LOAN_DEMAND_SERIES)) - {'DRTSCIS', 'DRSDCL'}
+    assert (stats['succeeded'], stats['failed']) == (SERIES_COUNT - 2, 2)
+    # The retryable failure is tried max_retries + 1 times, the 404 only once
+    assert len(fred.requests_for('DRTSCIS')) == 3
+    assert len(fred.requests_for('DRSDCL')) == 1
+
+
+def test_refresh_after_clearing_data_downloads_full_history(db_path):
+    with FakeFredServer() as fred:
+        assert refresh(db_path, fred)
+        full_counts = row_counts(db_path)
+
+        # What the app's "Clear All Data" button does
+        with session_scope(db_path) as session:
+            clear_observations(session)
+            bump_data_version(session)
+        assert row_counts(db_path) == (0, 0)
+
+        assert refresh(db_path, fred)
+
+    observations = len(quarterly_observations())
+    assert full_counts == (len(LENDING_STANDARDS_SERIES) * observations, len(LOAN_DEMAND_SERIES) * observations)
+    assert row_counts(db_path) == full_counts
+    # The refresh after the clear asked for every series from the start again
+    assert all(start is None for _, start, _ in fred.requests[-SERIES_COUNT:])
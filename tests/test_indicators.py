@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from indicators import indicator_table
+
+DATES = pd.date_range('2015-01-01', periods=24, freq='QS')
+
+
+def frame(value_column, categories, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame([(date, category, 'Domestic', rng.normal()) for category in categories for date in DATES],
+                        columns=['survey_date', 'loan_category', 'bank_type', value_column])
+
+
+def test_indicator_table_covers_lending_categories_without_demand():
+    table = indicator_table(frame('net_tightening', ['Auto Loans', 'Mortgages'], 0),
+                            frame('net_demand', ['Mortgages'], 1)).set_index('loan_category')
+
+    assert list(table.index) == ['Auto Loans', 'Mortgages']
+    assert table.loc['Auto Loans', ['net_tightening', 'rolling_mean', 'volatility', 'zscore']].notna().all()
+    assert table.loc['Auto Loans', ['net_demand', 'lead_lag', 'lead_lag_corr']].isna().all()
+    assert table.loc['Mortgages', ['net_demand', 'lead_lag', 'lead_lag_corr']].notna().all()
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from database import init_database
+from query_similarity import SimilarQueryIndex, cosine_similarity, query_key, query_terms, query_vector
+
+CONTEXT = {
+    'categories': ['Commercial & Industrial Loans - Small Firms'],
+    'datasets': ['lending_standards'],
+    'start': pd.Timestamp('2020-01-01'),
+    'end': None,
+}
+
+
+def similarity(a, b):
+    return cosine_similarity(query_vector(query_terms(a)), query_vector(query_terms(b)))
+
+
+@pytest.fixture
+def index(tmp_path):
+    db_path = str(tmp_path / 'sloos_data.db')
+    init_database(db_path)
+    return SimilarQueryIndex(db_path=db_path)
+
+
+def test_paraphrase_is_served_the_stored_answer(index):
+    index.add("How have small business standards changed since 2020?", CONTEXT, "Stored answer", 'model', 1)
+    match = index.lookup("How did small firm standards shift since 2020?", CONTEXT, 1)
+    assert match is not None
+    assert match['answer'] == "Stored answer"
+
+
+@pytest.mark.parametrize('stored, asked', [
+    ("Did small business standards tighten since 2020?", "Did small business standards ease since 2020?"),
+    ("What was the highest level of net tightening since 2020?",
+     "What was the lowest level of net tightening since 2020?"),
+    ("Are small business standards tighter than in 2020?", "Are small business standards looser than in 2020?"),
+    ("Has small business demand increased since 2020?", "Has small business demand decreased since 2020?"),
+    ("Did banks report stronger demand for small business loans since 2020 across all bank sizes?",
+     "Did banks report weaker demand for small business loans since 2020 across all bank sizes?"),
+    ("Has small business demand strengthened since 2020?", "Has small business demand weakened since 2020?"),
+    ("Are small business standards more restrictive than in 2020?",
+     "Are small business standards less restrictive than in 2020?"),
+    ("Did small business standards tighten since 2020?", "Did small business standards not tighten since 2020?"),
+    ("Did small business standards tighten since 2020?", "Why didn't small business standards tighten since 2020?"),
+])
+def test_opposite_directions_are_not_reused(index, stored, asked):
+    assert query_key(query_terms(stored)) != query_key(query_terms(asked))
+    index.add(stored, CONTEXT, "Stored answer", 'model', 1)
+    assert index.lookup(asked, CONTEXT, 1) is None
+
+
+def test_different_statistic_is_not_reused(index):
+    stored = "What was the average net tightening for small business loans since 2020?"
+    asked = "What was the median net tightening for small business loans since 2020?"
+    assert query_key(query_terms(stored)) != query_key(query_terms(asked))
+    index.add(stored, CONTEXT, "Stored answer", 'model', 1)
+    assert index.lookup(asked, CONTEXT, 1) is None
+
+
+def test_different_task_on_the_same_series_is_not_reused(index):
+    assert similarity("Compare credit card standards in 2008", "Explain credit card standards in 2008") < 0.85
+    index.add("Compare credit card standards in 2008", CONTEXT, "Stored answer", 'model', 1)
+    assert index.lookup("Explain credit card standards in 2008", CONTEXT, 1) is None
+
+
+def test_identical_query_on_other_series_is_not_reused(index):
+    query = "How have standards changed since 2020?"
+    index.add(query, CONTEXT, "Stored answer", 'model', 1)
+    assert index.lookup(query, dict(CONTEXT, categories=['Auto Loans']), 1) is None
+    assert index.lookup(query, dict(CONTEXT, end=pd.Timestamp('2022-01-01')), 1) is None
+    assert index.lookup(query, CONTEXT, 2) is None